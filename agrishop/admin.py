@@ -1,9 +1,11 @@
 from django.contrib import admin
-from .models import CustomUser, Category, Product, Cart, LandBidding, Bid
+from .models import CustomUser, Category, Product, Cart, Order, OrderItem, LandBidding, Bid
 
 admin.site.register(CustomUser)
 admin.site.register(Category)
 admin.site.register(Product)
 admin.site.register(Cart)
+admin.site.register(Order)
+admin.site.register(OrderItem)
 admin.site.register(LandBidding)
 admin.site.register(Bid)
\ No newline at end of file
@@ -0,0 +1,298 @@
+"""
+Store-wide reports (revenue, stock turnover, price trends) computed with
+pandas/numpy over column arrays instead of per-row ORM loops.
+
+Rows are selected with `values_list(...)`, fetched CHUNK_SIZE at a time
+from a plain cursor and turned into typed column arrays chunk by chunk, so
+neither model instances nor Django's per-row value converters are involved. Prices
+are cast to REAL in SQL, and timestamps are read as ISO text on SQLite and
+parsed by pandas in one call.
+
+Reports cover every product and are only served to staff. They are cached
+for TTL seconds and are never invalidated on writes: they can be up to TTL
+out of date.
+"""
+from datetime import timedelta
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.db.models import CharField, FloatField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import Bid, Cart, Category, OrderItem, Product
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'default',
+    # Seconds a computed report is served from the cache.
+    'TTL': 300,
+    # Rows fetched per chunk while loading a column frame.
+    'CHUNK_SIZE': 50_000,
+    'DAYS': 30,
+    'MAX_DAYS': 365,
+    # Rows in "top N" lists.
+    'TOP': 10,
+}
+
+REPORTS = ('revenue', 'inventory', 'prices')
+
+
+def get_setting(name):
+    return getattr(settings, 'AGRISHOP_ANALYTICS', {}).get(name, DEFAULTS[name])
+
+
+def as_float(field):
+    return Cast(field, FloatField())
+
+
+def as_timestamp(field, using):
+    # Django's SQLite backend parses every timestamp column value in the
+    # driver; text skips that and pandas parses the column instead. `using`
+    # is the alias of the database that runs the query.
+    return Cast(field, CharField()) if connections[using].vendor == 'sqlite' else field
+
+
+def load_frame(queryset, columns, chunk_size=None):
+    """
+    Read `columns` (`{name: field name or expression}`) of `queryset` into
+    a DataFrame, chunk_size rows at a time. Values are whatever the
+    database driver returns, without Django's conversions.
+    """
+    chunk_size = chunk_size or get_setting('CHUNK_SIZE')
+    annotations = {f'_{name}': value for name, value in columns.items() if not isinstance(value, str)}
+    fields = [value if isinstance(value, str) else f'_{name}' for name, value in columns.items()]
+    queryset = queryset.order_by().annotate(**annotations).values_list(*fields)
+    # The SELECT lists plain fields before annotations, whatever the order
+    # values_list was given.
+    query = queryset.query
+    selected = [*query.extra_select, *query.values_select, *query.annotation_select]
+    positions = [selected.index(field) for field in fields]
+
+    chunks = []
+    try:
+        sql, params = query.sql_with_params()
+    except EmptyResultSet:
+        pass
+    else:
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            while chunk := cursor.fetchmany(chunk_size):
+                chunks.append(pd.DataFrame.from_records(chunk, columns=range(len(selected))))
+    frame = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=range(len(selected)))
+    frame = frame[positions]
+    frame.columns = list(columns)
+    return frame
+
+
+def parse_timestamps(values):
+    # ISO text from SQLite, datetimes from other backends.
+    text = len(values) and isinstance(values.iloc[0], str)
+    return pd.to_datetime(values, format='ISO8601' if text else None, utc=True)
+
+
+def records(frame):
+    """JSON-ready rows: native Python scalars, NaN and infinity as None."""
+    missing = frame.isna() | frame.isin([np.inf, -np.inf])
+    return frame.astype(object).mask(missing, None).to_dict('records')
+
+
+class Dataset:
+    """Column frames for one reporting window, each loaded on first use."""
+
+    def __init__(self, since, chunk_size=None):
+        self.since = since
+        self.days = max(1, (timezone.now() - since).days)
+        self.chunk_size = chunk_size
+
+    def load(self, queryset, columns):
+        return load_frame(queryset, columns, self.chunk_size)
+
+    @cached_property
+    def order_items(self):
+        """Lines of confirmed orders placed in the window."""
+        queryset = OrderItem.objects.filter(order__status='confirmed', order__created_at__gte=self.since)
+        frame = self.load(queryset, {
+            'order': 'order_id',
+            'product': 'product_id',
+            'category': 'product__category_id',
+            'quantity': 'quantity',
+            'price': as_float('unit_price'),
+            'created_at': as_timestamp('order__created_at', queryset.db),
+        })
+        frame['created_at'] = parse_timestamps(frame['created_at'])
+        frame['revenue'] = frame['price'].astype(float) * frame['quantity'].astype(float)
+        return frame
+
+    @cached_property
+    def products(self):
+        return self.load(Product.objects.all(), {
+            'product': 'id',
+            'category': 'category_id',
+            'stock': 'quantity',
+            'price': as_float('price'),
+        })
+
+    @cached_property
+    def cart(self):
+        return self.load(Cart.objects.all(), {'product': 'product_id', 'quantity': 'quantity'})
+
+    @cached_property
+    def bids(self):
+        queryset = Bid.objects.filter(bid_time__gte=self.since)
+        frame = self.load(queryset, {
+            'city': 'land_listing__city',
+            'amount': as_float('bid_amount'),
+            'time': as_timestamp('bid_time', queryset.db),
+        })
+        frame['time'] = parse_timestamps(frame['time'])
+        return frame
+
+    @cached_property
+    def category_names(self):
+        return dict(Category.objects.values_list('pk', 'name'))
+
+
+def by_category(frame, names, **aggregations):
+    grouped = frame.groupby(pd.array(frame['category'], dtype='Int64'), dropna=False).agg(**aggregations)
+    grouped.index.name = 'category'
+    grouped = grouped.reset_index()
+    grouped['category'] = grouped['category'].astype(object).where(grouped['category'].notna(), None)
+    grouped.insert(1, 'name', grouped['category'].map(lambda pk: names.get(pk, 'Uncategorized')))
+    return grouped
+
+
+def titles(product_ids):
+    return dict(Product.objects.filter(pk__in=[int(pk) for pk in product_ids]).values_list('pk', 'title'))
+
+
+def revenue_report(data, top):
+    items = data.order_items
+    daily = items.groupby(items['created_at'].dt.floor('D'))['revenue'].sum()
+    days = pd.date_range(pd.Timestamp(data.since).floor('D'), pd.Timestamp(timezone.now()).floor('D'), freq='D')
+    daily = daily.reindex(days, fill_value=0.0)
+
+    products = items.dropna(subset=['product']).groupby('product').agg(
+        revenue=('revenue', 'sum'), units=('quantity', 'sum')
+    ).nlargest(top, 'revenue').reset_index()
+    products.insert(1, 'title', products['product'].map(titles(products['product'])))
+
+    categories = by_category(items, data.category_names, revenue=('revenue', 'sum'), units=('quantity', 'sum'))
+    return {
+        'total': round(float(items['revenue'].sum()), 2),
+        'orders': int(items['order'].nunique()),
+        'units': int(items['quantity'].sum()),
+        'by_day': [
+            {'date': day.date().isoformat(), 'revenue': round(float(amount), 2)}
+            for day, amount in daily.items()
+        ],
+        'by_category': records(categories.sort_values('revenue', ascending=False).round(2)),
+        'top_products': records(products.round(2)),
+    }
+
+
+def inventory_report(data, top):
+    products = data.products.set_index('product')
+    def units(frame):
+        return frame.groupby('product')['quantity'].sum().reindex(products.index, fill_value=0).astype(int)
+
+    products['sold'] = units(data.order_items)
+    products['in_carts'] = units(data.cart)
+    products['stock_value'] = products['stock'] * products['price'].astype(float)
+    # Stock at the window start is approximated as current stock + units sold.
+    products['average_stock'] = products['stock'] + products['sold'] / 2
+    daily = products['sold'] / data.days
+    products['days_of_cover'] = np.where(daily > 0, products['stock'] / daily.where(daily > 0, 1), np.inf)
+
+    categories = by_category(
+        products.reset_index(), data.category_names,
+        products=('product', 'count'),
+        stock=('stock', 'sum'),
+        stock_value=('stock_value', 'sum'),
+        sold=('sold', 'sum'),
+        in_carts=('in_carts', 'sum'),
+        average_stock=('average_stock', 'sum'),
+    )
+    categories['turnover'] = categories['sold'] / categories['average_stock'].where(categories['average_stock'] > 0)
+    categories = categories.drop(columns='average_stock')
+
+    selling = products[products['sold'] > 0].nsmallest(top, 'days_of_cover').reset_index()
+    low_cover = selling[['product', 'stock', 'sold', 'in_carts', 'days_of_cover']].copy()
+    low_cover.insert(1, 'title', low_cover['product'].map(titles(low_cover['product'])))
+
+    return {
+        'stock_units': int(products['stock'].sum()),
+        'stock_value': round(float(products['stock_value'].sum()), 2),
+        'units_in_carts': int(products['in_carts'].sum()),
+        'by_category': records(categories.sort_values('stock_value', ascending=False).round(2)),
+        'low_cover': records(low_cover.round(1)),
+    }
+
+
+def prices_report(data, top):
+    def weekly(frame, key, time, **aggregations):
+        origin = pd.Timestamp(data.since)
+        grouped = frame.groupby([key, pd.Grouper(key=time, freq='7D', origin=origin)]).agg(**aggregations)
+        series = {}
+        for (group, week), row in grouped.round(2).iterrows():
+            series.setdefault(group, []).append({'week': week.date().isoformat(), **row.to_dict()})
+        return series
+
+    bids = weekly(
+        data.bids, 'city', 'time',
+        bids=('amount', 'count'), median=('amount', 'median'), mean=('amount', 'mean'), max=('amount', 'max'),
+    )
+    items = data.order_items.dropna(subset=['category']).copy()
+    items['category'] = items['category'].astype(int)
+    # Quantity-weighted average of the prices actually paid.
+    units = weekly(items, 'category', 'created_at', revenue=('revenue', 'sum'), units=('quantity', 'sum'))
+    names = data.category_names
+    return {
+        'land_bids': [
+            {'city': city, 'weeks': [{**week, 'bids': int(week['bids'])} for week in weeks]}
+            for city, weeks in sorted(bids.items())
+        ],
+        'product_prices': [
+            {
+                'category': category,
+                'name': names.get(category, 'Uncategorized'),
+                'weeks': [
+                    {'week': week['week'], 'units': int(week['units']),
+                     'average_price': round(week['revenue'] / week['units'], 2)}
+                    for week in weeks
+                ],
+            }
+            for category, weeks in sorted(units.items())
+        ],
+    }
+
+
+BUILDERS = {
+    'revenue': revenue_report,
+    'inventory': inventory_report,
+    'prices': prices_report,
+}
+
+
+def build_reports(names, days, chunk_size=None):
+    """Compute the named reports over the last `days` days, uncached."""
+    data = Dataset(timezone.now() - timedelta(days=days), chunk_size)
+    generated_at = timezone.now().isoformat()
+    return {name: {'generated_at': generated_at, **BUILDERS[name](data, get_setting('TOP'))} for name in names}
+
+
+def get_reports(names, days):
+    """The named reports, from the cache where possible; misses are computed together."""
+    cache = caches[get_setting('CACHE_ALIAS')]
+    keys = {name: f'analytics:{name}:{days}' for name in names}
+    found = cache.get_many(list(keys.values()))
+    missing = [name for name in names if keys[name] not in found]
+    if missing:
+        computed = build_reports(missing, days)
+        cache.set_many({keys[name]: computed[name] for name in missing}, get_setting('TTL'))
+        found.update({keys[name]: computed[name] for name in missing})
+    return {name: found[keys[name]] for name in names}
@@ -0,0 +1,222 @@
+"""
+Async versions of the hottest endpoints, for the ASGI app (ecommerce/asgi.py).
+
+DRF views are synchronous, so under ASGI each request would hold a worker
+thread for its whole life. These plain Django async views hold one only
+while a query runs: reads go through the async ORM, and place_bid, which
+needs a transaction, runs in Django's shared sync thread. Request and
+response bodies match the DRF endpoints they mirror.
+
+    /api/async/land-listings/<id>/            GET
+    /api/async/land-listings/<id>/place_bid/  POST
+    /api/async/cart/                          GET, POST
+    /api/async/cart/<id>/                     GET, PUT, PATCH, DELETE
+    /api/async/land-listings/<id>/events/     GET (Server-Sent Events)
+    /api/async/land-listings/events/?listings=<id>,<id>
+"""
+import functools
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.db import IntegrityError
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, serializers
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+
+from .bidding import place_bid
+from .cart import DUPLICATE_LINE, validate_cart_line
+from .live import event_stream, feed, get_setting as get_live_setting
+from .models import Bid, Cart, LandBidding, Product
+from .serializers import BidSerializer, CartSerializer, LandBiddingSerializer
+from .throttling import BidThrottle, TokenBucketThrottle, check_throttles
+
+
+class BidInputSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Bid
+        fields = ['bid_amount']
+
+
+class CartLineInputSerializer(serializers.ModelSerializer):
+    # A plain id: PrimaryKeyRelatedField would run a synchronous query.
+    product = serializers.IntegerField()
+
+    class Meta:
+        model = Cart
+        fields = ['product', 'quantity']
+
+
+def api_response(data, status=200):
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+def error_response(exc):
+    detail = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+    response = api_response(detail, exc.status_code)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        response['WWW-Authenticate'] = 'Bearer realm="api"'
+    if isinstance(exc, exceptions.Throttled) and exc.wait is not None:
+        response['Retry-After'] = str(math.ceil(exc.wait))
+    return response
+
+
+def authenticate(request, required):
+    result = JWTStatelessUserAuthentication().authenticate(request)
+    if result is None:
+        if required:
+            raise exceptions.NotAuthenticated()
+        return AnonymousUser()
+    return result[0]
+
+
+def parse_body(request):
+    if not request.body:
+        return {}
+    try:
+        return json.loads(request.body)
+    except ValueError as exc:
+        raise exceptions.ParseError(f'JSON parse error - {exc}')
+
+
+def async_api_view(methods, auth=True, throttles=(TokenBucketThrottle,)):
+    """JWT authentication, throttling, JSON bodies and DRF-style errors for an async view."""
+    def decorator(view):
+        @csrf_exempt
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                if request.method not in methods:
+                    raise exceptions.MethodNotAllowed(request.method)
+                request.user = authenticate(request, required=auth)
+                check_throttles(request, [throttle() for throttle in throttles])
+                request.data = parse_body(request)
+                return await view(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                return error_response(exc)
+        return wrapper
+    return decorator
+
+
+def validated(serializer_class, data, partial=False):
+    serializer = serializer_class(data=data, partial=partial)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data
+
+
+async def get_or_404(queryset, **lookup):
+    instance = await queryset.filter(**lookup).afirst()
+    if instance is None:
+        raise exceptions.NotFound('No matching object found.')
+    return instance
+
+
+@async_api_view(['GET'], auth=False)
+async def land_listing_detail(request, pk):
+    listing = await get_or_404(LandBidding.objects, pk=pk)
+    return api_response(LandBiddingSerializer(listing, context={'request': request}).data)
+
+
+@async_api_view(['POST'], throttles=(TokenBucketThrottle, BidThrottle))
+async def land_listing_place_bid(request, pk):
+    # A missing listing is a 404, as from the DRF action's get_object().
+    await get_or_404(LandBidding.objects, pk=pk)
+    bid_amount = validated(BidInputSerializer, request.data)['bid_amount']
+    bid = await sync_to_async(place_bid)(pk, request.user, bid_amount)
+    return api_response(BidSerializer(bid).data, 201)
+
+
+async def get_product(pk):
+    product = await Product.objects.filter(pk=pk).afirst()
+    if product is None:
+        raise exceptions.ValidationError({'product': [f'Invalid pk "{pk}" - object does not exist.']})
+    return product
+
+
+async def save_line(line, **kwargs):
+    # Two requests adding the same product can both pass the duplicate check.
+    try:
+        await line.asave(**kwargs)
+    except IntegrityError:
+        raise exceptions.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [DUPLICATE_LINE]}, code='unique')
+
+
+@async_api_view(['GET', 'POST'])
+async def cart_list(request):
+    context = {'request': request}
+    if request.method == 'GET':
+        lines = Cart.objects.filter(user_id=request.user.pk).with_line_totals()
+        return api_response([CartSerializer(line, context=context).data async for line in lines])
+
+    data = validated(CartLineInputSerializer, request.data)
+    product = await get_product(data['product'])
+    quantity = data.get('quantity', 1)
+    await sync_to_async(validate_cart_line)(request.user.pk, product, quantity)
+    line = Cart(user_id=request.user.pk, product=product, quantity=quantity)
+    await save_line(line)
+    return api_response(CartSerializer(line, context=context).data, 201)
+
+
+@async_api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
+async def cart_detail(request, pk):
+    lines = Cart.objects.filter(user_id=request.user.pk).with_line_totals()
+    line = await get_or_404(lines, pk=pk)
+
+    if request.method == 'DELETE':
+        await line.adelete()
+        return HttpResponse(status=204)
+
+    if request.method in ('PUT', 'PATCH'):
+        data = validated(CartLineInputSerializer, request.data, partial=request.method == 'PATCH')
+        if 'product' in data and data['product'] != line.product_id:
+            line.product = await get_product(data['product'])
+        line.quantity = data.get('quantity', line.quantity)
+        await sync_to_async(validate_cart_line)(request.user.pk, line.product, line.quantity, line.pk)
+        await save_line(line, update_fields=['product', 'quantity'])
+        # The SQL-annotated line total no longer matches the new quantity.
+        line.__dict__.pop('line_total', None)
+
+    return api_response(CartSerializer(line, context={'request': request}).data)
+
+
+def parse_listing_ids(value):
+    try:
+        listing_ids = {int(part) for part in value.split(',') if part.strip()}
+    except ValueError:
+        raise exceptions.ValidationError({'listings': 'Expected comma-separated listing ids.'})
+    if not listing_ids:
+        raise exceptions.ValidationError({'listings': 'At least one listing id is required.'})
+    if len(listing_ids) > get_live_setting('MAX_LISTINGS'):
+        raise exceptions.ValidationError({
+            'listings': f'At most {get_live_setting("MAX_LISTINGS")} listings per stream.'
+        })
+    return listing_ids
+
+
+def parse_last_event_id(request):
+    # EventSource sends the header on reconnect; the query parameter lets a
+    # fresh page resume from an id it stored itself.
+    return feed.parse_event_id(request.headers.get('Last-Event-ID') or request.GET.get('last_event_id'))
+
+
+@async_api_view(['GET'], auth=False)
+async def land_listing_events(request, pk=None):
+    """Live bid, status and closing events for one listing or a set of them."""
+    if pk is not None:
+        await get_or_404(LandBidding.objects, pk=pk)
+        listing_ids = {pk}
+    else:
+        listing_ids = parse_listing_ids(request.GET.get('listings', ''))
+
+    response = StreamingHttpResponse(
+        event_stream(listing_ids, parse_last_event_id(request)),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,119 @@
+"""
+Auction lifecycle: close listings once their end time passes.
+
+close_expired_auctions does the work in fixed-size batches. Run it from
+cron with `manage.py close_auctions`, or let the ASGI app run it on a
+background thread (AGRISHOP_AUCTIONS['SCHEDULER']) so closing events
+reach the live feed subscribers of that process.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .comparables import apply_changes, listing_changes
+from .live import publish_status_change
+from .models import Bid, LandBidding
+from .transactions import immediate_atomic
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'SCHEDULER': False,
+    # Seconds between scheduler runs.
+    'INTERVAL': 5,
+    'BATCH_SIZE': 500,
+}
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_setting(name):
+    return getattr(settings, 'AGRISHOP_AUCTIONS', {}).get(name, DEFAULTS[name])
+
+
+def close_expired_auctions(now=None, batch_size=None):
+    """
+    Close every active listing whose end time has passed and record its winner,
+    `batch_size` (default: the BATCH_SIZE setting) listings at a time.
+
+    Each batch is one transaction: select the ids, close them with one
+    UPDATE that looks each winning bid up on bid_listing_amount_idx, read
+    the results back for the closing events, and add the winning bids to
+    their cities' price histograms (an INSERT and an UPDATE). Returns the
+    number of listings closed.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or get_setting('BATCH_SIZE')
+    winning_bid = Bid.objects.filter(
+        land_listing=OuterRef('pk'), bid_amount=OuterRef('current_highest_bid')
+    ).order_by('-id').values('pk')[:1]
+    closed = 0
+    while True:
+        with immediate_atomic():
+            listing_ids = list(
+                LandBidding.objects.select_for_update(skip_locked=True)
+                .filter(status='active', ends_at__lte=now)
+                .order_by('ends_at')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not listing_ids:
+                return closed
+
+            claimed = LandBidding.objects.filter(pk__in=listing_ids, status='active').update(
+                status='closed', closed_at=now, updated_at=now, winning_bid=Subquery(winning_bid)
+            )
+            if claimed != len(listing_ids):
+                # Another worker got to some of these first; retry the batch.
+                transaction.set_rollback(True)
+                continue
+            listings = LandBidding.objects.filter(pk__in=listing_ids).values(
+                'pk', 'city', 'status', 'current_highest_bid', 'bid_count', 'ends_at',
+                'winning_bid_id', 'winning_bid__bidder_id', 'area_size', 'starting_bid_amount',
+            )
+            changes = None
+            for listing in listings:
+                publish_status_change(listing['pk'], listing, 'active')
+                before = (listing['city'], listing['area_size'], listing['starting_bid_amount'],
+                          'active', None, listing['current_highest_bid'])
+                after = (*before[:3], 'closed', listing['winning_bid_id'], before[5])
+                changes = listing_changes(before, after, changes)
+            apply_changes(changes or {})
+            closed += len(listing_ids)
+
+
+class AuctionScheduler(threading.Thread):
+    """Daemon thread that runs close_expired_auctions every INTERVAL seconds."""
+
+    def __init__(self, interval, batch_size):
+        super().__init__(name='auction-scheduler', daemon=True)
+        self.interval = interval
+        self.batch_size = batch_size
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            close_old_connections()
+            try:
+                close_expired_auctions(batch_size=self.batch_size)
+            except Exception:
+                logger.exception('Closing expired auctions failed')
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        self.stopped.set()
+
+
+def start_scheduler():
+    """Start this process's scheduler if AGRISHOP_AUCTIONS enables it; idempotent."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None and get_setting('SCHEDULER'):
+            _scheduler = AuctionScheduler(get_setting('INTERVAL'), get_setting('BATCH_SIZE'))
+            _scheduler.start()
+        return _scheduler
@@ -0,0 +1,42 @@
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.tokens import RefreshToken
+
+# Copied from the user into every token, so most requests never load the row.
+USER_CLAIMS = ['email', 'role', 'is_staff']
+
+
+def tokens_for_user(user):
+    refresh = RefreshToken.for_user(user)
+    for claim in USER_CLAIMS:
+        refresh[claim] = getattr(user, claim)
+    return refresh
+
+
+class ClaimsUser(TokenUser):
+    """
+    `request.user` for JWT requests, built from the access token alone.
+
+    `id`, `pk` and the USER_CLAIMS are read from the token. Any other
+    attribute (`full_name`, `business_name`, ...) loads the CustomUser row
+    once and reads it from there. Views should filter and assign by
+    `request.user.pk` (`user_id=...`) rather than passing the user object
+    to the ORM, which only accepts CustomUser instances.
+
+    Because nothing is looked up per request, a deactivated account keeps
+    working until its access token expires (ACCESS_TOKEN_LIFETIME).
+    """
+
+    @cached_property
+    def instance(self):
+        from .models import CustomUser
+        return CustomUser.objects.get(pk=self.pk)
+
+    def __getattr__(self, attr):
+        # Instances made without __init__ (unpickled, copied) have no
+        # `token`; looking it up here would recurse.
+        if attr == 'token' or attr.startswith('_'):
+            raise AttributeError(attr)
+        if attr in self.token:
+            return self.token[attr]
+        return getattr(self.instance, attr)
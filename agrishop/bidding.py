@@ -0,0 +1,191 @@
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .live import publish_bid
+from .models import LandBidding, Bid, BidderStanding, BidStatistics
+from .transactions import immediate_atomic
+
+
+def place_bid(land_listing_id, bidder, bid_amount):
+    """
+    Record a bid if, and only if, it beats the listing's current highest bid.
+
+    The check and the write are one conditional UPDATE on the listing row, so
+    two concurrent bidders can never both win: whichever UPDATE lands second
+    re-evaluates the WHERE clause against the first one's amount and matches
+    no rows. Bids stop at the listing's end time even before
+    close_expired_auctions gets to it. Only `bidder.pk` is used, so a token
+    user works as well.
+    Accepted bids are pushed to the live feed once the transaction commits.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        accepted = LandBidding.objects.filter(
+            Q(current_highest_bid__isnull=True, starting_bid_amount__lte=bid_amount)
+            | Q(current_highest_bid__lt=bid_amount),
+            Q(ends_at__isnull=True) | Q(ends_at__gt=now),
+            pk=land_listing_id,
+            status='active',
+        ).update(
+            current_highest_bid=bid_amount,
+            bid_count=F('bid_count') + 1,
+            updated_at=now,
+        )
+        if not accepted:
+            raise ValidationError(rejection_reason(land_listing_id, bid_amount))
+
+        bid = Bid.objects.create(
+            land_listing_id=land_listing_id,
+            bidder_id=bidder.pk,
+            bid_amount=bid_amount,
+        )
+        record_bid_statistics(bid)
+        publish_bid(bid)
+        return bid
+
+
+def record_bid_statistics(bid):
+    """
+    Fold an accepted bid into BidderStanding and BidStatistics.
+
+    Called inside place_bid's transaction after the listing row has been
+    updated, so bids on the same listing are already serialized and each
+    update-then-create pair cannot race. An accepted bid always beats every
+    earlier one, so it is also its bidder's best.
+    """
+    new_bidder = not BidderStanding.objects.filter(
+        land_listing_id=bid.land_listing_id, bidder_id=bid.bidder_id
+    ).update(best_bid=bid.bid_amount, bid_count=F('bid_count') + 1, last_bid_at=bid.bid_time)
+    if new_bidder:
+        BidderStanding.objects.create(
+            land_listing_id=bid.land_listing_id,
+            bidder_id=bid.bidder_id,
+            best_bid=bid.bid_amount,
+            bid_count=1,
+            last_bid_at=bid.bid_time,
+        )
+
+    updated = BidStatistics.objects.filter(land_listing_id=bid.land_listing_id).update(
+        unique_bidders=F('unique_bidders') + int(new_bidder),
+        last_bid_at=bid.bid_time,
+    )
+    if not updated:
+        BidStatistics.objects.create(
+            land_listing_id=bid.land_listing_id,
+            unique_bidders=1,
+            first_bid_at=bid.bid_time,
+            last_bid_at=bid.bid_time,
+        )
+
+
+def rejection_reason(land_listing_id, bid_amount):
+    listing = LandBidding.objects.filter(pk=land_listing_id).values(
+        'status', 'starting_bid_amount', 'current_highest_bid', 'ends_at'
+    ).first()
+    if listing is None:
+        return {'land_listing': 'Land listing does not exist.'}
+    return check_bid(bid_amount, **listing) or {
+        'bid_amount': 'Bid was outbid while being placed, please try again.'
+    }
+
+
+def check_bid(bid_amount, status, starting_bid_amount, current_highest_bid, ends_at=None):
+    """Return an error dict if the bid cannot beat the given listing state."""
+    if status != 'active':
+        return {'land_listing': 'This land listing is not accepting bids.'}
+    if ends_at is not None and ends_at <= timezone.now():
+        return {'land_listing': 'Bidding on this land listing has ended.'}
+    if current_highest_bid is not None and bid_amount <= current_highest_bid:
+        return {'bid_amount': f'Bid must be higher than the current highest bid of {current_highest_bid}'}
+    if bid_amount < starting_bid_amount:
+        return {'bid_amount': f'Bid must be at least the starting bid amount of {starting_bid_amount}'}
+    return None
+
+
+def recalculate_bid_summary(land_listing_id):
+    """Rebuild the denormalized bid columns and statistics after bids are removed."""
+    with immediate_atomic():
+        bids = Bid.objects.filter(land_listing_id=land_listing_id).order_by()
+        summary = bids.aggregate(
+            highest=Max('bid_amount'), count=Count('id'), first=Min('bid_time'), last=Max('bid_time')
+        )
+        LandBidding.objects.filter(pk=land_listing_id).update(
+            current_highest_bid=summary['highest'],
+            bid_count=summary['count'],
+            updated_at=timezone.now(),
+        )
+
+        BidderStanding.objects.filter(land_listing_id=land_listing_id).delete()
+        standings = BidderStanding.objects.bulk_create([
+            BidderStanding(
+                land_listing_id=land_listing_id,
+                bidder_id=row['bidder_id'],
+                best_bid=row['best'],
+                bid_count=row['count'],
+                last_bid_at=row['last'],
+            )
+            for row in bids.values('bidder_id').annotate(
+                best=Max('bid_amount'), count=Count('id'), last=Max('bid_time')
+            )
+        ])
+        BidStatistics.objects.update_or_create(
+            land_listing_id=land_listing_id,
+            defaults={
+                'unique_bidders': len(standings),
+                'first_bid_at': summary['first'],
+                'last_bid_at': summary['last'],
+            },
+        )
+
+
+def rebuild_bid_statistics(batch_size=1000):
+    """Recompute every BidderStanding and BidStatistics row from the bids, e.g. after a bulk load."""
+    bids = Bid.objects.order_by()
+    with transaction.atomic():
+        BidderStanding.objects.all().delete()
+        BidStatistics.objects.all().delete()
+        BidderStanding.objects.bulk_create((
+            BidderStanding(
+                land_listing_id=row['land_listing_id'],
+                bidder_id=row['bidder_id'],
+                best_bid=row['best'],
+                bid_count=row['count'],
+                last_bid_at=row['last'],
+            )
+            for row in bids.values('land_listing_id', 'bidder_id').annotate(
+                best=Max('bid_amount'), count=Count('id'), last=Max('bid_time')
+            ).iterator()
+        ), batch_size=batch_size)
+        BidStatistics.objects.bulk_create((
+            BidStatistics(
+                land_listing_id=row['land_listing_id'],
+                unique_bidders=row['bidders'],
+                first_bid_at=row['first'],
+                last_bid_at=row['last'],
+            )
+            for row in bids.values('land_listing_id').annotate(
+                bidders=Count('bidder_id', distinct=True), first=Min('bid_time'), last=Max('bid_time')
+            ).iterator()
+        ), batch_size=batch_size)
+
+
+def leaderboard(land_listing_id, limit):
+    """The listing's `limit` highest bids, read off bid_listing_amount_idx."""
+    return Bid.objects.filter(land_listing_id=land_listing_id).order_by('-bid_amount')[:limit]
+
+
+def bidder_rank(land_listing_id, bidder_id):
+    """
+    Return `(standing, rank)` for a bidder on a listing, or `(None, None)`.
+
+    The rank counts the standings with a higher best bid, an index range
+    scan bounded by the rank itself rather than by the listing's bids.
+    """
+    standing = BidderStanding.objects.filter(land_listing_id=land_listing_id, bidder_id=bidder_id).first()
+    if standing is None:
+        return None, None
+    ahead = BidderStanding.objects.filter(land_listing_id=land_listing_id, best_bid__gt=standing.best_bid).count()
+    return standing, ahead + 1
+
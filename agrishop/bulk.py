@@ -0,0 +1,175 @@
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+
+from .cache import invalidate_catalog_for_write
+from .facets import refresh_category_aggregates
+from .models import Category, Product
+
+# Columns read by import_products and written by export_products.
+PRODUCT_COLUMNS = ['sku', 'title', 'description', 'category', 'quantity', 'price']
+UPSERT_FIELDS = ['title', 'description', 'category', 'quantity', 'price', 'updated_at']
+
+
+class ImportStats:
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.errors = []
+        self.started = time.perf_counter()
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def read_rows(stream, fmt):
+    """Yield one dict per CSV row or JSON line without reading the whole file."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    elif fmt == 'jsonl':
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(f'Unsupported format: {fmt}')
+
+
+def import_products(rows, chunk_size=1000, progress=None):
+    """
+    Upsert products keyed on `sku`, one `bulk_create` per chunk.
+
+    Bypasses Product.save(), so imported rows never touch the image pipeline;
+    the FTS triggers still index them and the catalog cache is invalidated
+    once per chunk.
+    """
+    stats = ImportStats()
+    categories = dict(Category.objects.values_list('name', 'pk'))
+    rows = iter(rows)
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        products = {}
+        for row in chunk:
+            stats.rows += 1
+            try:
+                product = build_product(row)
+                category = text_field(row, 'category')
+            except (KeyError, ValueError, TypeError, InvalidOperation) as exc:
+                stats.errors.append((stats.rows, str(exc)))
+                continue
+            # The last occurrence of a SKU within a chunk wins.
+            products[product.sku] = (product, category)
+
+        if products:
+            write_chunk(products, categories)
+            stats.imported += len(products)
+
+        if progress:
+            progress(stats)
+
+    return stats
+
+
+def write_chunk(products, categories):
+    with transaction.atomic():
+        resolve_categories(categories, {name for _, name in products.values() if name})
+        # Categories the upserted SKUs move out of need recomputing too.
+        touched = set(Product.objects.filter(sku__in=products).values_list('category_id', flat=True))
+        batch = []
+        for product, category_name in products.values():
+            product.category_id = categories.get(category_name)
+            batch.append(product)
+        Product.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=['sku'],
+            update_fields=UPSERT_FIELDS,
+        )
+        refresh_category_aggregates(touched | {product.category_id for product in batch})
+        invalidate_catalog_for_write('product', 'category')
+
+
+def text_field(row, name):
+    """A stripped string column; missing and null read as ''."""
+    value = row.get(name)
+    if value is None:
+        return ''
+    # JSON lines can hold any type where CSV only has strings.
+    if not isinstance(value, str):
+        raise ValueError(f'{name} must be a string')
+    return value.strip()
+
+
+def build_product(row):
+    sku = text_field(row, 'sku')
+    title = text_field(row, 'title')
+    if not sku:
+        raise ValueError('sku is required')
+    if not title:
+        raise ValueError('title is required')
+
+    if row['quantity'] is None or row['price'] is None:
+        raise ValueError('quantity and price are required')
+    quantity = int(row['quantity'])
+    price = Decimal(str(row['price']))
+    if quantity < 0 or price < 0:
+        raise ValueError('quantity and price must not be negative')
+
+    return Product(
+        sku=sku,
+        title=title,
+        description=text_field(row, 'description'),
+        quantity=quantity,
+        price=price.quantize(Decimal('0.01')),
+    )
+
+
+def resolve_categories(categories, names):
+    """Create any unseen category names and add their ids to the map."""
+    missing = names - categories.keys()
+    if not missing:
+        return
+    Category.objects.bulk_create(
+        [Category(name=name) for name in missing],
+        ignore_conflicts=True,
+    )
+    categories.update(Category.objects.filter(name__in=missing).values_list('name', 'pk'))
+
+
+def export_rows(chunk_size=2000):
+    """Stream products as dicts; `iterator()` keeps one chunk in memory."""
+    queryset = Product.objects.order_by('pk').values_list(
+        'sku', 'title', 'description', 'category__name', 'quantity', 'price'
+    )
+    for values in queryset.iterator(chunk_size=chunk_size):
+        yield dict(zip(PRODUCT_COLUMNS, values))
+
+
+def write_rows(rows, stream, fmt):
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=PRODUCT_COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    elif fmt == 'jsonl':
+        for row in rows:
+            row['price'] = str(row['price'])
+            stream.write(json.dumps(row) + '\n')
+            count += 1
+    else:
+        raise ValueError(f'Unsupported format: {fmt}')
+    return count
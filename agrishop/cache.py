@@ -0,0 +1,189 @@
+import hashlib
+import json
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .fieldsets import parse_fields
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'AGRISHOP_CATALOG_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def catalog_cache():
+    return caches[get_setting('ALIAS')]
+
+
+def get_version(namespace):
+    """
+    Current version of a namespace ('product', 'category'). Every cached
+    payload key embeds it, so bumping it retires the whole namespace at once.
+
+    Versions start from the clock rather than 1, so an evicted counter never
+    restarts at a number that older entries were stored under.
+    """
+    cache = catalog_cache()
+    key = f'catalog:{namespace}:version'
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_catalog(*namespaces):
+    cache = catalog_cache()
+    for namespace in namespaces:
+        key = f'catalog:{namespace}:version'
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+        touch_namespace(cache, namespace)
+
+
+def touch_namespace(cache, namespace):
+    # Whole seconds, as in Last-Modified, and always later than the last
+    # write: a list read between two writes in one second is not current.
+    key = f'catalog:{namespace}:written'
+    written = cache.get(key)
+    stamp = math.ceil(time.time())
+    cache.set(key, stamp if written is None else max(stamp, written + 1), None)
+
+
+def last_write(namespace):
+    """
+    When the namespace was last written, as a Last-Modified timestamp. A
+    list's rows cannot tell when one of them was deleted, so lists are as
+    old as the last write. A stamp lost to eviction restarts at now.
+    """
+    cache = catalog_cache()
+    key = f'catalog:{namespace}:written'
+    written = cache.get(key)
+    if written is None:
+        cache.add(key, math.ceil(time.time()), None)
+        written = cache.get(key)
+    return written
+
+
+def invalidate_catalog_for_write(*namespaces):
+    """
+    Invalidate now, so reads later in the same transaction miss, and again on
+    commit, so a concurrent request cannot re-cache the pre-commit rows.
+    """
+    invalidate_catalog(*namespaces)
+    transaction.on_commit(lambda: invalidate_catalog(*namespaces))
+
+
+def make_key(namespace, kind, ident):
+    return f'catalog:{namespace}:v{get_version(namespace)}:{kind}:{ident}'
+
+
+def request_fingerprint(request):
+    # Host is part of the payload: pagination and media links are absolute.
+    params = sorted(request.query_params.lists())
+    raw = json.dumps([request.get_host(), request.path, params])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def build_entry(data, last_modified=None):
+    body = json.dumps(data, cls=JSONEncoder, sort_keys=True).encode()
+    if last_modified is None:
+        last_modified = latest_update(data)
+    return {
+        'data': data,
+        'digest': hashlib.md5(body).hexdigest(),
+        'last_modified': last_modified,
+    }
+
+
+def latest_update(data):
+    """Newest `updated_at` in a detail payload, list, or paginated page."""
+    if isinstance(data, dict) and 'results' in data:
+        data = data['results']
+    items = data if isinstance(data, list) else [data]
+    stamps = [parse_datetime(item['updated_at']) for item in items if item.get('updated_at')]
+    return int(max(stamps).timestamp()) if stamps else None
+
+
+def conditional_response(request, entry):
+    # One payload renders to different bytes per format (JSON, CSV, ...).
+    renderer = getattr(request, 'accepted_renderer', None)
+    etag = quote_etag(f"{entry['digest']}-{renderer.format}" if renderer else entry['digest'])
+    not_modified = get_conditional_response(
+        request, etag=etag, last_modified=entry['last_modified']
+    )
+    if not_modified is not None:
+        return not_modified
+
+    response = Response(entry['data'])
+    response['ETag'] = etag
+    if entry['last_modified'] is not None:
+        response['Last-Modified'] = http_date(entry['last_modified'])
+    return response
+
+
+class CachedCatalogMixin:
+    """
+    Read-through cache for list and retrieve. Payloads are cached per query
+    fingerprint (lists) or per id (details) under the namespace version, which
+    the signal handlers in agrishop/signals.py bump on every write. Lists are
+    Last-Modified at the namespace's last write, details at their row's.
+    """
+    cache_namespace = None
+
+    def list(self, request, *args, **kwargs):
+        key = make_key(self.cache_namespace, 'list', request_fingerprint(request))
+        return self.cached(
+            request, key, lambda: super(CachedCatalogMixin, self).list(request, *args, **kwargs),
+            last_modified=last_write(self.cache_namespace),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        ident = f"{request.get_host()}:{kwargs[self.lookup_url_kwarg or self.lookup_field]}"
+        fields = parse_fields(request)
+        if fields:
+            # Sparse payloads must not land in the full payload's slot.
+            ident = f"{ident}:{','.join(fields)}"
+        key = make_key(self.cache_namespace, 'detail', ident)
+        return self.cached(request, key, lambda: super(CachedCatalogMixin, self).retrieve(request, *args, **kwargs))
+
+    def cached(self, request, key, build, last_modified=None):
+        cache = catalog_cache()
+        entry = cache.get(key)
+        if entry is None:
+            response = build()
+            if response.status_code != 200:
+                return response
+            entry = build_entry(response.data, last_modified)
+            cache.set(key, entry, get_setting('TIMEOUT'))
+        return conditional_response(request, entry)
+
+
+def cached_product_payload(product, context):
+    """Serialized product for nesting, shared with ProductViewSet.retrieve."""
+    from .serializers import ProductSerializer
+
+    request = context.get('request')
+    host = request.get_host() if request else ''
+    key = make_key('product', 'detail', f'{host}:{product.pk}')
+    cache = catalog_cache()
+    entry = cache.get(key)
+    if entry is None:
+        entry = build_entry(ProductSerializer(product, context=context).data)
+        cache.set(key, entry, get_setting('TIMEOUT'))
+    return entry['data']
@@ -0,0 +1,92 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+
+from .models import Cart, Product
+from .transactions import immediate_atomic
+
+ADD = 'add'
+SET = 'set'
+REMOVE = 'remove'
+DUPLICATE_LINE = 'The fields user, product must make a unique set.'
+
+
+def stock_error(product):
+    return {'quantity': f'Cannot add more than available stock ({product.quantity})'}
+
+
+def validate_cart_line(user_id, product, quantity, line_id=None):
+    """
+    Check one cart line the way every cart endpoint does: one line per
+    product per user (`line_id` is the line being edited, if any), and no
+    more than the product's stock.
+    """
+    lines = Cart.objects.filter(user_id=user_id, product_id=product.pk)
+    if line_id is not None:
+        lines = lines.exclude(pk=line_id)
+    if lines.exists():
+        raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [DUPLICATE_LINE]}, code='unique')
+    if quantity > product.quantity:
+        # A list, as DRF reports the errors raised in a serializer's validate().
+        raise ValidationError({'quantity': [stock_error(product)['quantity']]})
+
+
+def apply_cart_operations(user, operations):
+    """
+    Apply a list of `{'op', 'product', 'quantity'}` operations to the user's
+    cart in one transaction, in order:
+
+    - add: raise the line's quantity by `quantity`, creating it if needed
+    - set: make the line's quantity exactly `quantity`
+    - remove: drop the line
+
+    Products and the existing lines are each read in one query and stock is
+    checked in memory, so the cost does not grow with the number of
+    operations. Changed lines are written with one upsert on the
+    (user, product) unique constraint and removed ones with one DELETE. Any
+    invalid operation rejects the whole batch, with errors listed by index
+    like a DRF list serializer's.
+    """
+    product_ids = {operation['product'] for operation in operations}
+    with immediate_atomic():
+        products = Product.objects.only('quantity').in_bulk(product_ids)
+        current = dict(
+            Cart.objects.select_for_update()
+            .filter(user_id=user.pk, product_id__in=product_ids)
+            .values_list('product_id', 'quantity')
+        )
+
+        quantities = dict(current)
+        errors = [{} for _ in operations]
+        for index, operation in enumerate(operations):
+            product_id = operation['product']
+            product = products.get(product_id)
+            if product is None:
+                errors[index] = {'product': f'Invalid pk "{product_id}" - object does not exist.'}
+                continue
+            if operation['op'] == REMOVE:
+                quantities.pop(product_id, None)
+                continue
+
+            quantity = operation['quantity']
+            if operation['op'] == ADD:
+                quantity += quantities.get(product_id, 0)
+            if quantity > product.quantity:
+                errors[index] = stock_error(product)
+                continue
+            quantities[product_id] = quantity
+
+        if any(errors):
+            raise ValidationError({'operations': errors})
+
+        changed = [
+            Cart(user_id=user.pk, product_id=product_id, quantity=quantity)
+            for product_id, quantity in quantities.items()
+            if current.get(product_id) != quantity
+        ]
+        if changed:
+            Cart.objects.bulk_create(
+                changed, update_conflicts=True, unique_fields=['user', 'product'], update_fields=['quantity']
+            )
+        removed = current.keys() - quantities.keys()
+        if removed:
+            Cart.objects.filter(user_id=user.pk, product_id__in=removed).delete()
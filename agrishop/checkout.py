@@ -0,0 +1,171 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, Sum, When
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .cache import invalidate_catalog_for_write
+from .facets import apply_stock_changes
+from .models import Cart, Order, OrderItem, Product
+from .transactions import immediate_atomic
+
+# Lines per conditional UPDATE; keeps the OR chain well inside SQLite's
+# expression depth limit for very large carts.
+RESERVE_BATCH_SIZE = 200
+
+
+def reservation_ttl():
+    return timedelta(minutes=getattr(settings, 'AGRISHOP_RESERVATION_MINUTES', 15))
+
+
+def checkout(user):
+    """
+    Turn the user's cart into a reserved Order.
+
+    Stock for every line is taken in the same transaction with conditional
+    `UPDATE ... SET quantity = quantity - n WHERE quantity >= n`. If any line
+    cannot be covered the whole order is rolled back, so stock is never
+    oversold and never partially reserved.
+    """
+    with immediate_atomic():
+        lines = list(Cart.objects.filter(user_id=user.pk).with_line_totals())
+        if not lines:
+            raise ValidationError({'cart': 'Your cart is empty.'})
+
+        quantities = {line.product_id: line.quantity for line in lines}
+        reserved = reserve_stock(quantities)
+        if not reserved:
+            transaction.set_rollback(True)
+        else:
+            order = Order.objects.create(
+                user_id=user.pk,
+                status='reserved',
+                total_amount=sum(line.total_price() for line in lines),
+                reserved_until=timezone.now() + reservation_ttl(),
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product_id=line.product_id,
+                    title=line.product.title,
+                    unit_price=line.product.price,
+                    quantity=line.quantity,
+                )
+                for line in lines
+            ])
+            Cart.objects.filter(pk__in=[line.pk for line in lines]).delete()
+
+    if not reserved:
+        raise ValidationError(stock_errors(quantities))
+    return order
+
+
+def reserve_stock(quantities):
+    """
+    Decrement stock for `{product_id: quantity}` in batched conditional
+    UPDATEs. Returns False if any product lacks stock; the caller must then
+    roll the transaction back.
+    """
+    items = list(quantities.items())
+    now = timezone.now()
+    for start in range(0, len(items), RESERVE_BATCH_SIZE):
+        batch = items[start:start + RESERVE_BATCH_SIZE]
+        available = Q()
+        for product_id, quantity in batch:
+            available |= Q(pk=product_id, quantity__gte=quantity)
+        updated = Product.objects.filter(available).update(
+            quantity=Case(
+                *[When(pk=product_id, then=F('quantity') - quantity) for product_id, quantity in batch],
+                default=F('quantity'),
+                output_field=PositiveIntegerField(),
+            ),
+            updated_at=now,
+        )
+        if updated != len(batch):
+            return False
+    apply_stock_changes({product_id: -quantity for product_id, quantity in items})
+    # Cached product payloads include the stock level.
+    invalidate_catalog_for_write('product')
+    return True
+
+
+def restock(order_ids):
+    """Return the stock held by the given orders in one UPDATE."""
+    totals = dict(
+        OrderItem.objects.filter(order_id__in=order_ids, product__isnull=False)
+        .values('product_id')
+        .annotate(quantity=Sum('quantity'))
+        .order_by()
+        .values_list('product_id', 'quantity')
+    )
+    if totals:
+        Product.objects.filter(pk__in=totals).update(
+            quantity=Case(
+                *[When(pk=product_id, then=F('quantity') + quantity) for product_id, quantity in totals.items()],
+                default=F('quantity'),
+                output_field=PositiveIntegerField(),
+            ),
+            updated_at=timezone.now(),
+        )
+        apply_stock_changes(totals)
+        invalidate_catalog_for_write('product')
+
+
+def stock_errors(quantities):
+    stock = dict(Product.objects.filter(pk__in=quantities).values_list('pk', 'quantity'))
+    errors = {}
+    for product_id, quantity in quantities.items():
+        available = stock.get(product_id, 0)
+        if quantity > available:
+            errors[str(product_id)] = f'Only {available} items are available in stock.'
+    return {'quantity': errors or 'Stock changed during checkout, please try again.'}
+
+
+def confirm_order(order):
+    """Confirm a reservation that has not expired yet."""
+    confirmed = Order.objects.filter(
+        pk=order.pk, status='reserved', reserved_until__gt=timezone.now()
+    ).update(status='confirmed', reserved_until=None, updated_at=timezone.now())
+    if not confirmed:
+        raise ValidationError({'status': 'Only active reservations can be confirmed.'})
+    order.refresh_from_db()
+    return order
+
+
+def cancel_order(order):
+    with transaction.atomic():
+        cancelled = Order.objects.filter(pk=order.pk, status='reserved').update(
+            status='cancelled', reserved_until=None, updated_at=timezone.now()
+        )
+        if not cancelled:
+            raise ValidationError({'status': 'Only reserved orders can be cancelled.'})
+        restock([order.pk])
+    order.refresh_from_db()
+    return order
+
+
+def release_expired_reservations(now=None, batch_size=500):
+    """Expire overdue reservations batch by batch and put their stock back."""
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with immediate_atomic():
+            order_ids = list(
+                Order.objects.select_for_update(skip_locked=True)
+                .filter(status='reserved', reserved_until__lte=now)
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not order_ids:
+                return released
+
+            claimed = Order.objects.filter(pk__in=order_ids, status='reserved').update(
+                status='expired', reserved_until=None, updated_at=now
+            )
+            if claimed != len(order_ids):
+                # Another worker got to some of these first; retry the batch.
+                transaction.set_rollback(True)
+                continue
+            restock(order_ids)
+            released += claimed
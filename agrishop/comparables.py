@@ -0,0 +1,225 @@
+"""
+Price-per-area statistics and nearest comparables for land listings.
+
+Each city's asking prices per area, and the winning bids per area of its
+closed listings, are kept as log-scale histograms in LandPriceBucket (a
+DDSketch): bucket i counts the values in (GAMMA^(i-1), GAMMA^i], so a
+quantile read back as its bucket's midpoint is within RELATIVE_ACCURACY
+of the true value. The histograms are updated incrementally: a listing
+write moves its values from their old buckets to their new ones in place
+(an INSERT of missing buckets and one UPDATE), from the model signals and
+from close_expired_auctions. Reads sum a city's bucket rows, a few hundred at
+most whatever the number of listings, and never write. Queryset writes
+that skip both (bulk_create, .update() of area or price) leave the counts
+behind until `manage.py rebuild_price_statistics`.
+
+Comparables are found without reading the city: the nearest listings on
+either side in area and in price per area come from four seeks on the
+(city, area_size) and (city, price_per_area) indexes, and those
+candidates are ranked by distance in log space.
+"""
+import math
+import operator
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from functools import reduce
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+
+from .models import LandBidding, LandPriceBucket
+
+# Changing this changes every bucket index: rebuild_price_statistics after.
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+
+# Quantiles are reported every QUANTILE_STEP percent.
+QUANTILE_STEP = 5
+PERCENTS = list(range(0, 101, QUANTILE_STEP))
+SUMMARY = {'min': 0, 'p10': 10, 'p25': 25, 'median': 50, 'p75': 75, 'p90': 90, 'max': 100}
+# Columns LandComparableSerializer reads from each comparable.
+COMPARABLE_FIELDS = ['title', 'status', 'area_size', 'starting_bid_amount', 'price_per_area', 'current_highest_bid']
+# The listing fields the statistics depend on, in comparable_state order.
+STATE_FIELDS = ['city', 'area_size', 'starting_bid_amount', 'status', 'winning_bid_id', 'current_highest_bid']
+
+
+def comparable_state(listing):
+    """The listing fields the statistics depend on."""
+    return tuple(getattr(listing, field) for field in STATE_FIELDS)
+
+
+def bucket_of(value):
+    return math.ceil(math.log(value) / LOG_GAMMA)
+
+
+def bucket_value(bucket):
+    # The point with equal relative error to both ends of the bucket.
+    return 2 * GAMMA ** bucket / (GAMMA + 1)
+
+
+def listing_values(state):
+    """`{kind: value}` a listing in `state` contributes to its city's histograms."""
+    city, area, price, status, winning_bid_id, highest_bid = state
+    area, price, highest_bid = (float(value or 0) for value in (area, price, highest_bid))
+    values = {}
+    if area > 0:
+        if price > 0:
+            values[LandPriceBucket.ASKING] = price / area
+        # The winning bid is the listing's highest bid.
+        if status == 'closed' and winning_bid_id is not None and highest_bid > 0:
+            values[LandPriceBucket.WINNING] = highest_bid / area
+    return values
+
+
+def listing_changes(before, after, changes=None):
+    """
+    Add to `changes` (`{(city, kind, bucket): delta}`) the moves of one
+    listing from state `before` to `after`, either None when the listing
+    does not exist.
+    """
+    changes = Counter() if changes is None else changes
+    for state, sign in ((before, -1), (after, 1)):
+        if state is not None:
+            for kind, value in listing_values(state).items():
+                changes[state[0], kind, bucket_of(value)] += sign
+    return changes
+
+
+def apply_changes(changes, batch_size=300):
+    """
+    Add `changes` to the bucket counts, two statements per batch of
+    buckets whatever their number: an INSERT of the buckets that do not
+    exist yet, then one UPDATE adding each delta to its count in place, so
+    concurrent writers never lose each other's changes.
+    """
+    changes = [(key, delta) for key, delta in changes.items() if delta]
+    for start in range(0, len(changes), batch_size):
+        batch = changes[start:start + batch_size]
+        LandPriceBucket.objects.bulk_create(
+            [LandPriceBucket(city=city, kind=kind, bucket=bucket) for (city, kind, bucket), _ in batch],
+            ignore_conflicts=True,
+        )
+        keys = [Q(city=city, kind=kind, bucket=bucket) for (city, kind, bucket), _ in batch]
+        LandPriceBucket.objects.filter(reduce(operator.or_, keys)).update(count=F('count') + Case(
+            *[When(key, then=Value(delta)) for key, (_, delta) in zip(keys, batch)], default=Value(0),
+        ))
+
+
+def rebuild_statistics(cities=None, batch_size=5000):
+    """Recount the histograms of `cities` (default: every city) from the listings."""
+    cities = list(cities or [city for city, _ in LandBidding.CITY_CHOICES])
+    changes = Counter()
+    states = LandBidding.objects.filter(city__in=cities).values_list(*STATE_FIELDS)
+    for state in states.iterator(chunk_size=batch_size):
+        listing_changes(None, state, changes)
+    with transaction.atomic():
+        LandPriceBucket.objects.filter(city__in=cities).delete()
+        LandPriceBucket.objects.bulk_create(
+            [LandPriceBucket(city=city, kind=kind, bucket=bucket, count=count)
+             for (city, kind, bucket), count in changes.items()],
+            batch_size=batch_size,
+        )
+    return len(changes)
+
+
+class Histogram:
+    """One city's histogram of one kind, as read back from its bucket rows."""
+
+    def __init__(self, buckets=(), counts=()):
+        order = np.argsort(buckets)
+        self.buckets = np.asarray(buckets, dtype=int)[order]
+        self.cumulative = np.cumsum(np.asarray(counts, dtype=int)[order])
+        self.count = int(self.cumulative[-1]) if len(self.cumulative) else 0
+
+    def quantiles(self):
+        """Values at PERCENTS, each its bucket's midpoint."""
+        if not self.count:
+            return []
+        # The value of rank r is in the first bucket holding more than r values.
+        ranks = np.array(PERCENTS) / 100 * (self.count - 1)
+        positions = np.searchsorted(self.cumulative, ranks, side='right')
+        return [round(bucket_value(int(self.buckets[position])), 2) for position in positions]
+
+    def percentile(self, value):
+        """Percent of the values at most `value`, to the bucket."""
+        if not self.count or value is None:
+            return None
+        if value <= 0:
+            return 0.0
+        position = np.searchsorted(self.buckets, bucket_of(value), side='right')
+        at_most = int(self.cumulative[position - 1]) if position else 0
+        return round(100 * at_most / self.count, 1)
+
+
+@dataclass
+class CityStatistics:
+    city: str
+    asking: Histogram
+    winning: Histogram
+
+
+def city_statistics(cities=None):
+    """CityStatistics for `cities` (default: every city), from their bucket rows."""
+    cities = list(cities or [city for city, _ in LandBidding.CITY_CHOICES])
+    rows = defaultdict(lambda: ([], []))
+    buckets = LandPriceBucket.objects.filter(city__in=cities, count__gt=0).values_list('city', 'kind', 'bucket', 'count')
+    for city, kind, bucket, count in buckets:
+        rows[city, kind][0].append(bucket)
+        rows[city, kind][1].append(count)
+    return [
+        CityStatistics(
+            city,
+            Histogram(*rows[city, LandPriceBucket.ASKING]),
+            Histogram(*rows[city, LandPriceBucket.WINNING]),
+        )
+        for city in cities
+    ]
+
+
+def summarize(histogram):
+    points = histogram.quantiles()
+    if not points:
+        return {'count': histogram.count, **{name: None for name in SUMMARY}}
+    return {'count': histogram.count, **{name: points[percent // QUANTILE_STEP] for name, percent in SUMMARY.items()}}
+
+
+def statistics_data(statistics):
+    return {
+        'city': statistics.city,
+        'asking_price_per_area': summarize(statistics.asking),
+        'winning_bid_per_area': summarize(statistics.winning),
+    }
+
+
+def nearest_comparables(listing, limit):
+    """
+    The `limit` listings in `listing`'s city closest to it in area and in
+    price per area, nearest first, each with a `distance`: the sum of the
+    absolute log ratios of the two (so 10 vs 20 acres counts as much as
+    100 vs 200). Listings without an area or asking price are never
+    comparable.
+    """
+    if not listing.price_per_area:
+        return []
+    base = LandBidding.objects.filter(city=listing.city, price_per_area__gt=0).exclude(pk=listing.pk)
+    area, price = listing.area_size, listing.price_per_area
+    seeks = [
+        base.filter(area_size__gte=area).order_by('area_size'),
+        base.filter(area_size__lt=area).order_by('-area_size'),
+        base.filter(price_per_area__gte=price).order_by('price_per_area'),
+        base.filter(price_per_area__lt=price).order_by('-price_per_area'),
+    ]
+    condition = Q()
+    for seek in seeks:
+        condition |= Q(pk__in=seek.values('pk')[:limit])
+    candidates = list(LandBidding.objects.filter(condition).only(*COMPARABLE_FIELDS))
+
+    for candidate in candidates:
+        candidate.distance = (
+            abs(math.log(float(candidate.area_size) / float(area)))
+            + abs(math.log(candidate.price_per_area / price))
+        )
+    candidates.sort(key=lambda candidate: (candidate.distance, candidate.pk))
+    return candidates[:limit]
@@ -0,0 +1,105 @@
+"""
+Response compression for clients on slow mobile links.
+
+Brotli is used when the client accepts `br` and the optional `brotli`
+package is installed (`pip install brotli`); gzip otherwise. Streaming
+responses (exports, the SSE feed) pass through untouched, so events are
+never held back in a compressor buffer.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Bodies smaller than this go out as they are.
+    'MIN_SIZE': 512,
+    # 0-11; 4-5 is close to gzip's speed at a better ratio.
+    'BROTLI_QUALITY': 5,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'AGRISHOP_COMPRESSION', {}).get(name, DEFAULTS[name])
+
+
+def accepted_encodings(header):
+    """Content codings in an Accept-Encoding header that are not refused with q=0."""
+    accepted = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = params.strip().removeprefix('q=')
+        try:
+            refused = params and float(quality) == 0
+        except ValueError:
+            refused = False
+        if coding and not refused:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def choose_encoding(header):
+    accepted = accepted_encodings(header)
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=get_setting('BROTLI_QUALITY'))
+    # Random bytes in the gzip header vary the length, as GZipMiddleware does against BREACH.
+    return compress_string(content, max_random_bytes=100)
+
+
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if (
+            not get_setting('ENABLED')
+            or response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < get_setting('MIN_SIZE')
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # The body is no longer byte-identical to the uncompressed one.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
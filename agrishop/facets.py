@@ -0,0 +1,186 @@
+"""
+Per-category product aggregates and the facet counts served by
+`/api/products/facets/`.
+
+CategoryAggregate rows are adjusted incrementally: single Product saves and
+deletes through the signal handlers, stock moves made with queryset UPDATEs
+(checkout, restocking) through apply_stock_changes, and bulk imports by
+recomputing the categories they touched. Counts and stock move by deltas;
+min/max price are re-read through the (category, price) index, which is a
+seek rather than a scan.
+"""
+import math
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.db.models import BooleanField, Case, Count, F, IntegerField, Max, Min, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Floor, Greatest, Least
+
+from .models import Category, CategoryAggregate, Product
+
+AGGREGATE_FIELDS = ['product_count', 'in_stock_count', 'total_stock', 'min_price', 'max_price']
+CENT = Decimal('0.01')
+
+
+def refresh_category_aggregates(category_ids=None):
+    """Recompute the aggregates of `category_ids`, or of every category, in one grouped query."""
+    products = Product.objects.order_by().exclude(category_id=None)
+    categories = Category.objects.all()
+    if category_ids is not None:
+        category_ids = set(category_ids) - {None}
+        if not category_ids:
+            return
+        products = products.filter(category_id__in=category_ids)
+        categories = categories.filter(pk__in=category_ids)
+
+    totals = {
+        row.pop('category_id'): row
+        for row in products.values('category_id').annotate(
+            product_count=Count('pk'),
+            in_stock_count=Count('pk', filter=Q(quantity__gt=0)),
+            total_stock=Sum('quantity'),
+            min_price=Min('price'),
+            max_price=Max('price'),
+        )
+    }
+    CategoryAggregate.objects.bulk_create(
+        [CategoryAggregate(category_id=pk, **totals.get(pk, {})) for pk in categories.values_list('pk', flat=True)],
+        update_conflicts=True,
+        unique_fields=['category'],
+        update_fields=AGGREGATE_FIELDS,
+        batch_size=500,
+    )
+
+
+def adjust_category_aggregates(deltas):
+    """
+    Apply `{category_id: (products, in_stock, stock)}` deltas in one UPDATE
+    and re-read each category's price range. Categories without a row yet
+    are recomputed instead.
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if pk is not None}
+    if not deltas:
+        return
+
+    def shift(column, position):
+        return F(column) + Case(
+            *[When(pk=pk, then=Value(delta[position])) for pk, delta in deltas.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+
+    prices = Product.objects.filter(category_id=OuterRef('pk')).values('price')
+    updated = CategoryAggregate.objects.filter(pk__in=deltas).update(
+        product_count=shift('product_count', 0),
+        in_stock_count=shift('in_stock_count', 1),
+        total_stock=shift('total_stock', 2),
+        min_price=Subquery(prices.order_by('price')[:1]),
+        max_price=Subquery(prices.order_by('-price')[:1]),
+    )
+    if updated < len(deltas):
+        existing = CategoryAggregate.objects.filter(pk__in=deltas).values_list('pk', flat=True)
+        refresh_category_aggregates(deltas.keys() - set(existing))
+
+
+def apply_product_change(before, after):
+    """
+    Move one product's contribution from `before` to `after`, each a
+    `(category_id, price, quantity)` tuple or None when it does not exist.
+    """
+    if before == after:
+        return
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for state, sign in ((before, -1), (after, 1)):
+        if state is not None:
+            category_id, _, quantity = state
+            delta = deltas[category_id]
+            delta[0] += sign
+            delta[1] += sign * int(quantity > 0)
+            delta[2] += sign * quantity
+    adjust_category_aggregates(deltas)
+
+
+def apply_stock_changes(changes):
+    """
+    Update aggregates for `{product_id: quantity delta}` that a queryset
+    UPDATE has already written; reads the products' new stock once.
+    """
+    if not changes:
+        return
+    deltas = defaultdict(lambda: [0, 0, 0])
+    rows = Product.objects.filter(pk__in=changes).exclude(category_id=None).values_list('pk', 'category_id', 'quantity')
+    for pk, category_id, quantity in rows:
+        was_in_stock = quantity - changes[pk] > 0
+        deltas[category_id][1] += int(quantity > 0) - int(was_in_stock)
+        deltas[category_id][2] += changes[pk]
+    adjust_category_aggregates(deltas)
+
+
+def price_edges(low, high, buckets):
+    """
+    Edges of at most `buckets` (+1 after rounding) equal-width price ranges
+    covering [low, high], with a 1/2/5 x 10^n width of at least a cent.
+    """
+    if low is None or high is None:
+        return []
+    span = high - low
+    if span <= 0:
+        return [low.quantize(CENT), (low + 1).quantize(CENT)]
+    raw = span / buckets
+    magnitude = Decimal(10) ** math.floor(math.log10(raw))
+    # Prices are whole cents: a narrower step would round to repeated edges.
+    step = max(CENT, next(magnitude * m for m in (1, 2, 5, 10) if magnitude * m >= raw))
+    start = (low // step) * step
+    count = max(1, math.ceil((high - start) / step))
+    return sorted({(start + step * i).quantize(CENT) for i in range(count + 1)})
+
+
+def facet_counts(queryset, buckets, category_id=None):
+    """
+    Category counts, a price histogram and stock availability for the
+    products in `queryset`, from one grouped query. The histogram edges
+    come from the aggregates of `category_id`, or of every category.
+    """
+    aggregates = CategoryAggregate.objects.select_related('category').order_by('category__name')
+    names, lows, highs = {}, [], []
+    for aggregate in aggregates:
+        names[aggregate.category_id] = aggregate.category.name
+        if category_id in (None, aggregate.category_id) and aggregate.min_price is not None:
+            lows.append(aggregate.min_price)
+            highs.append(aggregate.max_price)
+    edges = price_edges(min(lows, default=None), max(highs, default=None), buckets)
+
+    if edges:
+        step = edges[1] - edges[0]
+        index = Cast(Floor((F('price') - Value(edges[0])) / Value(step)), IntegerField())
+        bucket = Greatest(Least(index, Value(len(edges) - 2)), Value(0))
+    else:
+        bucket = Value(0)
+    rows = (
+        queryset.order_by()
+        .annotate(
+            bucket=bucket,
+            in_stock=Case(When(quantity__gt=0, then=Value(True)), default=Value(False), output_field=BooleanField()),
+        )
+        .values('category_id', 'bucket', 'in_stock')
+        .annotate(count=Count('pk'))
+    )
+
+    categories, histogram, availability = Counter(), Counter(), Counter()
+    for row in rows:
+        categories[row['category_id']] += row['count']
+        histogram[row['bucket']] += row['count']
+        availability[row['in_stock']] += row['count']
+
+    return {
+        'total': sum(availability.values()),
+        'categories': [
+            {'id': pk, 'name': names[pk], 'count': categories[pk]}
+            for pk in names if categories[pk]
+        ],
+        'price': [
+            {'min': str(edges[i]), 'max': str(edges[i + 1]), 'count': histogram[i]}
+            for i in range(len(edges) - 1)
+        ],
+        'availability': {'in_stock': availability[True], 'out_of_stock': availability[False]},
+    }
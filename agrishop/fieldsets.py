@@ -0,0 +1,82 @@
+"""
+Sparse fieldsets: `?fields=id,title,price` trims every serialized item to
+those fields, and the SELECT behind a list or detail to the columns they
+read.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = 'fields'
+NARROWED_ACTIONS = ('list', 'retrieve')
+
+
+def parse_fields(request):
+    """The sorted field names in `?fields=`, or None when absent or blank."""
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return None
+    raw = request.query_params.get(FIELDS_PARAM, '')
+    names = sorted({name.strip() for name in raw.split(',') if name.strip()})
+    return names or None
+
+
+class SparseFieldsSerializerMixin:
+    """Keep only the fields named in the `fields` serializer context."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self.context.get('fields')
+        if requested:
+            fields = {name: field for name, field in fields.items() if name in requested}
+        return fields
+
+
+class SparseFieldsetMixin:
+    """
+    View side of sparse fieldsets. Names the serializer of the current
+    action does not have are a 400. List and retrieve querysets are
+    narrowed with `.only()` to the columns the serializer in use reads,
+    plus the ordering columns keyset pagination needs for its cursors. Method fields map to a column by name, or
+    through the serializer's `field_columns`.
+    """
+
+    def requested_fields(self):
+        if not hasattr(self, '_requested_fields'):
+            names = parse_fields(self.request)
+            if names:
+                available = self.get_serializer_class()().fields
+                unknown = [name for name in names if name not in available]
+                if unknown:
+                    raise ValidationError({FIELDS_PARAM: f'Unknown fields: {", ".join(unknown)}.'})
+            self._requested_fields = names
+        return self._requested_fields
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.requested_fields()
+        return context
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if getattr(self, 'action', None) not in NARROWED_ACTIONS:
+            return queryset
+        columns = self.loaded_columns(queryset.model)
+        return queryset if columns is None else queryset.only(*columns)
+
+    def loaded_columns(self, model):
+        """Model fields the serializer reads, or None if it reads anything else."""
+        columns = {model._meta.pk.name, *self.ordering_columns()}
+        serializer = self.get_serializer()
+        field_columns = getattr(serializer, 'field_columns', {})
+        for name, field in serializer.fields.items():
+            source = field_columns.get(name) or (name if field.source == '*' else field.source)
+            try:
+                columns.add(model._meta.get_field(source.split('.')[0]).name)
+            except FieldDoesNotExist:
+                return None
+        return sorted(columns)
+
+    def ordering_columns(self):
+        ordering = list(getattr(self, 'ordering_fields', None) or [])
+        default = getattr(self.pagination_class, 'ordering', None) or ()
+        ordering.extend([default] if isinstance(default, str) else default)
+        return {field.lstrip('-') for field in ordering if field != '__all__'}
@@ -0,0 +1,127 @@
+import hashlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .cache import invalidate_catalog_for_write
+
+logger = logging.getLogger(__name__)
+
+# Bounding boxes for each derivative; aspect ratio is preserved.
+DERIVATIVE_SIZES = {
+    'thumb': (200, 150),
+    'card': (400, 300),
+    'full': (800, 600),
+}
+
+DEFAULTS = {
+    'ASYNC': True,
+    'WORKERS': 2,
+    'JPEG_QUALITY': 85,
+    'WEBP_QUALITY': 80,
+}
+
+_executor = None
+
+
+def get_setting(name):
+    return getattr(settings, 'AGRISHOP_IMAGE_PIPELINE', {}).get(name, DEFAULTS[name])
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=get_setting('WORKERS'),
+            thread_name_prefix='product-images',
+        )
+    return _executor
+
+
+def schedule_derivatives(product_id):
+    """
+    Queue derivative generation once the surrounding transaction commits,
+    so the worker never reads a product row or file that was rolled back.
+    """
+    def submit():
+        if get_setting('ASYNC'):
+            get_executor().submit(_run_in_worker, product_id)
+        else:
+            generate_derivatives(product_id)
+
+    transaction.on_commit(submit)
+
+
+def _run_in_worker(product_id):
+    close_old_connections()
+    try:
+        generate_derivatives(product_id)
+    except Exception:
+        logger.exception('Generating image derivatives for product %s failed', product_id)
+    finally:
+        close_old_connections()
+
+
+def file_digest(field_file):
+    digest = hashlib.sha256()
+    with field_file.open('rb') as handle:
+        for chunk in handle.chunks():
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def generate_derivatives(product_id):
+    from .models import Product
+
+    product = Product.objects.filter(pk=product_id).only('image', 'image_hash', 'image_derivatives').first()
+    if product is None or not product.image:
+        return
+
+    digest = file_digest(product.image)
+    if digest == product.image_hash and product.image_derivatives:
+        # Same bytes re-uploaded under a new name: nothing to redo.
+        return
+
+    with product.image.open('rb') as handle:
+        source = Image.open(handle)
+        source = ImageOps.exif_transpose(source)
+        source.load()
+
+    if source.mode not in ('RGB', 'RGBA'):
+        source = source.convert('RGBA' if 'transparency' in source.info else 'RGB')
+
+    derivatives = {}
+    base = f'product_images/derivatives/{digest[:2]}/{digest}'
+    for size_name, box in DERIVATIVE_SIZES.items():
+        image = source.copy()
+        image.thumbnail(box)
+        derivatives[size_name] = {
+            'width': image.width,
+            'height': image.height,
+            'jpeg': _store(f'{base}/{size_name}.jpg', image.convert('RGB'), 'JPEG',
+                           quality=get_setting('JPEG_QUALITY'), optimize=True),
+            'webp': _store(f'{base}/{size_name}.webp', image, 'WEBP',
+                           quality=get_setting('WEBP_QUALITY')),
+        }
+
+    # A queryset update keeps Product.save() (and this pipeline) out of the loop.
+    Product.objects.filter(pk=product_id, image=product.image.name).update(
+        image_hash=digest,
+        image_derivatives=derivatives,
+    )
+    invalidate_catalog_for_write('product')
+
+
+def _store(name, image, image_format, **options):
+    # Paths are content addressed, so an existing file already holds these bytes.
+    if default_storage.exists(name):
+        return name
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **options)
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
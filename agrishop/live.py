@@ -0,0 +1,250 @@
+"""
+In-process pub/sub behind the live auction feed (Server-Sent Events).
+
+place_bid and listing updates publish once their transaction commits;
+each SSE connection subscribes to a set of listings and gets their events
+pushed instead of polling. Every event has a feed-wide increasing id,
+`<epoch>-<sequence>`, and the last HISTORY events per listing are kept so
+a reconnecting client can resume from its Last-Event-ID. The epoch is
+drawn afresh whenever a process starts its feed, as the sequence restarts
+at 1 with it: ids of another epoch (a restarted process, or another
+worker) are never resumed. When the gap can no longer be replayed (evicted
+history, or an id of another epoch) the stream starts with a `snapshot`
+event per listing built from the database instead.
+
+The feed lives in one process: with several ASGI workers, a client only
+sees bids placed through the worker it is connected to.
+"""
+import asyncio
+import itertools
+import json
+import secrets
+import threading
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import transaction
+
+DEFAULTS = {
+    # Events kept per listing for Last-Event-ID resume.
+    'HISTORY': 100,
+    # Undelivered events a subscriber may fall behind by before it is
+    # disconnected (it then reconnects and resumes from history).
+    'QUEUE_SIZE': 256,
+    # Seconds between keepalive comments on an idle stream.
+    'KEEPALIVE': 15,
+    # Listings one stream may subscribe to.
+    'MAX_LISTINGS': 50,
+    # Reconnect delay sent to EventSource clients, in milliseconds.
+    'RETRY_MS': 3000,
+}
+
+BID = 'bid'
+STATUS = 'status'
+CLOSING = 'closing'
+SNAPSHOT = 'snapshot'
+
+
+def get_setting(name):
+    return getattr(settings, 'AGRISHOP_LIVE', {}).get(name, DEFAULTS[name])
+
+
+@dataclass(frozen=True)
+class Event:
+    id: int
+    listing_id: int
+    type: str
+    data: dict
+    epoch: str = ''
+
+    @property
+    def event_id(self):
+        return f'{self.epoch}-{self.id}'
+
+    def encode(self):
+        payload = json.dumps({'land_listing': self.listing_id, **self.data}, separators=(',', ':'))
+        return f'id: {self.event_id}\nevent: {self.type}\ndata: {payload}\n\n'
+
+
+@dataclass(eq=False)
+class Subscription:
+    listing_ids: frozenset
+    loop: asyncio.AbstractEventLoop
+    # Feed position when the subscription was registered.
+    position: int = 0
+    # Buffered events newer than the client's Last-Event-ID, oldest first.
+    backlog: list = field(default_factory=list)
+    # False when the backlog cannot cover everything the client missed.
+    resumed: bool = False
+    overflowed: bool = False
+    queue: asyncio.Queue = field(default_factory=asyncio.Queue)
+
+    def deliver(self, event):
+        # Runs on the subscriber's event loop.
+        if self.overflowed:
+            return
+        if self.queue.qsize() >= get_setting('QUEUE_SIZE'):
+            self.overflowed = True
+            event = None
+        self.queue.put_nowait(event)
+
+
+class AuctionFeed:
+    """Fan-out of listing events to the subscriptions of this process."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._lock = threading.Lock()
+        self.epoch = secrets.token_hex(4)
+        self._ids = itertools.count(1)
+        self._last_id = 0
+        self._history = defaultdict(lambda: deque(maxlen=get_setting('HISTORY')))
+        # Id of the newest event evicted from each listing's history.
+        self._evicted = {}
+        self._subscribers = defaultdict(set)
+
+    def publish(self, listing_id, type, data):
+        """Record an event and push it to the listing's subscribers; thread-safe."""
+        with self._lock:
+            event = Event(next(self._ids), listing_id, type, data, self.epoch)
+            self._last_id = event.id
+            history = self._history[listing_id]
+            if len(history) == history.maxlen:
+                self._evicted[listing_id] = history[0].id
+            history.append(event)
+            subscribers = list(self._subscribers.get(listing_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The subscriber's loop has closed; unsubscribe will follow.
+                pass
+        return event
+
+    def parse_event_id(self, value):
+        """The sequence of event id `value`, or None unless it is of this epoch."""
+        epoch, _, sequence = (value or '').rpartition('-')
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        return int(sequence)
+
+    def subscribe(self, listing_ids, last_event_id=None):
+        """
+        Register the running event loop for `listing_ids` events; resume
+        after the sequence `last_event_id` when history still covers it.
+        """
+        subscription = Subscription(frozenset(listing_ids), asyncio.get_running_loop())
+        with self._lock:
+            for listing_id in subscription.listing_ids:
+                self._subscribers[listing_id].add(subscription)
+            subscription.position = self._last_id
+            subscription.resumed = last_event_id is not None and last_event_id <= self._last_id and all(
+                self._evicted.get(listing_id, 0) <= last_event_id for listing_id in subscription.listing_ids
+            )
+            if subscription.resumed:
+                subscription.backlog = sorted(
+                    (
+                        event
+                        for listing_id in subscription.listing_ids
+                        for event in self._history.get(listing_id, ())
+                        if event.id > last_event_id
+                    ),
+                    key=lambda event: event.id,
+                )
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for listing_id in subscription.listing_ids:
+                subscribers = self._subscribers.get(listing_id)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[listing_id]
+
+    def subscriber_count(self, listing_id):
+        with self._lock:
+            return len(self._subscribers.get(listing_id, ()))
+
+
+feed = AuctionFeed()
+
+
+def listing_state(listing):
+    """The fields every status, closing and snapshot event carries."""
+    highest = listing['current_highest_bid']
+    ends_at = listing['ends_at']
+    return {
+        'status': listing['status'],
+        'current_highest_bid': None if highest is None else str(highest),
+        'bid_count': listing['bid_count'],
+        'ends_at': None if ends_at is None else ends_at.isoformat(),
+    }
+
+
+def publish_on_commit(listing_id, type, data):
+    transaction.on_commit(lambda: feed.publish(listing_id, type, data))
+
+
+def publish_bid(bid):
+    publish_on_commit(bid.land_listing_id, BID, {
+        'bid': bid.pk,
+        'bid_amount': str(bid.bid_amount),
+        'bid_time': bid.bid_time.isoformat(),
+    })
+
+
+def publish_status_change(listing_id, listing, previous_status):
+    """
+    Announce a status change of the listing whose fields are in `listing`.
+
+    Closing also sends a closing event naming the winning bid and bidder,
+    when `listing` has them (`winning_bid_id`, `winning_bid__bidder_id`).
+    """
+    if listing['status'] == previous_status:
+        return
+    state = listing_state(listing)
+    publish_on_commit(listing_id, STATUS, {**state, 'previous_status': previous_status})
+    if listing['status'] == 'closed':
+        publish_on_commit(listing_id, CLOSING, {
+            **state,
+            'winning_bid': listing.get('winning_bid_id'),
+            'winner': listing.get('winning_bid__bidder_id'),
+        })
+
+
+async def event_stream(listing_ids, last_event_id=None):
+    """SSE chunks for `listing_ids` until the client goes away or falls behind."""
+    from .models import LandBidding
+
+    subscription = feed.subscribe(listing_ids, last_event_id)
+    try:
+        yield f'retry: {get_setting("RETRY_MS")}\n\n'
+        if not subscription.resumed:
+            listings = LandBidding.objects.filter(pk__in=subscription.listing_ids).values(
+                'pk', 'status', 'current_highest_bid', 'bid_count', 'ends_at'
+            )
+            async for listing in listings:
+                yield Event(subscription.position, listing['pk'], SNAPSHOT, listing_state(listing), feed.epoch).encode()
+        sent = subscription.position if not subscription.resumed else last_event_id
+        for event in subscription.backlog:
+            sent = event.id
+            yield event.encode()
+
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), get_setting('KEEPALIVE'))
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if event is None:
+                # Fell too far behind; the client reconnects with its Last-Event-ID.
+                return
+            if event.id > sent:
+                sent = event.id
+                yield event.encode()
+    finally:
+        feed.unsubscribe(subscription)
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from agrishop.models import CustomUser
+from agrishop.queryplans import check_endpoints
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN every SELECT the main API endpoints run against the current data and '
+        'fail on full table scans and on sorts no index serves.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Email of the user for authenticated endpoints. Defaults to the first user.')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan, not just failing ones.')
+
+    def handle(self, *args, **options):
+        users = CustomUser.objects.order_by('pk')
+        if options['user']:
+            users = users.filter(email=options['user'])
+        user = users.first()
+        if options['user'] and user is None:
+            raise CommandError(f'No user with email {options["user"]}.')
+
+        try:
+            findings, skipped = check_endpoints(user=user)
+        except NotImplementedError as exc:
+            raise CommandError(str(exc))
+
+        failed = [finding for finding in findings if finding.problems]
+        for finding in findings:
+            if not (finding.problems or options['verbose_plans']):
+                continue
+            if finding.problems:
+                self.stdout.write(self.style.ERROR(f'{finding.endpoint}: {"; ".join(finding.problems)}'))
+            else:
+                self.stdout.write(f'{finding.endpoint}: ok')
+            self.stdout.write(f'  {finding.sql[:300]}')
+            for line in finding.plan:
+                self.stdout.write(f'    {line}')
+        for path, reason in skipped:
+            self.stdout.write(self.style.WARNING(f'Skipped {path}: {reason}'))
+
+        if failed:
+            raise CommandError(f'{len(failed)} of {len(findings)} queries need an index.')
+        self.stdout.write(self.style.SUCCESS(f'Checked {len(findings)} queries; every one is served by an index.'))
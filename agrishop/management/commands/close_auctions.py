@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from agrishop.auctions import close_expired_auctions, get_setting
+
+
+class Command(BaseCommand):
+    help = (
+        'Close land listings whose end time has passed and record their winners. '
+        'Run it from cron, or with --every to keep it running as the scheduler.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=get_setting('BATCH_SIZE'))
+        parser.add_argument(
+            '--every', type=float, metavar='SECONDS',
+            help='Repeat every SECONDS until interrupted instead of running once.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            closed = close_expired_auctions(batch_size=options['batch_size'])
+            if closed or not options['every']:
+                self.stdout.write(self.style.SUCCESS(f'Closed {closed} expired auctions.'))
+            if not options['every']:
+                return
+            try:
+                time.sleep(options['every'])
+            except KeyboardInterrupt:
+                return
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from agrishop.bulk import export_rows, write_rows
+from agrishop.management.commands.import_products import guess_format
+
+
+class Command(BaseCommand):
+    help = 'Stream every product to CSV or JSON Lines without loading the table into memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="Output file, or '-' for stdout.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension, else csv.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or guess_format(path) or 'csv'
+
+        started = time.perf_counter()
+        if path == '-':
+            count = write_rows(export_rows(options['chunk_size']), self.stdout, fmt)
+        else:
+            with open(path, 'w', newline='', encoding='utf-8') as stream:
+                count = write_rows(export_rows(options['chunk_size']), stream, fmt)
+        seconds = time.perf_counter() - started
+
+        # Keep the summary off stdout when stdout carries the export itself.
+        summary = self.stderr if path == '-' else self.stdout
+        summary.write(f'Exported {count} products in {seconds:.2f}s ({count / seconds if seconds else 0:.0f} rows/s).')
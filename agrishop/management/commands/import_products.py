@@ -0,0 +1,54 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from agrishop.bulk import import_products, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Upsert products from a CSV or JSON Lines supplier feed, keyed on sku.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Feed file, or '-' for stdin.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        path = options['path']
+        fmt = options['format'] or guess_format(path)
+        if fmt is None:
+            raise CommandError('Cannot infer the feed format; pass --format.')
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            stats = import_products(
+                read_rows(stream, fmt),
+                chunk_size=options['chunk_size'],
+                progress=self.report_progress,
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for line, error in stats.errors[:20]:
+            self.stderr.write(f'Row {line}: {error}')
+        if len(stats.errors) > 20:
+            self.stderr.write(f'... and {len(stats.errors) - 20} more invalid rows')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {stats.imported} of {stats.rows} rows in {stats.seconds:.2f}s '
+            f'({stats.rows_per_second:.0f} rows/s, {len(stats.errors)} skipped).'
+        ))
+
+    def report_progress(self, stats):
+        if self.verbosity > 1:
+            self.stdout.write(f'{stats.rows} rows, {stats.rows_per_second:.0f} rows/s')
+
+
+def guess_format(path):
+    if path.endswith('.csv'):
+        return 'csv'
+    if path.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return None
@@ -0,0 +1,79 @@
+import glob
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from agrishop.perf import ViewStats, get_setting
+
+SORT_KEYS = {
+    'p50': ('wall_ms', 'p50'),
+    'p95': ('wall_ms', 'p95'),
+    'p99': ('wall_ms', 'p99'),
+    'queries': ('queries', 'mean'),
+    'db': ('db_ms', 'p95'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Print the slowest API endpoints from the PerfMiddleware snapshots of every worker '
+        'and flag N+1 query patterns.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help='Snapshot directory. Defaults to AGRISHOP_PERF["SNAPSHOT_DIR"].')
+        parser.add_argument('--sort', choices=sorted(SORT_KEYS), default='p95')
+        parser.add_argument('--limit', type=int, default=15)
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or get_setting('SNAPSHOT_DIR')
+        if not directory:
+            raise CommandError('No snapshot directory: pass --dir or set AGRISHOP_PERF["SNAPSHOT_DIR"].')
+        paths = sorted(glob.glob(os.path.join(glob.escape(os.fspath(directory)), 'perf-*.json')))
+        if not paths:
+            raise CommandError(f'No snapshots in {directory}; the middleware writes them after serving traffic.')
+
+        # Percentiles are recomputed over every worker's samples together.
+        merged = {}
+        for path in paths:
+            with open(path, encoding='utf-8') as stream:
+                for name, dumped in json.load(stream)['views'].items():
+                    merged.setdefault(name, ViewStats(None)).merge(dumped)
+        views = {name: stats.summary() for name, stats in merged.items()}
+
+        metric, stat = SORT_KEYS[options['sort']]
+        ranked = sorted(views.items(), key=lambda item: item[1]['metrics'][metric][stat], reverse=True)
+
+        headers = ['view', 'requests', 'p50 ms', 'p95 ms', 'p99 ms', 'queries', 'db p95 ms', 'ser p95 ms', 'bytes p50', '']
+        rows = []
+        for name, summary in ranked[:options['limit']]:
+            m = summary['metrics']
+            rows.append([
+                name,
+                summary['count'],
+                f"{m['wall_ms']['p50']:.1f}",
+                f"{m['wall_ms']['p95']:.1f}",
+                f"{m['wall_ms']['p99']:.1f}",
+                f"{m['queries']['mean']:.1f}",
+                f"{m['db_ms']['p95']:.1f}",
+                f"{m['serialize_ms']['p95']:.1f}",
+                f"{m['bytes']['p50']:.0f}",
+                'N+1' if summary['n_plus_one'] else '',
+            ])
+        self.write_table(headers, rows)
+
+        flagged = [(name, summary) for name, summary in ranked if summary['n_plus_one']]
+        if not flagged:
+            self.stdout.write(self.style.SUCCESS('\nNo N+1 query patterns seen.'))
+            return
+        self.stdout.write(self.style.WARNING(f'\nPossible N+1 query patterns in {len(flagged)} views:'))
+        for name, summary in flagged:
+            self.stdout.write(f"{name}: {summary['n_plus_one']} of {summary['count']} requests")
+            for statement in summary['repeated_statements']:
+                self.stdout.write(f"  x{statement['count']}  {statement['sql'][:200]}")
+
+    def write_table(self, headers, rows):
+        widths = [max(len(str(value)) for value in column) for column in zip(headers, *rows)]
+        for row in [headers, *rows]:
+            self.stdout.write('  '.join(str(value).ljust(width) for value, width in zip(row, widths)).rstrip())
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from agrishop.comparables import rebuild_statistics
+from agrishop.models import LandBidding
+
+
+class Command(BaseCommand):
+    help = (
+        'Recount the land listing price-per-area histograms from the listings, '
+        'after bulk writes that bypassed them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('cities', nargs='*', help='Cities to rebuild (default: all).')
+
+    def handle(self, *args, **options):
+        cities = options['cities']
+        unknown = set(cities) - {city for city, _ in LandBidding.CITY_CHOICES}
+        if unknown:
+            raise CommandError(f"Unknown cities: {', '.join(sorted(unknown))}.")
+        buckets = rebuild_statistics(cities or None)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {buckets} price buckets.'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from agrishop.search import SEARCH_INDEX_TABLES, rebuild_search_indexes
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the FTS5 product and land listing search indexes from their tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='Database alias to rebuild the indexes on.',
+        )
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if connections[using].vendor != 'sqlite':
+            raise CommandError('Full-text search indexes are only available on SQLite.')
+
+        rebuild_search_indexes(using)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {', '.join(SEARCH_INDEX_TABLES)}."
+        ))
@@ -0,0 +1,88 @@
+# Generated by Django 5.1.5 on 2026-10-18 06:59
+
+import agrishop.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+# (content table, FTS5 table) pairs; both index `title` and `description`.
+INDEXES = [
+    ('agrishop_product', 'agrishop_product_fts'),
+    ('agrishop_landbidding', 'agrishop_landbidding_fts'),
+]
+
+
+def create_fts_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, fts in INDEXES:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {fts} USING fts5("
+            f"title, description, content='{table}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, title, description) "
+            f"VALUES (new.id, new.title, new.description); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, title, description) "
+            f"VALUES ('delete', old.id, old.title, old.description); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts}_au AFTER UPDATE OF title, description ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, title, description) "
+            f"VALUES ('delete', old.id, old.title, old.description); "
+            f"INSERT INTO {fts}(rowid, title, description) "
+            f"VALUES (new.id, new.title, new.description); END"
+        )
+        schema_editor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def drop_fts_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, fts in INDEXES:
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {fts}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agrishop', '0005_product_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LandBiddingSearchIndex',
+            fields=[
+                ('land_listing', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='agrishop.landbidding')),
+                ('title', models.TextField()),
+                ('description', models.TextField()),
+                ('document', agrishop.search.SearchDocumentField(db_column='agrishop_landbidding_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'agrishop_landbidding_fts',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSearchIndex',
+            fields=[
+                ('product', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='agrishop.product')),
+                ('title', models.TextField()),
+                ('description', models.TextField()),
+                ('document', agrishop.search.SearchDocumentField(db_column='agrishop_product_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'agrishop_product_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_fts_tables, drop_fts_tables),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.5 on 2026-10-18 07:02
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+
+
+def backfill_bid_summary(apps, schema_editor):
+    LandBidding = apps.get_model('agrishop', 'LandBidding')
+    Bid = apps.get_model('agrishop', 'Bid')
+    bids = Bid.objects.filter(land_listing=OuterRef('pk')).order_by().values('land_listing')
+    LandBidding.objects.filter(bids__isnull=False).distinct().update(
+        current_highest_bid=Subquery(bids.annotate(highest=Max('bid_amount')).values('highest')),
+        bid_count=Subquery(bids.annotate(count=Count('id')).values('count')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agrishop', '0006_fulltext_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='landbidding',
+            name='bid_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='landbidding',
+            name='current_highest_bid',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=12, null=True),
+        ),
+        migrations.RunPython(backfill_bid_summary, migrations.RunPython.noop),
+    ]
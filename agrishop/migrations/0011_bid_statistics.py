@@ -0,0 +1,92 @@
+# Generated by Django 5.1.5 on 2026-10-18 07:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+
+
+def backfill_bid_statistics(apps, schema_editor):
+    Bid = apps.get_model('agrishop', 'Bid')
+    BidderStanding = apps.get_model('agrishop', 'BidderStanding')
+    BidStatistics = apps.get_model('agrishop', 'BidStatistics')
+
+    standings = Bid.objects.order_by().values('land_listing_id', 'bidder_id').annotate(
+        best=Max('bid_amount'), count=Count('id'), last=Max('bid_time')
+    )
+    BidderStanding.objects.bulk_create((
+        BidderStanding(
+            land_listing_id=row['land_listing_id'], bidder_id=row['bidder_id'],
+            best_bid=row['best'], bid_count=row['count'], last_bid_at=row['last'],
+        )
+        for row in standings.iterator()
+    ), batch_size=1000)
+
+    statistics = Bid.objects.order_by().values('land_listing_id').annotate(
+        bidders=Count('bidder_id', distinct=True), first=Min('bid_time'), last=Max('bid_time')
+    )
+    BidStatistics.objects.bulk_create((
+        BidStatistics(
+            land_listing_id=row['land_listing_id'], unique_bidders=row['bidders'],
+            first_bid_at=row['first'], last_bid_at=row['last'],
+        )
+        for row in statistics.iterator()
+    ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agrishop', '0010_product_sku'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BidderStanding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('best_bid', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('bid_count', models.PositiveIntegerField(default=0)),
+                ('last_bid_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BidStatistics',
+            fields=[
+                ('land_listing', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='bid_statistics', serialize=False, to='agrishop.landbidding')),
+                ('unique_bidders', models.PositiveIntegerField(default=0)),
+                ('first_bid_at', models.DateTimeField(blank=True, null=True)),
+                ('last_bid_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AlterModelOptions(
+            name='bid',
+            options={},
+        ),
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['land_listing', '-bid_amount'], name='bid_listing_amount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['bidder', '-bid_time'], name='bid_bidder_time_idx'),
+        ),
+        migrations.AddField(
+            model_name='bidderstanding',
+            name='bidder',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bid_standings', to='agrishop.customuser'),
+        ),
+        migrations.AddField(
+            model_name='bidderstanding',
+            name='land_listing',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='standings', to='agrishop.landbidding'),
+        ),
+        migrations.AddIndex(
+            model_name='bidderstanding',
+            index=models.Index(fields=['land_listing', '-best_bid'], name='standing_listing_best_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='bidderstanding',
+            constraint=models.UniqueConstraint(fields=('land_listing', 'bidder'), name='bidder_standing_unique'),
+        ),
+        migrations.RunPython(backfill_bid_statistics, migrations.RunPython.noop),
+    ]
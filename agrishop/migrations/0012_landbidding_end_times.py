@@ -0,0 +1,33 @@
+# Generated by Django 5.1.5 on 2026-10-18 07:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agrishop', '0011_bid_statistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='landbidding',
+            name='closed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='landbidding',
+            name='ends_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='landbidding',
+            name='winning_bid',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='agrishop.bid'),
+        ),
+        migrations.AddIndex(
+            model_name='landbidding',
+            index=models.Index(fields=['status', 'ends_at'], name='landbidding_status_ends_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.5 on 2026-10-18 07:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agrishop', '0012_landbidding_end_times'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='landbidding',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='landbidding_status_crt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='landbidding',
+            index=models.Index(fields=['city', '-created_at', '-id'], name='landbidding_city_crt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='landbidding',
+            index=models.Index(fields=['status', 'city', '-created_at', '-id'], name='landbidding_st_city_crt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', '-created_at', '-id'], name='product_cat_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'price', 'id'], name='product_cat_price_id_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.5 on 2026-10-18 07:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Q, Sum
+
+
+def backfill_category_aggregates(apps, schema_editor):
+    Category = apps.get_model('agrishop', 'Category')
+    CategoryAggregate = apps.get_model('agrishop', 'CategoryAggregate')
+    Product = apps.get_model('agrishop', 'Product')
+
+    totals = {
+        row.pop('category_id'): row
+        for row in Product.objects.exclude(category_id=None).order_by().values('category_id').annotate(
+            product_count=Count('pk'),
+            in_stock_count=Count('pk', filter=Q(quantity__gt=0)),
+            total_stock=Sum('quantity'),
+            min_price=Min('price'),
+            max_price=Max('price'),
+        )
+    }
+    CategoryAggregate.objects.bulk_create((
+        CategoryAggregate(category_id=pk, **totals.get(pk, {}))
+        for pk in Category.objects.values_list('pk', flat=True)
+    ), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agrishop', '0013_filter_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryAggregate',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='aggregate', serialize=False, to='agrishop.category')),
+                ('product_count', models.PositiveIntegerField(default=0)),
+                ('in_stock_count', models.PositiveIntegerField(default=0)),
+                ('total_stock', models.PositiveBigIntegerField(default=0)),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('max_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_category_aggregates, migrations.RunPython.noop),
+    ]
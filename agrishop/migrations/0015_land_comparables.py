@@ -0,0 +1,40 @@
+# Generated by Django 5.1.5 on 2026-10-18 08:17
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agrishop', '0014_category_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LandPriceStatistics',
+            fields=[
+                ('city', models.CharField(choices=[('lahore', 'Lahore'), ('karachi', 'Karachi'), ('islamabad', 'Islamabad'), ('rawalpindi', 'Rawalpindi'), ('other', 'Other')], max_length=20, primary_key=True, serialize=False)),
+                ('listing_count', models.PositiveIntegerField(default=0)),
+                ('asking_quantiles', models.JSONField(default=list)),
+                ('closed_count', models.PositiveIntegerField(default=0)),
+                ('winning_quantiles', models.JSONField(default=list)),
+                ('pending_changes', models.PositiveIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='landbidding',
+            name='price_per_area',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(area_size__gt=0, then=django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Cast('starting_bid_amount', models.FloatField()), '/', django.db.models.functions.comparison.Cast('area_size', models.FloatField()))), default=None), output_field=models.FloatField(null=True)),
+        ),
+        migrations.AddIndex(
+            model_name='landbidding',
+            index=models.Index(fields=['city', 'area_size'], name='landbidding_city_area_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='landbidding',
+            index=models.Index(fields=['city', 'price_per_area'], name='landbidding_city_ppa_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.1.5 on 2026-10-18 08:39
+
+import math
+from collections import Counter
+
+from django.db import migrations, models
+
+# agrishop.comparables.RELATIVE_ACCURACY when this migration was written.
+LOG_GAMMA = math.log(1.01 / 0.99)
+
+
+def backfill_price_buckets(apps, schema_editor):
+    LandBidding = apps.get_model('agrishop', 'LandBidding')
+    LandPriceBucket = apps.get_model('agrishop', 'LandPriceBucket')
+
+    counts = Counter()
+    listings = LandBidding.objects.values_list(
+        'city', 'area_size', 'starting_bid_amount', 'status', 'winning_bid_id', 'current_highest_bid'
+    )
+    for city, area, price, status, winning_bid_id, highest_bid in listings.iterator(chunk_size=5000):
+        area, price, highest_bid = (float(value or 0) for value in (area, price, highest_bid))
+        if area <= 0:
+            continue
+        if price > 0:
+            counts[city, 'asking', math.ceil(math.log(price / area) / LOG_GAMMA)] += 1
+        if status == 'closed' and winning_bid_id is not None and highest_bid > 0:
+            counts[city, 'winning', math.ceil(math.log(highest_bid / area) / LOG_GAMMA)] += 1
+    LandPriceBucket.objects.bulk_create((
+        LandPriceBucket(city=city, kind=kind, bucket=bucket, count=count)
+        for (city, kind, bucket), count in counts.items()
+    ), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agrishop', '0015_land_comparables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LandPriceBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(choices=[('lahore', 'Lahore'), ('karachi', 'Karachi'), ('islamabad', 'Islamabad'), ('rawalpindi', 'Rawalpindi'), ('other', 'Other')], max_length=20)),
+                ('kind', models.CharField(choices=[('asking', 'Asking price per area'), ('winning', 'Winning bid per area')], max_length=10)),
+                ('bucket', models.IntegerField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.DeleteModel(
+            name='LandPriceStatistics',
+        ),
+        migrations.AddConstraint(
+            model_name='landpricebucket',
+            constraint=models.UniqueConstraint(fields=('city', 'kind', 'bucket'), name='landpricebucket_unique'),
+        ),
+        migrations.RunPython(backfill_price_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agrishop', '0016_land_price_sketch'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='categoryaggregate',
+            name='in_stock_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='categoryaggregate',
+            name='product_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='categoryaggregate',
+            name='total_stock',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -1,8 +1,11 @@
 from django.db import models
+from django.db.models.functions import Cast
 from django.core.validators import MinValueValidator
-from PIL import Image
-from django.db import models
 from django.contrib.auth.models import AbstractUser
+from .querysets import CartQuerySet
+from .images import schedule_derivatives
+from .search import SearchDocumentField
+from .transactions import immediate_atomic
 
 class CustomUser(AbstractUser):
     ROLE_CHOICES = [
@@ -38,6 +41,7 @@ class CustomUser(AbstractUser):
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return self.name
@@ -45,7 +49,33 @@ class Category(models.Model):
     class Meta:
         verbose_name_plural = 'Categories'
 
+class CategoryAggregate(models.Model):
+    """
+    Product totals for one category, kept current by agrishop.facets on
+    every Product write. Uncategorized products are not counted anywhere.
+
+    The counts are not Positive*Fields: a total knocked out of step (by a
+    queryset write that skips the signals) must not make ordinary product
+    saves fail a CHECK constraint; refresh_category_aggregates repairs it.
+    """
+    category = models.OneToOneField(
+        Category,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='aggregate'
+    )
+    product_count = models.IntegerField(default=0)
+    in_stock_count = models.IntegerField(default=0)
+    total_stock = models.BigIntegerField(default=0)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+
+    def __str__(self):
+        return f"Aggregate for {self.category_id}"
+
 class Product(models.Model):
+    # Supplier stock-keeping unit; the upsert key for bulk imports.
+    sku = models.CharField(max_length=64, unique=True, blank=True, null=True)
     title = models.CharField(max_length=255)
     description = models.TextField()
     category = models.ForeignKey(
@@ -67,22 +97,56 @@ class Product(models.Model):
         blank=True, 
         null=True
     )
+    # Filled in by the background pipeline in agrishop/images.py
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # File name as last loaded from or written to the database.
+    _saved_image_name = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'image' in instance.__dict__:
+            instance._saved_image_name = instance.image.name
+        return instance
+
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        
-        if self.image:
-            img = Image.open(self.image.path)
-            img.thumbnail((800, 600))
-            img.save(self.image.path)
+        image_changed = 'image' in self.__dict__ and self.image.name != self._saved_image_name
+        if image_changed and not self.image:
+            self.image_hash = ''
+            self.image_derivatives = {}
+
+        # The category aggregates move by the difference from the stored row:
+        # read it (pre_save), write, and apply the deltas (post_save) under
+        # the write lock, so concurrent saves never both start from one row.
+        with immediate_atomic():
+            super().save(*args, **kwargs)
+        self._saved_image_name = self.image.name
+
+        # Only new uploads are processed, and off the request thread.
+        if image_changed and self.image:
+            schedule_derivatives(self.pk)
+
+    def delete(self, *args, **kwargs):
+        with immediate_atomic():
+            return super().delete(*args, **kwargs)
 
     def __str__(self):
         return self.title
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination seeks on (ordering field, id).
+            models.Index(fields=['-created_at', '-id'], name='product_created_id_idx'),
+            models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+            # The same orderings within a ?category= filter.
+            models.Index(fields=['category', '-created_at', '-id'], name='product_cat_created_id_idx'),
+            models.Index(fields=['category', 'price', 'id'], name='product_cat_price_id_idx'),
+        ]
 
 class Cart(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='cart')
@@ -93,13 +157,59 @@ class Cart(models.Model):
     )
     added_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CartQuerySet.as_manager()
+
     def total_price(self):
+        # Querysets built with `with_line_totals()` already carry the total.
+        if hasattr(self, 'line_total'):
+            return self.line_total
         return self.product.price * self.quantity
 
     class Meta:
         unique_together = ('user', 'product')
         verbose_name_plural = 'Cart Items'
 
+class Order(models.Model):
+    STATUS_CHOICES = [
+        ('reserved', 'Reserved'),
+        ('confirmed', 'Confirmed'),
+        ('cancelled', 'Cancelled'),
+        ('expired', 'Expired')
+    ]
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='orders')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='reserved')
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    # Stock is held for the order until this time unless it is confirmed.
+    reserved_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Order #{self.pk} by {self.user.email} ({self.status})"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'reserved_until'], name='order_status_reserved_idx'),
+            # A user's orders, newest first.
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+        ]
+
+class OrderItem(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True)
+    # Snapshot of the product at checkout time.
+    title = models.CharField(max_length=255)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+
+    def total_price(self):
+        return self.unit_price * self.quantity
+
+    def __str__(self):
+        return f"{self.quantity} x {self.title}"
+
 class LandBidding(models.Model):
     CITY_CHOICES = [
         ('lahore', 'Lahore'),
@@ -130,12 +240,63 @@ class LandBidding(models.Model):
         validators=[MinValueValidator(0)]
     )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    # Maintained by agrishop.bidding.place_bid in the same UPDATE that accepts a bid.
+    current_highest_bid = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        editable=False
+    )
+    bid_count = models.PositiveIntegerField(default=0, editable=False)
+    # Bidding stops at ends_at; agrishop.auctions.close_expired_auctions then
+    # closes the listing and records the winning bid. No end time means the
+    # listing stays open until closed by hand.
+    ends_at = models.DateTimeField(null=True, blank=True)
+    closed_at = models.DateTimeField(null=True, blank=True, editable=False)
+    winning_bid = models.ForeignKey(
+        'Bid',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='+'
+    )
+    # Asking price per unit of area, computed by the database so bulk
+    # inserts and queryset updates keep it too. NULL for a zero area.
+    price_per_area = models.GeneratedField(
+        expression=models.Case(
+            models.When(
+                area_size__gt=0,
+                then=Cast('starting_bid_amount', models.FloatField()) / Cast('area_size', models.FloatField()),
+            ),
+            default=None,
+        ),
+        output_field=models.FloatField(null=True),
+        db_persist=True,
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.title} - {self.city}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='landbidding_created_id_idx'),
+            # The list's ?status= and ?city= filters, alone and together,
+            # each with the default newest-first ordering.
+            models.Index(fields=['status', '-created_at', '-id'], name='landbidding_status_crt_idx'),
+            models.Index(fields=['city', '-created_at', '-id'], name='landbidding_city_crt_idx'),
+            models.Index(fields=['status', 'city', '-created_at', '-id'], name='landbidding_st_city_crt_idx'),
+            # close_expired_auctions seeks on (status, ends_at).
+            models.Index(fields=['status', 'ends_at'], name='landbidding_status_ends_idx'),
+            # Nearest comparables seek from a listing's area and price per
+            # area within its city; see agrishop.comparables.
+            models.Index(fields=['city', 'area_size'], name='landbidding_city_area_idx'),
+            models.Index(fields=['city', 'price_per_area'], name='landbidding_city_ppa_idx'),
+        ]
+
 class Bid(models.Model):
     land_listing = models.ForeignKey(LandBidding, on_delete=models.CASCADE, related_name='bids')
     bidder = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
@@ -150,4 +311,114 @@ class Bid(models.Model):
         return f"Bid by {self.bidder.full_name} - {self.bid_amount}"
 
     class Meta:
-        ordering = ['-bid_amount']
\ No newline at end of file
+        # No default ordering: each query sorts only when it asks to, and
+        # these indexes serve the sorts that are asked for.
+        indexes = [
+            models.Index(fields=['land_listing', '-bid_amount'], name='bid_listing_amount_idx'),
+            models.Index(fields=['bidder', '-bid_time'], name='bid_bidder_time_idx'),
+        ]
+
+class LandPriceBucket(models.Model):
+    """
+    One bucket of a city's log-scale price-per-area histogram, kept by
+    agrishop.comparables: `count` listings (asking) or closed listings
+    (winning) have a value in bucket `bucket`. Listing writes move counts
+    between buckets; a count that reaches 0 keeps its row.
+    """
+    ASKING = 'asking'
+    WINNING = 'winning'
+    KIND_CHOICES = [
+        (ASKING, 'Asking price per area'),
+        (WINNING, 'Winning bid per area'),
+    ]
+
+    city = models.CharField(max_length=20, choices=LandBidding.CITY_CHOICES)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    bucket = models.IntegerField()
+    # Not a PositiveIntegerField: a count knocked out of step by a bulk
+    # write must not make later listing saves fail; reads skip it and
+    # rebuild_price_statistics repairs it.
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['city', 'kind', 'bucket'], name='landpricebucket_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.city} {self.kind} bucket {self.bucket}"
+
+class BidStatistics(models.Model):
+    """
+    Per-listing bid statistics, updated by agrishop.bidding on every bid.
+
+    The highest bid and bid count stay on the listing row, where the
+    conditional UPDATE that accepts a bid maintains them.
+    """
+    land_listing = models.OneToOneField(
+        LandBidding,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='bid_statistics'
+    )
+    unique_bidders = models.PositiveIntegerField(default=0)
+    first_bid_at = models.DateTimeField(null=True, blank=True)
+    last_bid_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Statistics for {self.land_listing_id}"
+
+class BidderStanding(models.Model):
+    """Each bidder's best bid on a listing; leaderboard ranks count these rows."""
+    land_listing = models.ForeignKey(LandBidding, on_delete=models.CASCADE, related_name='standings')
+    bidder = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='bid_standings')
+    best_bid = models.DecimalField(max_digits=12, decimal_places=2)
+    bid_count = models.PositiveIntegerField(default=0)
+    last_bid_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.bidder_id} on {self.land_listing_id} - {self.best_bid}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['land_listing', 'bidder'], name='bidder_standing_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['land_listing', '-best_bid'], name='standing_listing_best_idx'),
+        ]
+
+class ProductSearchIndex(models.Model):
+    """FTS5 index over Product, maintained by database triggers."""
+    product = models.OneToOneField(
+        Product,
+        primary_key=True,
+        db_column='rowid',
+        on_delete=models.DO_NOTHING,
+        related_name='search_index'
+    )
+    title = models.TextField()
+    description = models.TextField()
+    document = SearchDocumentField(db_column='agrishop_product_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'agrishop_product_fts'
+
+class LandBiddingSearchIndex(models.Model):
+    """FTS5 index over LandBidding, maintained by database triggers."""
+    land_listing = models.OneToOneField(
+        LandBidding,
+        primary_key=True,
+        db_column='rowid',
+        on_delete=models.DO_NOTHING,
+        related_name='search_index'
+    )
+    title = models.TextField()
+    description = models.TextField()
+    document = SearchDocumentField(db_column='agrishop_landbidding_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'agrishop_landbidding_fts'
\ No newline at end of file
@@ -0,0 +1,151 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, Cursor
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Cursor pagination that seeks on the full (ordering..., id) tuple.
+
+    DRF's CursorPagination only stores the first ordering field in the cursor
+    and falls back to an OFFSET for rows sharing that value, which degrades on
+    columns with many duplicates such as `price`. Here the cursor carries every
+    ordering value plus the primary key, so each page is a single indexed range
+    scan no matter how deep the client has paged.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-created_at'
+    tiebreaker = 'id'
+    # Set by FullTextSearchFilter; used when the client asks for no ordering.
+    rank_annotation = 'search_rank'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        reverse = self.cursor.reverse if self.cursor else False
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            try:
+                queryset = queryset.filter(self._seek_filter(ordering, self.cursor.position))
+            except (ValueError, TypeError, DjangoValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        # Fetch one extra row to know whether there is a following page.
+        results = list(queryset[:self.page_size + 1])
+        has_following = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = self.cursor is not None
+
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if self.rank_annotation in queryset.query.annotations and not self._ordering_requested(request, view):
+            ordering = (self.rank_annotation,)
+        fields = [field.lstrip('-') for field in ordering]
+        if self.tiebreaker not in fields and 'pk' not in fields:
+            # Order the tiebreaker the same way as the leading field so a
+            # single composite index can serve both directions.
+            prefix = '-' if ordering[0].startswith('-') else ''
+            ordering = ordering + (prefix + self.tiebreaker,)
+        return ordering
+
+    def _ordering_requested(self, request, view):
+        for backend in getattr(view, 'filter_backends', []):
+            ordering_param = getattr(backend, 'ordering_param', None)
+            if ordering_param and request.query_params.get(ordering_param):
+                return True
+        return False
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            tokens = json.loads(urlsafe_b64decode(padded.encode('ascii')))
+            reverse = bool(tokens.get('r', 0))
+            position = tokens['p']
+        except (TypeError, ValueError, KeyError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        # A cursor minted for a different ordering cannot be applied.
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        return Cursor(offset=0, reverse=reverse, position=position)
+
+    def encode_cursor(self, cursor):
+        tokens = {'p': cursor.position}
+        if cursor.reverse:
+            tokens['r'] = 1
+        encoded = urlsafe_b64encode(
+            json.dumps(tokens, separators=(',', ':')).encode('ascii')
+        ).decode('ascii').rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _get_position_from_instance(self, instance, ordering):
+        position = []
+        for field in ordering:
+            field_name = field.lstrip('-')
+            if isinstance(instance, dict):
+                value = instance[field_name]
+            else:
+                value = getattr(instance, field_name)
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                value = str(value)
+            position.append(value)
+        return position
+
+    def _seek_filter(self, ordering, position):
+        """
+        Build the row-value comparison `(a, b, id) > (x, y, z)` as an OR chain
+        of prefix equalities, respecting the direction of each column.
+        """
+        seek = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            field_name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            seek |= Q(**equal, **{f'{field_name}__{lookup}': value})
+            equal[field_name] = value
+        return seek
+
+
+def _reverse_ordering(ordering):
+    return tuple(field[1:] if field.startswith('-') else '-' + field for field in ordering)
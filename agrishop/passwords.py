@@ -0,0 +1,170 @@
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.cache import caches
+from rest_framework.exceptions import Throttled
+
+DEFAULTS = {
+    # Processes that run password hashing; 0 hashes in the request thread.
+    'WORKERS': 2,
+    # Hash jobs allowed to wait for a worker before logins get a 429.
+    'MAX_PENDING': 32,
+    'QUEUE_TIMEOUT': 5,
+    # Failed logins per account before further attempts are refused unhashed.
+    'MAX_ATTEMPTS': 5,
+    'LOCKOUT_SECONDS': 900,
+    'CACHE_ALIAS': 'default',
+    'SCRYPT_WORK_FACTOR': 2 ** 14,
+    'SCRYPT_BLOCK_SIZE': 8,
+    'SCRYPT_PARALLELISM': 1,
+    'PBKDF2_ITERATIONS': 600_000,
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+_pending = None
+_dummy_hash = None
+
+
+def get_setting(name):
+    return getattr(settings, 'AGRISHOP_PASSWORDS', {}).get(name, DEFAULTS[name])
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    """Django's scrypt hasher with its cost taken from AGRISHOP_PASSWORDS."""
+
+    @property
+    def work_factor(self):
+        return get_setting('SCRYPT_WORK_FACTOR')
+
+    @property
+    def block_size(self):
+        return get_setting('SCRYPT_BLOCK_SIZE')
+
+    @property
+    def parallelism(self):
+        return get_setting('SCRYPT_PARALLELISM')
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return get_setting('PBKDF2_ITERATIONS')
+
+
+def get_pool():
+    global _pool, _pending
+    with _pool_lock:
+        if _pool is None:
+            # django.setup() makes spawned (non-fork) workers load the hashers too.
+            _pool = ProcessPoolExecutor(max_workers=get_setting('WORKERS'), initializer=django.setup)
+            _pending = threading.BoundedSemaphore(get_setting('MAX_PENDING'))
+        return _pool, _pending
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def _run(func, *args):
+    if not get_setting('WORKERS'):
+        return func(*args)
+    pool, pending = get_pool()
+    if not pending.acquire(timeout=get_setting('QUEUE_TIMEOUT')):
+        raise Throttled(wait=1, detail='Too many logins in progress, please retry.')
+    try:
+        return pool.submit(func, *args).result()
+    finally:
+        pending.release()
+
+
+def _check(password, encoded):
+    return hashers.check_password(password, encoded)
+
+
+def hash_password(password):
+    return _run(hashers.make_password, password)
+
+
+def verify_password(password, encoded):
+    return _run(_check, password, encoded)
+
+
+def needs_rehash(encoded):
+    """True if `encoded` is not from the preferred hasher at its current cost."""
+    preferred = hashers.get_hasher()
+    try:
+        hasher = hashers.identify_hasher(encoded)
+    except ValueError:
+        return False
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+def dummy_hash():
+    # Unknown emails still pay for one verification, so response times do
+    # not reveal which accounts exist.
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = hashers.make_password('agrishop-unknown-account')
+    return _dummy_hash
+
+
+def _attempts_key(email):
+    return f'login:attempts:{hashlib.sha1(email.encode()).hexdigest()}'
+
+
+def check_throttle(email):
+    cache = caches[get_setting('CACHE_ALIAS')]
+    if (cache.get(_attempts_key(email)) or 0) >= get_setting('MAX_ATTEMPTS'):
+        raise Throttled(
+            wait=get_setting('LOCKOUT_SECONDS'),
+            detail='Too many failed logins for this account.',
+        )
+
+
+def record_failure(email):
+    cache = caches[get_setting('CACHE_ALIAS')]
+    key = _attempts_key(email)
+    # The lockout window starts at the first failure and is not extended.
+    cache.add(key, 0, get_setting('LOCKOUT_SECONDS'))
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, get_setting('LOCKOUT_SECONDS'))
+
+
+def authenticate_login(email, password):
+    """
+    Return the active CustomUser for these credentials, or None.
+
+    Locked-out accounts are refused before any lookup or hashing. Hash
+    verification runs in the worker pool, and a valid password stored
+    under an older hasher or cost is rehashed with the preferred one.
+    """
+    from .models import CustomUser
+
+    if not email or not password:
+        return None
+    email = CustomUser.objects.normalize_email(email)
+    account = email.lower()
+    check_throttle(account)
+
+    user = CustomUser.objects.filter(email=email, is_active=True).first()
+    valid = verify_password(password, user.password if user else dummy_hash())
+    if not (user and valid):
+        record_failure(account)
+        return None
+
+    caches[get_setting('CACHE_ALIAS')].delete(_attempts_key(account))
+    if needs_rehash(user.password):
+        user.password = hash_password(password)
+        user.save(update_fields=['password'])
+    return user
@@ -0,0 +1,340 @@
+import contextvars
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework import serializers
+
+DEFAULTS = {
+    'ENABLED': True,
+    'PATH_PREFIX': '/api/',
+    # Samples kept per view for the rolling percentiles.
+    'WINDOW': 500,
+    # Directory each process dumps its samples to, as perf-<pid>.json, for
+    # perf_report; None disables it.
+    'SNAPSHOT_DIR': None,
+    'SNAPSHOT_INTERVAL': 30,
+    # Flag a request when one statement runs at least this many times.
+    'N_PLUS_ONE_THRESHOLD': 5,
+}
+
+METRICS = ['wall_ms', 'db_ms', 'queries', 'serialize_ms', 'bytes']
+PERCENTILES = [50, 95, 99]
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+_current = contextvars.ContextVar('agrishop_perf_profile', default=None)
+
+
+def get_setting(name):
+    return getattr(settings, 'AGRISHOP_PERF', {}).get(name, DEFAULTS[name])
+
+
+def normalize_sql(sql):
+    # Parameters are already placeholders; only IN lists vary in length.
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+class RequestProfile:
+    """Timings and statements for one request, fed by record_query."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.wall = 0.0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.serializing = False
+        self.statements = Counter()
+
+    @property
+    def queries(self):
+        return sum(self.statements.values())
+
+    def repeated_statement(self):
+        """The most repeated statement if it looks like an N+1, else None."""
+        if not self.statements:
+            return None
+        sql, count = self.statements.most_common(1)[0]
+        if count < get_setting('N_PLUS_ONE_THRESHOLD'):
+            return None
+        return sql, count
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper installed once per connection. Connections are per
+    thread, but sync_to_async carries the request's context into the thread
+    running its queries, so async views are attributed correctly too.
+    """
+    current = _current.get()
+    if current is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        current.db_time += time.perf_counter() - start
+        current.statements[normalize_sql(sql)] += 1
+
+
+def install_query_hook(connection):
+    # First in the list, so execute_wrapper() blocks can still pop their own.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def install_query_hooks():
+    """Hook this thread's existing connections; new ones hook themselves."""
+    for connection in connections.all():
+        install_query_hook(connection)
+
+
+@receiver(connection_created)
+def hook_new_connection(sender, connection, **kwargs):
+    install_query_hook(connection)
+
+
+@contextmanager
+def profile():
+    current = RequestProfile()
+    token = _current.set(current)
+    install_query_hooks()
+    try:
+        yield current
+    finally:
+        current.wall = time.perf_counter() - current.started
+        _current.reset(token)
+
+
+def timed_serialization(serialize):
+    current = _current.get()
+    # Nested serializers (and cached_product_payload) count once.
+    if current is None or current.serializing:
+        return serialize()
+    current.serializing = True
+    start = time.perf_counter()
+    try:
+        return serialize()
+    finally:
+        current.serialize_time += time.perf_counter() - start
+        current.serializing = False
+
+
+class ProfiledListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        return timed_serialization(lambda: super(ProfiledListSerializer, self).data)
+
+
+class ProfiledSerializerMixin:
+    """
+    Counts `.data` toward the request's serialize time, for this serializer
+    and its many=True lists. Only serializers that opt in are timed.
+    """
+
+    @property
+    def data(self):
+        return timed_serialization(lambda: super(ProfiledSerializerMixin, self).data)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        # BaseSerializer.many_init, with ProfiledListSerializer as the default.
+        list_kwargs = {}
+        for key in serializers.LIST_SERIALIZER_KWARGS_REMOVE:
+            value = kwargs.pop(key, None)
+            if value is not None:
+                list_kwargs[key] = value
+        list_kwargs['child'] = cls(*args, **kwargs)
+        list_kwargs.update({key: value for key, value in kwargs.items() if key in serializers.LIST_SERIALIZER_KWARGS})
+        list_serializer_class = getattr(getattr(cls, 'Meta', None), 'list_serializer_class', ProfiledListSerializer)
+        return list_serializer_class(*args, **list_kwargs)
+
+
+def percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, round(pct / 100 * (len(sorted_samples) - 1)))
+    return sorted_samples[index]
+
+
+class ViewStats:
+    # A window of None keeps every sample, as when merging processes.
+    def __init__(self, window):
+        self.count = 0
+        self.samples = {metric: deque(maxlen=window) for metric in METRICS}
+        self.n_plus_one = 0
+        self.repeated = Counter()
+
+    def add(self, sample, repeated):
+        self.count += 1
+        for metric in METRICS:
+            if sample.get(metric) is not None:
+                self.samples[metric].append(sample[metric])
+        if repeated:
+            sql, count = repeated
+            self.n_plus_one += 1
+            self.repeated[sql] = max(self.repeated[sql], count)
+
+    def dump(self):
+        return {
+            'count': self.count,
+            'samples': {metric: list(values) for metric, values in self.samples.items()},
+            'n_plus_one': self.n_plus_one,
+            'repeated': dict(self.repeated),
+        }
+
+    def merge(self, dumped):
+        """Add the dump() of another process's stats for the same view."""
+        self.count += dumped['count']
+        for metric, values in dumped['samples'].items():
+            self.samples[metric].extend(values)
+        self.n_plus_one += dumped['n_plus_one']
+        for sql, count in dumped['repeated'].items():
+            self.repeated[sql] = max(self.repeated[sql], count)
+
+    def summary(self):
+        metrics = {}
+        for metric, values in self.samples.items():
+            ordered = sorted(values)
+            metrics[metric] = {
+                'mean': sum(ordered) / len(ordered) if ordered else 0.0,
+                **{f'p{pct}': percentile(ordered, pct) for pct in PERCENTILES},
+            }
+        return {
+            'count': self.count,
+            'metrics': metrics,
+            'n_plus_one': self.n_plus_one,
+            'repeated_statements': [
+                {'sql': sql, 'count': count} for sql, count in self.repeated.most_common(3)
+            ],
+        }
+
+
+class PerfRegistry:
+    """Rolling per-view aggregates for this process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.last_snapshot = time.monotonic()
+
+    def record(self, view_name, sample, repeated=None):
+        with self.lock:
+            stats = self.views.get(view_name)
+            if stats is None:
+                stats = self.views[view_name] = ViewStats(get_setting('WINDOW'))
+            stats.add(sample, repeated)
+            due = time.monotonic() - self.last_snapshot >= get_setting('SNAPSHOT_INTERVAL')
+            if due:
+                self.last_snapshot = time.monotonic()
+        if due and get_setting('SNAPSHOT_DIR'):
+            self.write_snapshot(get_setting('SNAPSHOT_DIR'))
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'generated_at': time.time(),
+                'pid': os.getpid(),
+                'views': {name: stats.summary() for name, stats in self.views.items()},
+            }
+
+    def write_snapshot(self, directory):
+        """
+        Dump this process's samples to `directory`/perf-<pid>.json, so each
+        worker keeps its own file and perf_report merges them.
+        """
+        directory = os.fspath(directory)
+        os.makedirs(directory, exist_ok=True)
+        with self.lock:
+            dumped = {
+                'generated_at': time.time(),
+                'pid': os.getpid(),
+                'views': {name: stats.dump() for name, stats in self.views.items()},
+            }
+        handle, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(handle, 'w') as stream:
+            json.dump(dumped, stream)
+        os.replace(tmp_path, os.path.join(directory, f'perf-{os.getpid()}.json'))
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+
+registry = PerfRegistry()
+
+
+def server_timing(current):
+    return ', '.join([
+        f'app;dur={current.wall * 1000:.1f}',
+        f'db;dur={current.db_time * 1000:.1f};desc="{current.queries} queries"',
+        f'serialize;dur={current.serialize_time * 1000:.1f}',
+    ])
+
+
+class PerfMiddleware:
+    """
+    Records wall time, query count and time, serializer time (of
+    ProfiledSerializerMixin serializers) and response size for each
+    resolved view under PATH_PREFIX, adds a Server-Timing
+    header, and feeds `registry`. Streaming responses are counted without a
+    size, and queries they run after the view returns are not seen.
+
+    Works under WSGI and ASGI; async views are awaited, not run in a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = get_setting('ENABLED')
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def profiles(self, request):
+        return self.enabled and request.path.startswith(get_setting('PATH_PREFIX'))
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.profiles(request):
+            return self.get_response(request)
+
+        with profile() as current:
+            response = self.get_response(request)
+        return self.finish(request, response, current)
+
+    async def __acall__(self, request):
+        if not self.profiles(request):
+            return await self.get_response(request)
+
+        with profile() as current:
+            response = await self.get_response(request)
+        return self.finish(request, response, current)
+
+    def finish(self, request, response, current):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return response
+
+        size = None if response.streaming else len(response.content)
+        registry.record(match.view_name, {
+            'wall_ms': current.wall * 1000,
+            'db_ms': current.db_time * 1000,
+            'queries': current.queries,
+            'serialize_ms': current.serialize_time * 1000,
+            'bytes': size,
+        }, current.repeated_statement())
+        response['Server-Timing'] = server_timing(current)
+        return response
@@ -0,0 +1,181 @@
+"""
+Query plans of the SQL the API actually runs, for the check_query_plans
+command. Each endpoint is requested in-process with every database
+statement captured, and each SELECT is EXPLAINed with its own parameters.
+"""
+import re
+from contextlib import ExitStack
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import connections
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+# Full table scans, as SQLite and PostgreSQL report them.
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+POSTGRES_SCAN = re.compile(r'Seq Scan on (\w+)')
+POSTGRES_SORT = re.compile(r'^\s*(?:->\s*)?(?:Incremental )?Sort\b')
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    path: str
+    auth: bool = False
+    # Tables this endpoint reads in full by design.
+    allow_scan: frozenset = frozenset()
+    # Sorted or grouped after the match whatever the indexes: relevance
+    # ranking, facet counts.
+    allow_sort: bool = False
+
+
+ENDPOINTS = [
+    Endpoint('/api/products/'),
+    Endpoint('/api/products/?ordering=price'),
+    Endpoint('/api/products/?ordering=-price'),
+    Endpoint('/api/products/?category={category}'),
+    Endpoint('/api/products/?category={category}&ordering=price'),
+    Endpoint('/api/products/?category={category}&ordering=-price'),
+    Endpoint('/api/products/?search=urea', allow_sort=True),
+    Endpoint('/api/products/{product}/'),
+    # Unfiltered facets count every product by design.
+    Endpoint('/api/products/facets/', allow_sort=True, allow_scan=frozenset({'agrishop_product'})),
+    Endpoint('/api/products/facets/?category={category}', allow_sort=True),
+    # Every category, unpaginated.
+    Endpoint('/api/categories/', allow_scan=frozenset({'agrishop_category'})),
+    Endpoint('/api/land-listings/'),
+    Endpoint('/api/land-listings/?status=active'),
+    Endpoint('/api/land-listings/?city=lahore'),
+    Endpoint('/api/land-listings/?status=active&city=lahore'),
+    Endpoint('/api/land-listings/?search=acres', allow_sort=True),
+    Endpoint('/api/land-listings/{listing}/'),
+    Endpoint('/api/land-listings/{listing}/leaderboard/'),
+    Endpoint('/api/land-listings/{listing}/my_rank/', auth=True),
+    Endpoint('/api/land-listings/{listing}/comparables/'),
+    Endpoint('/api/land-listings/price_statistics/'),
+    Endpoint('/api/cart/', auth=True),
+    Endpoint('/api/orders/', auth=True),
+    Endpoint('/api/bids/', auth=True),
+]
+
+
+@dataclass
+class Finding:
+    endpoint: str
+    sql: str
+    plan: list
+    scans: list
+    sorts: list
+
+    @property
+    def problems(self):
+        return [f'full scan of {table}' for table in self.scans] + self.sorts
+
+
+def sample_ids():
+    """Primary keys to fill the `{product}`-style placeholders in ENDPOINTS."""
+    from .models import Category, LandBidding, Product
+
+    return {
+        'product': Product.objects.order_by('pk').values_list('pk', flat=True).first(),
+        'category': Category.objects.order_by('pk').values_list('pk', flat=True).first(),
+        'listing': LandBidding.objects.order_by('pk').values_list('pk', flat=True).first(),
+    }
+
+
+def explain(alias, sql, params):
+    """The plan of one statement as a list of lines."""
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            # sqlite3 caches statements by their text, and a cached EXPLAIN
+            # keeps the plan it was compiled with after an index is added or
+            # dropped; keying the text on the schema version avoids that.
+            cursor.execute('PRAGMA schema_version')
+            version = cursor.fetchone()[0]
+            cursor.execute(f'EXPLAIN QUERY PLAN /* schema {version} */ {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN {sql}', params)
+            return [row[0] for row in cursor.fetchall()]
+    raise NotImplementedError(f'No query plan support for {connection.vendor}.')
+
+
+def analyze(plan):
+    """Return `(scanned tables, sort steps)` for a plan from `explain`."""
+    scans, sorts = [], []
+    for line in plan:
+        if match := SQLITE_SCAN.match(line) or POSTGRES_SCAN.search(line):
+            scans.append(match.group(1))
+        elif line.startswith('USE TEMP B-TREE') or POSTGRES_SORT.match(line):
+            sorts.append(line.strip())
+    return scans, sorts
+
+
+def capture(client, path):
+    """Request `path` and return the `(alias, sql, params)` of every SELECT it ran."""
+    statements = []
+
+    def recorder(alias):
+        def record(execute, sql, params, many, context):
+            if not many and sql.lstrip().upper().startswith('SELECT'):
+                statements.append((alias, sql, params))
+            return execute(sql, params, many, context)
+        return record
+
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder(connection.alias)))
+        response = client.get(path)
+    return response, statements
+
+
+def check_endpoints(endpoints=None, user=None, follow_pages=True):
+    """Request each endpoint and return one Finding per distinct SELECT."""
+    ids = sample_ids()
+    client = APIClient()
+    if user is not None:
+        client.force_authenticate(user)
+
+    findings, skipped = [], []
+    # A dummy catalog cache so every request reaches the database, and no
+    # rate limits on the run's own requests.
+    with override_settings(
+        ALLOWED_HOSTS=['testserver'],
+        CACHES={**settings.CACHES, 'query-plans': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+        AGRISHOP_CATALOG_CACHE={'ALIAS': 'query-plans'},
+        AGRISHOP_THROTTLE={'ENABLED': False},
+    ):
+        for endpoint in endpoints or ENDPOINTS:
+            if endpoint.auth and user is None:
+                skipped.append((endpoint.path, 'no user to authenticate as'))
+                continue
+            try:
+                path = endpoint.path.format(**ids)
+            except KeyError:
+                path = endpoint.path
+            if 'None' in path:
+                skipped.append((endpoint.path, 'no rows to fill in the path'))
+                continue
+
+            pages = [path]
+            seen = set()
+            while pages:
+                label = pages.pop()
+                response, statements = capture(client, label)
+                if response.status_code >= 400:
+                    skipped.append((label, f'HTTP {response.status_code}'))
+                    continue
+                for alias, sql, params in statements:
+                    if sql in seen:
+                        continue
+                    seen.add(sql)
+                    plan = explain(alias, sql, params)
+                    scans, sorts = analyze(plan)
+                    scans = [table for table in scans if table not in endpoint.allow_scan]
+                    findings.append(Finding(label, sql, plan, scans, [] if endpoint.allow_sort else sorts))
+                # One more page exercises the keyset seek.
+                data = getattr(response, 'data', None)
+                if follow_pages and label == path and isinstance(data, dict) and data.get('next'):
+                    pages.append(data['next'].removeprefix('http://testserver'))
+    return findings, skipped
@@ -0,0 +1,13 @@
+from django.db import models
+from django.db.models import DecimalField, ExpressionWrapper, F
+
+
+class CartQuerySet(models.QuerySet):
+    def with_line_totals(self):
+        """Join the product and compute `price * quantity` in SQL."""
+        return self.select_related('product').annotate(
+            line_total=ExpressionWrapper(
+                F('product__price') * F('quantity'),
+                output_field=DecimalField(max_digits=20, decimal_places=2),
+            )
+        )
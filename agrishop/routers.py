@@ -0,0 +1,91 @@
+import contextvars
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_ALIAS = 'replica'
+
+# Read-mostly catalog tables, including the FTS tables the list views join.
+CATALOG_MODELS = {
+    'agrishop.product',
+    'agrishop.category',
+    'agrishop.landbidding',
+    'agrishop.productsearchindex',
+    'agrishop.landbiddingsearchindex',
+}
+
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+_pinned = contextvars.ContextVar('agrishop_primary_pinned', default=False)
+
+
+@contextmanager
+def use_primary():
+    """Read everything from the primary inside this block."""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class CatalogReplicaRouter:
+    """
+    Send catalog reads to the `replica` database alias, when one is
+    configured, and every write to the primary.
+
+    Reads stay on the primary inside a transaction on the primary, and for
+    the whole of any request that writes (see PrimaryPinningMiddleware), so
+    nobody reads back a stale copy of their own write.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower not in CATALOG_MODELS or REPLICA_ALIAS not in settings.DATABASES:
+            return None
+        if _pinned.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return REPLICA_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica is a copy of the primary, so rows from either relate.
+        aliases = {DEFAULT_DB_ALIAS, REPLICA_ALIAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary.
+        if db == REPLICA_ALIAS:
+            return False
+        return None
+
+
+class PrimaryPinningMiddleware:
+    """Pin requests with unsafe methods to the primary for all their reads."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if request.method in SAFE_METHODS:
+            return self.get_response(request)
+        with use_primary():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.method in SAFE_METHODS:
+            return await self.get_response(request)
+        with use_primary():
+            return await self.get_response(request)
@@ -0,0 +1,116 @@
+from django.db import connections, models
+from django.db.models import F, Lookup
+from rest_framework import filters
+
+from .cache import invalidate_catalog
+
+# FTS5 tables created in migration 0006, keyed by their content table.
+SEARCH_INDEXES = {
+    'agrishop_product': 'agrishop_product_fts',
+    'agrishop_landbidding': 'agrishop_landbidding_fts',
+}
+SEARCH_INDEX_TABLES = list(SEARCH_INDEXES.values())
+
+
+class SearchDocumentField(models.TextField):
+    """
+    The hidden FTS5 column that shares the table's name. `MATCH` against it
+    searches every indexed column at once.
+    """
+
+
+@SearchDocumentField.register_lookup
+class Match(Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+def build_match_expression(terms):
+    """Quote every term and make it a prefix query, so `ure` finds `Urea`."""
+    return ' '.join('"%s"*' % term.replace('"', '""') for term in terms)
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    Drop-in replacement for SearchFilter backed by the FTS5 indexes.
+
+    Matches are ranked by BM25 and annotated as `search_rank`, which the
+    keyset paginator picks up as the default ordering for search results.
+    Models without an index, or databases other than SQLite, fall back to
+    SearchFilter's `icontains` behaviour.
+    """
+    rank_annotation = 'search_rank'
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+
+        if not self.has_search_index(queryset):
+            return super().filter_queryset(request, queryset, view)
+
+        return queryset.filter(
+            search_index__document__match=build_match_expression(terms)
+        ).annotate(
+            **{self.rank_annotation: F('search_index__rank')}
+        ).order_by(self.rank_annotation, 'pk')
+
+    def has_search_index(self, queryset):
+        if connections[queryset.db].vendor != 'sqlite':
+            return False
+        return any(
+            getattr(field, 'related_name', None) == 'search_index'
+            for field in queryset.model._meta.related_objects
+        )
+
+
+def rebuild_search_indexes(using='default'):
+    """Repopulate every FTS table from its content table and merge segments."""
+    ensure_search_triggers(using)
+    with connections[using].cursor() as cursor:
+        for fts_table in SEARCH_INDEX_TABLES:
+            cursor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+            cursor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('optimize')")
+    # Cached search result pages may now be wrong.
+    invalidate_catalog('product')
+
+
+def ensure_search_triggers(using='default', **kwargs):
+    """
+    (Re)create the triggers that mirror writes into the FTS tables.
+
+    SQLite drops a table's triggers whenever a migration rebuilds it, so this
+    runs after every `migrate` (see AgrishopConfig.ready). Row ids survive a
+    rebuild, so the index contents stay valid.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        existing = {row[0] for row in cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        ).fetchall()}
+        for table, fts in SEARCH_INDEXES.items():
+            if fts not in existing:
+                continue
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts}(rowid, title, description) "
+                f"VALUES (new.id, new.title, new.description); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, title, description) "
+                f"VALUES ('delete', old.id, old.title, old.description); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF title, description ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, title, description) "
+                f"VALUES ('delete', old.id, old.title, old.description); "
+                f"INSERT INTO {fts}(rowid, title, description) "
+                f"VALUES (new.id, new.title, new.description); END"
+            )
@@ -1,8 +1,15 @@
 from rest_framework import serializers
-from .models import CustomUser, Product, Cart, LandBidding, Bid, Category
-from django.contrib.auth.hashers import make_password
-
-class UserSerializer(serializers.ModelSerializer):
+from .models import CustomUser, Product, Cart, Order, OrderItem, LandBidding, Bid, BidderStanding, Category
+from .bidding import check_bid, place_bid
+from .cart import ADD, REMOVE, SET, validate_cart_line
+from .cache import cached_product_payload
+from .fieldsets import SparseFieldsSerializerMixin
+from .passwords import hash_password
+from .perf import ProfiledSerializerMixin
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+class UserSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ['id', 'email', 'full_name', 'phone_number', 'address', 'role', 'business_name', 'password']
@@ -18,63 +25,149 @@ class UserSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data):
-        validated_data['password'] = make_password(validated_data['password'])  # Hash password
+        validated_data['password'] = hash_password(validated_data['password'])
+        # username is still unique on AbstractUser; leaving it blank let only one sign-up through.
+        validated_data.setdefault('username', validated_data['email'])
         return CustomUser.objects.create(**validated_data)
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(ProfiledSerializerMixin, SparseFieldsSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = '__all__'
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(ProfiledSerializerMixin, SparseFieldsSerializerMixin, serializers.ModelSerializer):
+    image_derivatives = serializers.SerializerMethodField()
+
     class Meta:
         model = Product
         fields = '__all__'
-        read_only_fields = ['created_at', 'updated_at']
+        read_only_fields = ['created_at', 'updated_at', 'image_hash']
+
+    def get_image_derivatives(self, obj):
+        # Resolve the stored derivative paths to URLs; no image decoding here.
+        request = self.context.get('request')
+        derivatives = {}
+        for size_name, meta in (obj.image_derivatives or {}).items():
+            derivatives[size_name] = {
+                'width': meta['width'],
+                'height': meta['height'],
+                'jpeg': self._media_url(meta['jpeg'], request),
+                'webp': self._media_url(meta['webp'], request),
+            }
+        return derivatives
+
+    @staticmethod
+    def _media_url(name, request):
+        url = default_storage.url(name)
+        return request.build_absolute_uri(url) if request else url
+
+class ProductListSerializer(ProfiledSerializerMixin, SparseFieldsSerializerMixin, serializers.ModelSerializer):
+    """Compact list item: no description, one thumbnail instead of every derivative."""
+    thumbnail = serializers.SerializerMethodField()
+    # Columns behind method fields, for SparseFieldsetMixin's .only().
+    field_columns = {'thumbnail': 'image_derivatives'}
+
+    class Meta:
+        model = Product
+        fields = ['id', 'sku', 'title', 'category', 'price', 'quantity', 'thumbnail', 'updated_at']
+        read_only_fields = fields
 
-class CartSerializer(serializers.ModelSerializer):
-    product_details = ProductSerializer(source='product', read_only=True)
+    def get_thumbnail(self, obj):
+        thumb = (obj.image_derivatives or {}).get('thumb')
+        if not thumb:
+            return None
+        return ProductSerializer._media_url(thumb['webp'], self.context.get('request'))
+
+class CartSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
+    product_details = serializers.SerializerMethodField()
     total_price = serializers.SerializerMethodField()
 
     class Meta:
         model = Cart
         fields = ['id', 'user', 'product', 'product_details', 'quantity', 'added_at', 'total_price']
-        read_only_fields = ['added_at']
+        read_only_fields = ['user', 'added_at']
+
+    def get_product_details(self, obj):
+        return cached_product_payload(obj.product, self.context)
 
     def get_total_price(self, obj):
         return obj.total_price()
 
+    def update(self, instance, validated_data):
+        instance = super().update(instance, validated_data)
+        # The SQL-annotated line total no longer matches the new quantity.
+        instance.__dict__.pop('line_total', None)
+        return instance
+
     def validate(self, data):
-        # Ensure quantity doesn't exceed product availability
-        product = data.get('product')
-        quantity = data.get('quantity', 1)
-        
-        if product and quantity > product.quantity:
-            raise serializers.ValidationError({
-                'quantity': f'Cannot add more than available stock ({product.quantity})'
-            })
+        # `user` is read-only (it comes from the token), which drops DRF's
+        # UniqueTogetherValidator, so (user, product) is checked here too. A
+        # partial update is checked against the line as it will be saved.
+        instance = self.instance
+        product = data.get('product', instance and instance.product)
+        quantity = data.get('quantity', instance.quantity if instance else 1)
+        request = self.context.get('request')
+        if product and request is not None:
+            validate_cart_line(request.user.pk, product, quantity, instance and instance.pk)
         return data
 
-class LandBiddingSerializer(serializers.ModelSerializer):
-    creator = serializers.PrimaryKeyRelatedField(
-        read_only=True, 
-        default=serializers.CurrentUserDefault()
+class CartOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=[ADD, SET, REMOVE])
+    # A plain id: the products are fetched together by apply_cart_operations.
+    product = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, data):
+        if data['op'] == SET and 'quantity' not in data:
+            raise serializers.ValidationError({'quantity': 'This field is required.'})
+        data.setdefault('quantity', 1)
+        return data
+
+class CartBulkSerializer(serializers.Serializer):
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=200)
+
+class OrderItemSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
+    total_price = serializers.SerializerMethodField()
+
+    class Meta:
+        model = OrderItem
+        fields = ['id', 'product', 'title', 'unit_price', 'quantity', 'total_price']
+
+    def get_total_price(self, obj):
+        return obj.total_price()
+
+class OrderSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
+    items = OrderItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ['id', 'user', 'status', 'total_amount', 'reserved_until', 'items', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+class LandBiddingSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
+    creator = serializers.PrimaryKeyRelatedField(read_only=True)
+    # Denormalized on the listing row by agrishop.bidding, so no per-row queries.
+    total_bids = serializers.IntegerField(source='bid_count', read_only=True)
+    highest_bid = serializers.DecimalField(
+        source='current_highest_bid',
+        max_digits=12,
+        decimal_places=2,
+        read_only=True
     )
-    total_bids = serializers.SerializerMethodField()
+    price_per_area = serializers.FloatField(read_only=True)
 
     class Meta:
         model = LandBidding
-        fields = '__all__'
+        exclude = ['current_highest_bid', 'bid_count']
         read_only_fields = ['created_at', 'updated_at', 'status']
 
-    def get_total_bids(self, obj):
-        return obj.bids.count()
+    def validate_ends_at(self, value):
+        if value is not None and value <= timezone.now():
+            raise serializers.ValidationError('End time must be in the future.')
+        return value
 
-class BidSerializer(serializers.ModelSerializer):
-    bidder = serializers.PrimaryKeyRelatedField(
-        read_only=True, 
-        default=serializers.CurrentUserDefault()
-    )
+class BidSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
+    bidder = serializers.PrimaryKeyRelatedField(read_only=True)
 
     class Meta:
         model = Bid
@@ -82,23 +175,76 @@ class BidSerializer(serializers.ModelSerializer):
         read_only_fields = ['bid_time']
 
     def validate(self, data):
-        # Validate bid amount is higher than current highest bid
+        # Fail fast against the denormalized highest bid. The authoritative
+        # check happens again atomically in bidding.place_bid.
         land_listing = data.get('land_listing')
         bid_amount = data.get('bid_amount')
 
         if land_listing:
-            # Get the current highest bid
-            highest_bid = land_listing.bids.order_by('-bid_amount').first()
-            
-            if highest_bid and bid_amount <= highest_bid.bid_amount:
-                raise serializers.ValidationError({
-                    'bid_amount': f'Bid must be higher than the current highest bid of {highest_bid.bid_amount}'
-                })
-
-            # Ensure bid is above starting bid amount
-            if bid_amount < land_listing.starting_bid_amount:
-                raise serializers.ValidationError({
-                    'bid_amount': f'Bid must be at least the starting bid amount of {land_listing.starting_bid_amount}'
-                })
-
-        return data
\ No newline at end of file
+            error = check_bid(
+                bid_amount,
+                land_listing.status,
+                land_listing.starting_bid_amount,
+                land_listing.current_highest_bid,
+                land_listing.ends_at,
+            )
+            if error:
+                raise serializers.ValidationError(error)
+
+        return data
+
+    def create(self, validated_data):
+        return place_bid(
+            validated_data['land_listing'].pk,
+            validated_data['bidder'],
+            validated_data['bid_amount'],
+        )
+
+class LeaderboardBidSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Bid
+        fields = ['id', 'bidder', 'bid_amount', 'bid_time']
+
+class BidStatisticsSerializer(ProfiledSerializerMixin, serializers.Serializer):
+    """Bid statistics of a listing fetched with `select_related('bid_statistics')`."""
+    land_listing = serializers.IntegerField(source='pk')
+    highest_bid = serializers.DecimalField(source='current_highest_bid', max_digits=12, decimal_places=2)
+    bid_count = serializers.IntegerField()
+    unique_bidders = serializers.SerializerMethodField()
+    # Listings without bids have no statistics row yet.
+    first_bid_at = serializers.DateTimeField(source='bid_statistics.first_bid_at', default=None)
+    last_bid_at = serializers.DateTimeField(source='bid_statistics.last_bid_at', default=None)
+    bids_per_hour = serializers.SerializerMethodField()
+
+    def get_unique_bidders(self, listing):
+        statistics = getattr(listing, 'bid_statistics', None)
+        return statistics.unique_bidders if statistics else 0
+
+    def get_bids_per_hour(self, listing):
+        # Rate between the first and latest bid.
+        statistics = getattr(listing, 'bid_statistics', None)
+        if statistics is None or listing.bid_count < 2:
+            return None
+        hours = (statistics.last_bid_at - statistics.first_bid_at).total_seconds() / 3600
+        return round((listing.bid_count - 1) / hours, 2) if hours else None
+
+class LandComparableSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
+    """A listing returned by agrishop.comparables.nearest_comparables."""
+    highest_bid = serializers.DecimalField(source='current_highest_bid', max_digits=12, decimal_places=2)
+    price_per_area = serializers.FloatField()
+    distance = serializers.SerializerMethodField()
+
+    class Meta:
+        model = LandBidding
+        fields = ['id', 'title', 'status', 'area_size', 'starting_bid_amount', 'price_per_area',
+                  'highest_bid', 'distance']
+
+    def get_distance(self, listing):
+        return round(listing.distance, 4)
+
+class BidderStandingSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
+    rank = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = BidderStanding
+        fields = ['land_listing', 'bidder', 'rank', 'best_bid', 'bid_count', 'last_bid_at']
@@ -0,0 +1,94 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .cache import invalidate_catalog_for_write
+from .comparables import STATE_FIELDS, apply_changes, comparable_state, listing_changes
+from .facets import apply_product_change
+from .live import publish_status_change
+from .models import Category, CategoryAggregate, LandBidding, Product
+
+AGGREGATED_FIELDS = ('category', 'price', 'quantity')
+
+
+def aggregated_state(product):
+    return (product.category_id, product.price, product.quantity)
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product_cache(sender, **kwargs):
+    invalidate_catalog_for_write('product')
+
+
+@receiver(pre_save, sender=Product)
+def remember_aggregated_state(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding:
+        instance._aggregated_state = None
+    elif update_fields is not None and not set(update_fields) & {*AGGREGATED_FIELDS, 'category_id'}:
+        instance._aggregated_state = aggregated_state(instance)
+    else:
+        instance._aggregated_state = stored_aggregated_state(instance)
+
+
+def stored_aggregated_state(instance):
+    # Product.save and delete run in immediate_atomic, so on SQLite the row
+    # is read under the write lock; elsewhere FOR UPDATE locks it.
+    return Product.objects.select_for_update().filter(pk=instance.pk).values_list(*AGGREGATED_FIELDS).first()
+
+
+@receiver(post_save, sender=Product)
+def update_category_aggregates(sender, instance, **kwargs):
+    apply_product_change(instance._aggregated_state, aggregated_state(instance))
+
+
+@receiver(pre_delete, sender=Product)
+def remember_deleted_state(sender, instance, **kwargs):
+    # The instance may be stale; what leaves the aggregates is the stored row.
+    instance._aggregated_state = stored_aggregated_state(instance)
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_category_aggregates(sender, instance, **kwargs):
+    apply_product_change(getattr(instance, '_aggregated_state', aggregated_state(instance)), None)
+
+
+@receiver(post_save, sender=Category)
+def invalidate_category_cache(sender, instance, created, **kwargs):
+    if created:
+        CategoryAggregate.objects.get_or_create(category=instance)
+    invalidate_catalog_for_write('category')
+
+
+@receiver(post_delete, sender=Category)
+def invalidate_deleted_category_cache(sender, **kwargs):
+    # Deleting a category nulls Product.category through a queryset update.
+    invalidate_catalog_for_write('category', 'product')
+
+
+@receiver(pre_save, sender=LandBidding)
+def remember_listing_status(sender, instance, update_fields=None, **kwargs):
+    if instance.pk is None:
+        instance._previous_status = instance.status
+        instance._previous_state = None
+    elif update_fields is not None and not set(update_fields) & {*STATE_FIELDS, 'winning_bid'}:
+        instance._previous_status = instance.status
+        instance._previous_state = comparable_state(instance)
+    else:
+        previous = sender.objects.filter(pk=instance.pk).values_list(*STATE_FIELDS).first()
+        instance._previous_status = previous and previous[3]
+        instance._previous_state = previous
+
+
+@receiver(post_save, sender=LandBidding)
+def publish_listing_status(sender, instance, created, **kwargs):
+    if not created:
+        publish_status_change(instance.pk, vars(instance), instance._previous_status)
+
+
+@receiver(post_save, sender=LandBidding)
+def update_listing_statistics(sender, instance, **kwargs):
+    apply_changes(listing_changes(instance._previous_state, comparable_state(instance)))
+
+
+@receiver(post_delete, sender=LandBidding)
+def remove_from_listing_statistics(sender, instance, **kwargs):
+    apply_changes(listing_changes(comparable_state(instance), None))
@@ -1,3 +1,2003 @@
-from django.test import TestCase
+import asyncio
+import contextlib
+import copy
+import gzip
+import io
+import json
+import math
+import os
+import random
+import shutil
+import threading
+import tempfile
+from decimal import Decimal
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.db.models import F
+from django import test
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import parse_http_date
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import CustomUser, Category, CategoryAggregate, Product, Cart, Order, LandBidding, LandPriceBucket, Bid, BidderStanding, BidStatistics
+from .bidding import place_bid
+from .checkout import cancel_order, checkout, confirm_order, release_expired_reservations
+from .facets import price_edges, refresh_category_aggregates
+from .cache import catalog_cache
+from .perf import install_query_hooks, profile, registry
+from .serializers import ProductListSerializer
+from .authentication import ClaimsUser, tokens_for_user
+from .passwords import hash_password, shutdown_pool, verify_password
+from .live import feed
+from .auctions import AuctionScheduler, close_expired_auctions
+from .comparables import city_statistics
+from .routers import CatalogReplicaRouter, PrimaryPinningMiddleware, use_primary
+from .queryplans import analyze
+from .analytics import as_float, build_reports, load_frame
+from .throttling import get_setting as throttle_setting, take
+
+
+class TestCase(test.TestCase):
+    def setUp(self):
+        # Test rollbacks never fire the cache invalidation signals.
+        catalog_cache().clear()
+        caches[throttle_setting('CACHE_ALIAS')].clear()
+
+
+class TransactionTestCase(test.TransactionTestCase):
+    def setUp(self):
+        catalog_cache().clear()
+        caches[throttle_setting('CACHE_ALIAS')].clear()
+
+
+def make_user(email='farmer@example.com', password=None, **extra):
+    # No password by default: hashing one costs ~100ms per user.
+    extra.setdefault('full_name', 'Test Farmer')
+    return CustomUser.objects.create_user(
+        username=email, email=email, password=password, **extra
+    )
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Fertilizers')
+        # Only a handful of distinct prices so the tiebreaker is exercised.
+        for i in range(45):
+            Product.objects.create(
+                title=f'Product {i}',
+                description='Test product',
+                category=cls.category,
+                quantity=10,
+                price=Decimal(10 + i % 3),
+            )
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def walk(self, url):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+            pages += 1
+        return ids, pages
+
+    def test_default_ordering_visits_every_row_once(self):
+        ids, pages = self.walk('/api/products/?page_size=10')
+        expected = list(Product.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 5)
+
+    def test_price_ordering_with_duplicate_values(self):
+        ids, _ = self.walk('/api/products/?ordering=price&page_size=7')
+        expected = list(Product.objects.order_by('price', 'id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+        ids, _ = self.walk('/api/products/?ordering=-price&page_size=7')
+        expected = list(Product.objects.order_by('-price', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_previous_link_returns_the_prior_page(self):
+        first = self.client.get('/api/products/?ordering=price&page_size=10').data
+        second = self.client.get(first['next']).data
+        self.assertIsNotNone(second['previous'])
+        back = self.client.get(second['previous']).data
+        self.assertEqual(
+            [item['id'] for item in back['results']],
+            [item['id'] for item in first['results']],
+        )
+        self.assertIsNone(back['previous'])
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get('/api/products/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+    def test_land_listings_are_paginated(self):
+        creator = make_user()
+        for i in range(3):
+            LandBidding.objects.create(
+                creator=creator, title=f'Plot {i}', description='Plot',
+                area_size=Decimal('5.00'), starting_bid_amount=Decimal('1000.00'),
+            )
+        response = self.client.get('/api/land-listings/?page_size=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+
+class QueryCountTests(TestCase):
+    """List endpoints must cost a constant number of queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user()
+        cls.other = make_user('buyer@example.com')
+        category = Category.objects.create(name='Seeds')
+        for i in range(20):
+            product = Product.objects.create(
+                title=f'Seed {i}', description='Seed', category=category,
+                quantity=100, price=Decimal('12.50'),
+            )
+            Cart.objects.create(user=cls.user, product=product, quantity=i + 1)
+        for i in range(10):
+            listing = LandBidding.objects.create(
+                creator=cls.other, title=f'Plot {i}', description='Plot',
+                area_size=Decimal('2.00'), starting_bid_amount=Decimal('100.00'),
+            )
+            for amount in (100, 150, 200):
+                place_bid(listing.pk, cls.user, Decimal(amount + i))
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_cart_list(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/cart/')
+        self.assertEqual(len(response.data), 20)
+        line = next(item for item in response.data if item['quantity'] == 4)
+        self.assertEqual(line['total_price'], Decimal('50.00'))
+        self.assertEqual(line['product_details']['title'], Product.objects.get(pk=line['product']).title)
+
+    def test_land_listing_list(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/land-listings/?page_size=50')
+        self.assertEqual(len(response.data['results']), 10)
+        for item in response.data['results']:
+            self.assertEqual(item['total_bids'], 3)
+            self.assertEqual(Decimal(item['highest_bid']), Decimal(200) + Decimal(item['title'].split()[-1]))
+
+    def test_bid_list(self):
+        with self.assertNumQueries(1) as queries:
+            response = self.client.get('/api/bids/')
+        self.assertEqual(len(response.data), 30)
+        self.assertNotIn('JOIN', queries.captured_queries[0]['sql'])
+
+    def test_cart_update_reports_new_total(self):
+        line = Cart.objects.filter(user=self.user, quantity=1).get()
+        response = self.client.patch(f'/api/cart/{line.pk}/', {'quantity': 3}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_price'], Decimal('37.50'))
+
+
+def make_image(name='photo.png', size=(1600, 1200), color='green'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(AGRISHOP_IMAGE_PIPELINE={'ASYNC': False})
+class ImagePipelineTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def create_product(self, **extra):
+        return Product.objects.create(
+            title='Urea', description='Nitrogen', quantity=5, price=Decimal('25.00'), **extra
+        )
+
+    def test_upload_generates_derivatives(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self.create_product(image=make_image())
+
+        product.refresh_from_db()
+        self.assertEqual(len(product.image_hash), 64)
+        self.assertEqual(set(product.image_derivatives), {'thumb', 'card', 'full'})
+        full = product.image_derivatives['full']
+        self.assertEqual((full['width'], full['height']), (800, 600))
+        self.assertTrue(default_storage.exists(full['jpeg']))
+        self.assertTrue(default_storage.exists(full['webp']))
+
+        response = APIClient().get(f'/api/products/{product.pk}/')
+        self.assertTrue(response.data['image_derivatives']['thumb']['webp'].endswith('thumb.webp'))
+
+    def test_non_image_saves_skip_the_pipeline(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self.create_product(image=make_image())
+
+        product = Product.objects.get(pk=product.pk)
+        product.price = Decimal('30.00')
+        with mock.patch('agrishop.models.schedule_derivatives') as schedule:
+            product.save()
+        schedule.assert_not_called()
+
+    def test_identical_reupload_is_not_reprocessed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self.create_product(image=make_image())
+
+        product = Product.objects.get(pk=product.pk)
+        product.image = make_image('again.png')
+        with mock.patch('agrishop.images._store') as store:
+            with self.captureOnCommitCallbacks(execute=True):
+                product.save()
+        store.assert_not_called()
+
+
+class FullTextSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        def product(title, description):
+            return Product.objects.create(
+                title=title, description=description, quantity=1, price=Decimal('1.00')
+            )
+        cls.urea = product('Urea', 'High nitrogen content for plant growth.')
+        cls.sulfur_urea = product('Sulfur-Coated Urea', 'Controlled-release nitrogen. Urea based.')
+        cls.potash = product('Muriate of Potash', 'Potassium for plant growth.')
+        creator = make_user()
+        cls.plot = LandBidding.objects.create(
+            creator=creator, title='Canal-side farmland', description='Irrigated wheat plot',
+            area_size=Decimal('4.00'), starting_bid_amount=Decimal('100.00'),
+        )
+
+    def search(self, url):
+        response = APIClient().get(url)
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_prefix_match_across_columns_ranked_by_bm25(self):
+        ids = self.search('/api/products/?search=ure')
+        # Two mentions of "urea" outrank one.
+        self.assertEqual(ids, [self.sulfur_urea.pk, self.urea.pk])
+        self.assertCountEqual(self.search('/api/products/?search=plant grow'), [self.urea.pk, self.potash.pk])
+
+    def test_ranked_results_page_with_cursors(self):
+        client = APIClient()
+        first = client.get('/api/products/?search=ure&page_size=1').data
+        second = client.get(first['next']).data
+        self.assertEqual(
+            [first['results'][0]['id'], second['results'][0]['id']],
+            [self.sulfur_urea.pk, self.urea.pk],
+        )
+        self.assertIsNone(second['next'])
+
+    def test_explicit_ordering_overrides_rank(self):
+        ids = self.search('/api/products/?search=nitrogen&ordering=created_at')
+        self.assertEqual(ids, [self.urea.pk, self.sulfur_urea.pk])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.urea.title = 'Granular Urea'
+        self.urea.description = 'Prilled'
+        self.urea.save()
+        self.potash.delete()
+        self.assertEqual(self.search('/api/products/?search=prilled'), [self.urea.pk])
+        self.assertEqual(self.search('/api/products/?search=potassium'), [])
+
+    def test_land_listing_search(self):
+        self.assertEqual(self.search('/api/land-listings/?search=irrig'), [self.plot.pk])
+
+    def test_quotes_in_terms_are_escaped(self):
+        self.assertEqual(self.search('/api/products/?search="urea'), [self.sulfur_urea.pk, self.urea.pk])
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO agrishop_product_fts(agrishop_product_fts) VALUES ('delete-all')")
+        self.assertEqual(self.search('/api/products/?search=urea'), [])
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(len(self.search('/api/products/?search=urea')), 2)
+
+
+class BidEngineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = make_user('seller@example.com', role='seller', business_name='Farms')
+        cls.bidder = make_user()
+        cls.listing = LandBidding.objects.create(
+            creator=cls.seller, title='Plot', description='Plot',
+            area_size=Decimal('1.00'), starting_bid_amount=Decimal('500.00'),
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.bidder)
+
+    def bid(self, amount):
+        return self.client.post(
+            f'/api/land-listings/{self.listing.pk}/place_bid/', {'bid_amount': amount}, format='json'
+        )
+
+    def test_place_bid_validates_against_the_listing(self):
+        self.assertEqual(self.bid('400.00').status_code, 400)
+        self.assertEqual(self.bid('500.00').status_code, 201)
+        response = self.bid('500.00')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('bid_amount', response.data)
+        self.assertEqual(self.bid('650.00').status_code, 201)
+
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.bid_count, 2)
+        self.assertEqual(self.listing.current_highest_bid, Decimal('650.00'))
+
+    def test_closed_listing_rejects_bids(self):
+        LandBidding.objects.filter(pk=self.listing.pk).update(status='closed')
+        response = self.bid('900.00')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('land_listing', response.data)
+
+    def test_bid_endpoint_uses_the_engine(self):
+        response = self.client.post('/api/bids/', {'land_listing': self.listing.pk, 'bid_amount': '700.00'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post('/api/bids/', {'land_listing': self.listing.pk, 'bid_amount': '600.00'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_deleting_a_bid_resyncs_the_listing(self):
+        self.bid('600.00')
+        top = self.bid('700.00').data
+        self.client.delete(f'/api/bids/{top["id"]}/')
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.bid_count, self.listing.current_highest_bid), (1, Decimal('600.00')))
+
+    def test_bids_cannot_be_edited(self):
+        top = self.bid('700.00').data
+        for method in (self.client.put, self.client.patch):
+            response = method(f'/api/bids/{top["id"]}/', {'land_listing': self.listing.pk, 'bid_amount': '1.00'},
+                              format='json')
+            self.assertEqual(response.status_code, 405)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.current_highest_bid, Decimal('700.00'))
+
+    def test_anonymous_users_cannot_bid(self):
+        self.client.force_authenticate(None)
+        self.assertIn(self.bid('900.00').status_code, (401, 403))
+
+
+class BidStatisticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = make_user('seller@example.com', role='seller', business_name='Farms')
+        cls.bidders = [make_user(f'bidder{i}@example.com') for i in range(3)]
+        cls.listing = LandBidding.objects.create(
+            creator=cls.seller, title='Plot', description='Plot',
+            area_size=Decimal('1.00'), starting_bid_amount=Decimal('100.00'),
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        # bidder0: 100, 130; bidder1: 110, 140; bidder2: 120
+        for amount, bidder in zip([100, 110, 120, 130, 140], [0, 1, 2, 0, 1]):
+            place_bid(self.listing.pk, self.bidders[bidder], Decimal(amount))
+
+    def test_bids_update_standings_and_statistics(self):
+        statistics = BidStatistics.objects.get(land_listing=self.listing)
+        self.assertEqual(statistics.unique_bidders, 3)
+        self.assertLessEqual(statistics.first_bid_at, statistics.last_bid_at)
+        standing = BidderStanding.objects.get(land_listing=self.listing, bidder=self.bidders[0])
+        self.assertEqual((standing.best_bid, standing.bid_count), (Decimal('130.00'), 2))
+
+    def test_leaderboard(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/land-listings/{self.listing.pk}/leaderboard/?limit=3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([bid['bid_amount'] for bid in response.data['top_bids']], ['140.00', '130.00', '120.00'])
+        statistics = response.data['statistics']
+        self.assertEqual((statistics['highest_bid'], statistics['bid_count'], statistics['unique_bidders']),
+                         ('140.00', 5, 3))
+
+        empty = LandBidding.objects.create(
+            creator=self.seller, title='Empty', description='Empty',
+            area_size=Decimal('1.00'), starting_bid_amount=Decimal('100.00'),
+        )
+        response = self.client.get(f'/api/land-listings/{empty.pk}/leaderboard/')
+        self.assertEqual(response.data['top_bids'], [])
+        self.assertEqual((response.data['statistics']['unique_bidders'], response.data['statistics']['bids_per_hour']),
+                         (0, None))
+        self.assertEqual(self.client.get(f'/api/land-listings/{empty.pk}/leaderboard/?limit=x').status_code, 400)
+
+    def test_my_rank(self):
+        ranks = []
+        for bidder in self.bidders:
+            self.client.force_authenticate(bidder)
+            with self.assertNumQueries(3):
+                response = self.client.get(f'/api/land-listings/{self.listing.pk}/my_rank/')
+            ranks.append(response.data['standing']['rank'])
+        self.assertEqual(ranks, [2, 1, 3])
+
+        self.client.force_authenticate(self.seller)
+        response = self.client.get(f'/api/land-listings/{self.listing.pk}/my_rank/')
+        self.assertIsNone(response.data['standing'])
+
+    def test_deleting_bids_rebuilds_statistics(self):
+        self.client.force_authenticate(self.bidders[2])
+        bid = Bid.objects.get(bidder=self.bidders[2])
+        self.assertEqual(self.client.delete(f'/api/bids/{bid.pk}/').status_code, 204)
+        self.assertEqual(BidStatistics.objects.get(land_listing=self.listing).unique_bidders, 2)
+        self.assertFalse(BidderStanding.objects.filter(bidder=self.bidders[2]).exists())
+
+    def test_leaderboard_reads_use_the_indexes(self):
+        plan = str(Bid.objects.filter(land_listing=self.listing).order_by('-bid_amount')[:10].explain())
+        self.assertIn('bid_listing_amount_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+        plan = str(Bid.objects.filter(bidder=self.bidders[0]).order_by('-bid_time').explain())
+        self.assertIn('bid_bidder_time_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class AuctionLifecycleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = make_user('seller@example.com', role='seller', business_name='Farms')
+        cls.bidders = [make_user(f'bidder{i}@example.com') for i in range(2)]
+
+    def setUp(self):
+        super().setUp()
+        feed.reset()
+        self.addCleanup(feed.reset)
+
+    def make_listing(self, ends_at, **extra):
+        return LandBidding.objects.create(
+            creator=self.seller, title='Plot', description='Plot', area_size=Decimal('1.00'),
+            starting_bid_amount=Decimal('100.00'), ends_at=ends_at, **extra
+        )
+
+    def test_bids_stop_at_the_end_time(self):
+        listing = self.make_listing(timezone.now() + timedelta(minutes=5))
+        place_bid(listing.pk, self.bidders[0], Decimal('150.00'))
+        LandBidding.objects.filter(pk=listing.pk).update(ends_at=timezone.now() - timedelta(seconds=1))
+        with self.assertRaises(ValidationError) as raised:
+            place_bid(listing.pk, self.bidders[1], Decimal('200.00'))
+        self.assertIn('ended', str(raised.exception.detail['land_listing']))
+
+    def test_close_records_winners_and_publishes_closing(self):
+        expired = self.make_listing(timezone.now() + timedelta(minutes=5))
+        place_bid(expired.pk, self.bidders[0], Decimal('150.00'))
+        winning = place_bid(expired.pk, self.bidders[1], Decimal('175.00'))
+        unsold = self.make_listing(timezone.now() - timedelta(minutes=1))
+        running = self.make_listing(timezone.now() + timedelta(hours=1))
+        open_ended = self.make_listing(None)
+
+        later = timezone.now() + timedelta(minutes=6)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(close_expired_auctions(now=later), 2)
+        self.assertEqual(close_expired_auctions(now=later), 0)
+
+        expired.refresh_from_db()
+        self.assertEqual((expired.status, expired.winning_bid_id, expired.closed_at), ('closed', winning.pk, later))
+        unsold.refresh_from_db()
+        self.assertEqual((unsold.status, unsold.winning_bid_id), ('closed', None))
+        self.assertEqual(LandBidding.objects.filter(pk__in=[running.pk, open_ended.pk], status='active').count(), 2)
+
+        [*_, closing] = feed._history[expired.pk]
+        self.assertEqual(closing.type, 'closing')
+        self.assertEqual((closing.data['winning_bid'], closing.data['winner'], closing.data['current_highest_bid']),
+                         (winning.pk, self.bidders[1].pk, '175.00'))
+
+    @override_settings(AGRISHOP_AUCTIONS={'BATCH_SIZE': 1})
+    def test_close_batches_by_the_setting(self):
+        for _ in range(2):
+            self.make_listing(timezone.now() - timedelta(minutes=1))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(close_expired_auctions(), 2)
+        closes = [query for query in queries.captured_queries
+                  if query['sql'].startswith('UPDATE "agrishop_landbidding" SET "status"')]
+        self.assertEqual(len(closes), 2)
+
+    def test_thousands_of_expiring_listings_close_in_a_few_statements(self):
+        ends_at = timezone.now() - timedelta(minutes=1)
+        listings = LandBidding.objects.bulk_create([
+            LandBidding(creator=self.seller, title=f'Plot {i}', description='Plot', area_size=Decimal('1.00'),
+                        starting_bid_amount=Decimal('100.00'), current_highest_bid=Decimal(200 + i), bid_count=1,
+                        ends_at=ends_at)
+            for i in range(3000)
+        ])
+        Bid.objects.bulk_create([
+            Bid(land_listing=listing, bidder=self.bidders[i % 2], bid_amount=listing.current_highest_bid)
+            for i, listing in enumerate(listings)
+        ])
+
+        # Per batch: savepoint, select, update, read back, insert and update
+        # the price buckets, release; then the empty select.
+        with self.assertNumQueries(3 * 7 + 3), self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(close_expired_auctions(batch_size=1000), 3000)
+        self.assertEqual(len(callbacks), 2 * 3000)
+        self.assertFalse(LandBidding.objects.filter(status='closed', winning_bid__isnull=True).exists())
+        self.assertFalse(LandBidding.objects.filter(status='closed').exclude(
+            winning_bid__bid_amount=F('current_highest_bid')).exists())
+
+    def test_command_and_scheduler(self):
+        listing = self.make_listing(timezone.now() - timedelta(minutes=1))
+        out = io.StringIO()
+        call_command('close_auctions', stdout=out)
+        self.assertIn('Closed 1 expired auctions', out.getvalue())
+        listing.refresh_from_db()
+        self.assertEqual(listing.status, 'closed')
+
+        runs = threading.Semaphore(0)
+        with mock.patch('agrishop.auctions.close_expired_auctions', side_effect=lambda **kwargs: runs.release()) as close:
+            scheduler = AuctionScheduler(interval=0.01, batch_size=10)
+            scheduler.start()
+            self.assertTrue(runs.acquire(timeout=5) and runs.acquire(timeout=5))
+            scheduler.stop()
+            scheduler.join()
+        close.assert_called_with(batch_size=10)
+
+    def test_end_time_must_be_in_the_future(self):
+        client = APIClient()
+        client.force_authenticate(self.seller)
+        data = {'title': 'Plot', 'description': 'Plot', 'area_size': '1.00', 'starting_bid_amount': '100.00'}
+        response = client.post('/api/land-listings/', {**data, 'ends_at': timezone.now() - timedelta(hours=1)},
+                               format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ends_at', response.data)
+        response = client.post('/api/land-listings/', {**data, 'ends_at': timezone.now() + timedelta(days=3)},
+                               format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(response.data['winning_bid'])
+
+
+class BidConcurrencyTests(TransactionTestCase):
+    """Hammer one listing from many threads; the accepted bids must stay strictly increasing."""
+
+    def test_parallel_bids_on_one_listing(self):
+        seller = make_user('seller@example.com', role='seller', business_name='Farms')
+        bidders = [make_user(f'bidder{i}@example.com') for i in range(20)]
+        listing = LandBidding.objects.create(
+            creator=seller, title='Plot', description='Plot',
+            area_size=Decimal('1.00'), starting_bid_amount=Decimal('100.00'),
+        )
+
+        rng = random.Random(7)
+        amounts = [Decimal(rng.randint(100, 5000)) for _ in range(400)]
+        work = list(zip(amounts, [bidders[i % len(bidders)] for i in range(len(amounts))]))
+        lock = threading.Lock()
+        outcomes = {'accepted': 0, 'rejected': 0, 'errors': []}
+
+        def worker():
+            from django.db import connection as thread_connection
+            from rest_framework.exceptions import ValidationError
+            try:
+                while True:
+                    with lock:
+                        if not work:
+                            return
+                        amount, bidder = work.pop()
+                    try:
+                        place_bid(listing.pk, bidder, amount)
+                        key = 'accepted'
+                    except ValidationError:
+                        key = 'rejected'
+                    with lock:
+                        outcomes[key] += 1
+            except Exception as exc:
+                outcomes['errors'].append(exc)
+            finally:
+                thread_connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(outcomes['errors'], [])
+        self.assertEqual(outcomes['accepted'] + outcomes['rejected'], len(amounts))
+
+        listing.refresh_from_db()
+        accepted = list(Bid.objects.filter(land_listing=listing).order_by('id').values_list('bid_amount', flat=True))
+        self.assertEqual(len(accepted), outcomes['accepted'])
+        self.assertEqual(listing.bid_count, len(accepted))
+        self.assertEqual(listing.current_highest_bid, max(amounts))
+        self.assertEqual(accepted, sorted(set(accepted)))
+
+        bidder_ids = set(Bid.objects.filter(land_listing=listing).values_list('bidder_id', flat=True))
+        self.assertEqual(BidStatistics.objects.get(land_listing=listing).unique_bidders, len(bidder_ids))
+        self.assertEqual(sum(BidderStanding.objects.filter(land_listing=listing).values_list('bid_count', flat=True)),
+                         len(accepted))
+
+
+class BulkCartTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user()
+        cls.products = [
+            Product.objects.create(title=f'Seed {i}', description='S', quantity=50, price=Decimal('5.00') + i)
+            for i in range(40)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def bulk(self, *operations):
+        return self.client.post('/api/cart/bulk/', {'operations': list(operations)}, format='json')
+
+    def cart(self):
+        return dict(Cart.objects.filter(user=self.user).values_list('product_id', 'quantity'))
+
+    def test_add_set_and_remove_in_order(self):
+        urea, dap, potash = self.products[:3]
+        Cart.objects.create(user=self.user, product=urea, quantity=2)
+        Cart.objects.create(user=self.user, product=potash, quantity=1)
+
+        response = self.bulk(
+            {'op': 'add', 'product': urea.pk, 'quantity': 3},
+            {'op': 'add', 'product': dap.pk},
+            {'op': 'add', 'product': dap.pk, 'quantity': 4},
+            {'op': 'set', 'product': urea.pk, 'quantity': 7},
+            {'op': 'remove', 'product': potash.pk},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.cart(), {urea.pk: 7, dap.pk: 5})
+        self.assertEqual({line['product']: line['quantity'] for line in response.data}, self.cart())
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        def sync(products):
+            return [{'op': 'set', 'product': product.pk, 'quantity': 2} for product in products]
+
+        with CaptureQueriesContext(connection) as small:
+            self.bulk(*sync(self.products[:5]))
+        Cart.objects.filter(user=self.user).delete()
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self.bulk(*sync(self.products)).status_code, 200)
+        self.assertEqual(len(large), len(small))
+        # Products, current lines, one upsert and the response, plus the savepoint pair.
+        self.assertLessEqual(len(large), 6)
+        self.assertEqual(len(self.cart()), 40)
+
+    def test_invalid_operations_reject_the_whole_batch(self):
+        Cart.objects.create(user=self.user, product=self.products[0], quantity=1)
+        response = self.bulk(
+            {'op': 'remove', 'product': self.products[0].pk},
+            {'op': 'add', 'product': 999999},
+            {'op': 'set', 'product': self.products[1].pk, 'quantity': 51},
+        )
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['operations']
+        self.assertEqual(errors[0], {})
+        self.assertIn('product', errors[1])
+        self.assertIn('available stock (50)', str(errors[2]['quantity']))
+        self.assertEqual(self.cart(), {self.products[0].pk: 1})
+
+        self.assertEqual(self.bulk({'op': 'set', 'product': self.products[0].pk}).status_code, 400)
+        self.assertEqual(self.bulk().status_code, 400)
+
+
+class CheckoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user()
+        cls.urea = Product.objects.create(title='Urea', description='N', quantity=10, price=Decimal('20.00'))
+        cls.dap = Product.objects.create(title='DAP', description='P', quantity=3, price=Decimal('30.00'))
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def stock(self):
+        return dict(Product.objects.values_list('title', 'quantity'))
+
+    def test_checkout_reserves_stock_and_clears_cart(self):
+        Cart.objects.create(user=self.user, product=self.urea, quantity=4)
+        Cart.objects.create(user=self.user, product=self.dap, quantity=3)
+
+        response = self.client.post('/api/orders/checkout/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['status'], 'reserved')
+        self.assertEqual(Decimal(response.data['total_amount']), Decimal('170.00'))
+        self.assertEqual(len(response.data['items']), 2)
+        self.assertEqual(self.stock(), {'Urea': 6, 'DAP': 0})
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
+
+        confirmed = self.client.post(f"/api/orders/{response.data['id']}/confirm/")
+        self.assertEqual(confirmed.data['status'], 'confirmed')
+
+    def test_short_line_rolls_back_the_whole_order(self):
+        Cart.objects.create(user=self.user, product=self.urea, quantity=4)
+        Cart.objects.create(user=self.user, product=self.dap, quantity=3)
+        Product.objects.filter(pk=self.dap.pk).update(quantity=2)
+
+        response = self.client.post('/api/orders/checkout/')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(self.dap.pk), response.data['quantity'])
+        self.assertEqual(self.stock(), {'Urea': 10, 'DAP': 2})
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 2)
+
+    def test_empty_cart(self):
+        self.assertEqual(self.client.post('/api/orders/checkout/').status_code, 400)
+
+    def test_cancel_and_expiry_return_stock(self):
+        Cart.objects.create(user=self.user, product=self.urea, quantity=5)
+        order = checkout(self.user)
+        self.client.post(f'/api/orders/{order.pk}/cancel/')
+        self.assertEqual(self.stock()['Urea'], 10)
+
+        Cart.objects.create(user=self.user, product=self.urea, quantity=5)
+        order = checkout(self.user)
+        self.assertEqual(release_expired_reservations(), 0)
+        released = release_expired_reservations(now=timezone.now() + timedelta(hours=1))
+        self.assertEqual(released, 1)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'expired')
+        self.assertEqual(self.stock()['Urea'], 10)
+
+        response = self.client.post(f'/api/orders/{order.pk}/confirm/')
+        self.assertEqual(response.status_code, 400)
+
+
+class CheckoutConcurrencyTests(TransactionTestCase):
+    def test_parallel_checkouts_never_oversell(self):
+        product = Product.objects.create(title='Urea', description='N', quantity=25, price=Decimal('20.00'))
+        users = [make_user(f'buyer{i}@example.com') for i in range(40)]
+        for user in users:
+            Cart.objects.create(user=user, product=product, quantity=2)
+
+        errors = []
+
+        def buy(user):
+            from django.db import connection as thread_connection
+            from rest_framework.exceptions import ValidationError
+            try:
+                checkout(user)
+            except ValidationError:
+                pass
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                thread_connection.close()
+
+        threads = [threading.Thread(target=buy, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        product.refresh_from_db()
+        self.assertEqual(Order.objects.count(), 12)
+        self.assertEqual(product.quantity, 1)
+
+    def test_only_read_then_write_transactions_begin_immediate(self):
+        product = Product.objects.create(title='Urea', description='N', quantity=5, price=Decimal('20.00'))
+        user = make_user()
+        Cart.objects.create(user=user, product=product, quantity=2)
+        with CaptureQueriesContext(connection) as queries:
+            checkout(user)
+            with transaction.atomic():
+                Product.objects.count()
+        begins = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('BEGIN')]
+        self.assertEqual(begins, ['BEGIN IMMEDIATE', 'BEGIN'])
+
+
+class AggregateConcurrencyTests(TransactionTestCase):
+    def test_concurrent_saves_of_one_product_keep_aggregates_current(self):
+        category = Category.objects.create(name='Fertilizers')
+        product = Product.objects.create(title='Urea', description='N', category=category, quantity=0,
+                                         price=Decimal('20.00'))
+        errors = []
+
+        def edit(seed):
+            from django.db import connection as thread_connection
+            rng = random.Random(seed)
+            try:
+                for _ in range(10):
+                    current = Product.objects.get(pk=product.pk)
+                    current.quantity = rng.choice([0, 3, 8])
+                    current.save()
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                thread_connection.close()
+
+        threads = [threading.Thread(target=edit, args=(seed,)) for seed in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        maintained = CategoryAggregate.objects.values().get(category=category)
+        refresh_category_aggregates()
+        self.assertEqual(maintained, CategoryAggregate.objects.values().get(category=category))
+
+
+class FacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user()
+        cls.fertilizers = Category.objects.create(name='Fertilizers')
+        cls.seeds = Category.objects.create(name='Seeds')
+        cls.urea = Product.objects.create(title='Urea', description='Nitrogen', category=cls.fertilizers,
+                                          quantity=10, price=Decimal('12.00'))
+        cls.dap = Product.objects.create(title='DAP', description='Phosphate', category=cls.fertilizers,
+                                         quantity=0, price=Decimal('48.50'))
+        cls.wheat = Product.objects.create(title='Wheat seed', description='Certified', category=cls.seeds,
+                                           quantity=5, price=Decimal('95.00'))
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def aggregates(self):
+        return {row.pop('category_id'): row for row in CategoryAggregate.objects.values()}
+
+    def assertAggregatesCurrent(self):
+        maintained = self.aggregates()
+        refresh_category_aggregates()
+        self.assertEqual(maintained, self.aggregates())
+
+    def test_product_writes_keep_aggregates_current(self):
+        self.assertEqual(self.aggregates()[self.fertilizers.pk], {
+            'product_count': 2, 'in_stock_count': 1, 'total_stock': 10,
+            'min_price': Decimal('12.00'), 'max_price': Decimal('48.50'),
+        })
+
+        self.dap.quantity = 7
+        self.dap.save()
+        self.urea.price = Decimal('60.00')
+        self.urea.save(update_fields=['price'])
+        self.assertAggregatesCurrent()
+
+        self.wheat.category = self.fertilizers
+        self.wheat.save()
+        self.assertAggregatesCurrent()
+        self.assertEqual(self.aggregates()[self.seeds.pk]['min_price'], None)
+
+        self.dap.delete()
+        self.assertAggregatesCurrent()
+
+    def test_stock_moves_keep_aggregates_current(self):
+        Cart.objects.create(user=self.user, product=self.urea, quantity=10)
+        Cart.objects.create(user=self.user, product=self.wheat, quantity=2)
+        order = checkout(self.user)
+        self.assertEqual(self.aggregates()[self.fertilizers.pk]['in_stock_count'], 0)
+        self.assertAggregatesCurrent()
+
+        cancel_order(order)
+        self.assertEqual(self.aggregates()[self.fertilizers.pk]['total_stock'], 10)
+        self.assertAggregatesCurrent()
+
+    def test_facets_in_one_grouped_query(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/products/facets/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(
+            [(item['name'], item['count']) for item in response.data['categories']],
+            [('Fertilizers', 2), ('Seeds', 1)],
+        )
+        self.assertEqual(response.data['availability'], {'in_stock': 2, 'out_of_stock': 1})
+        price = response.data['price']
+        self.assertEqual((price[0]['min'], price[-1]['max']), ('0.00', '100.00'))
+        self.assertEqual(sum(bucket['count'] for bucket in price), 3)
+
+        filtered = self.client.get(f'/api/products/facets/?category={self.fertilizers.pk}&buckets=2').data
+        self.assertEqual(filtered['total'], 2)
+        self.assertEqual([bucket['count'] for bucket in filtered['price']], [1, 0, 1])  # 0-20-40-60
+        self.assertEqual(filtered['availability'], {'in_stock': 1, 'out_of_stock': 1})
+
+        self.assertEqual(self.client.get('/api/products/facets/?search=urea').data['total'], 1)
+
+    def test_price_edges_are_round(self):
+        self.assertEqual(price_edges(Decimal('12.00'), Decimal('95.00'), 5),
+                         [Decimal(edge) for edge in ('0.00', '20.00', '40.00', '60.00', '80.00', '100.00')])
+        self.assertEqual(price_edges(None, None, 5), [])
+        self.assertEqual(price_edges(Decimal('10.00'), Decimal('10.01'), 5), [Decimal('10.00'), Decimal('10.01')])
+
+    def test_narrow_price_range(self):
+        Product.objects.filter(pk=self.urea.pk).update(price=Decimal('10.00'))
+        Product.objects.filter(pk__in=[self.dap.pk, self.wheat.pk]).update(price=Decimal('10.01'))
+        refresh_category_aggregates()
+        price = self.client.get('/api/products/facets/').data['price']
+        self.assertEqual([(bucket['min'], bucket['max'], bucket['count']) for bucket in price],
+                         [('10.00', '10.01', 3)])
+
+
+class CatalogCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Fertilizers')
+        cls.product = Product.objects.create(
+            title='Urea', description='N', category=cls.category, quantity=10, price=Decimal('20.00')
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def test_repeated_reads_skip_the_database(self):
+        for url in ['/api/products/', f'/api/products/{self.product.pk}/', '/api/categories/']:
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                second = self.client.get(url)
+            self.assertEqual(first.data, second.data)
+
+    def test_query_parameters_are_part_of_the_key(self):
+        self.client.get('/api/products/?ordering=price')
+        with self.assertNumQueries(1):
+            self.client.get('/api/products/?ordering=-price')
+
+    def test_writes_invalidate(self):
+        self.client.get(f'/api/products/{self.product.pk}/')
+        self.product.title = 'Granular Urea'
+        self.product.save()
+        self.assertEqual(self.client.get(f'/api/products/{self.product.pk}/').data['title'], 'Granular Urea')
+
+        self.client.get('/api/categories/')
+        Category.objects.create(name='Seeds')
+        self.assertEqual(len(self.client.get('/api/categories/').data), 2)
+
+    def test_checkout_invalidates_stock(self):
+        user = make_user()
+        self.client.get(f'/api/products/{self.product.pk}/')
+        Cart.objects.create(user=user, product=self.product, quantity=4)
+        checkout(user)
+        self.assertEqual(self.client.get(f'/api/products/{self.product.pk}/').data['quantity'], 6)
+
+    def test_conditional_requests(self):
+        url = f'/api/products/{self.product.pk}/'
+        response = self.client.get(url)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        self.product.price = Decimal('22.00')
+        self.product.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_each_format_has_its_own_etag(self):
+        url = f'/api/products/{self.product.pk}/'
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, {'format': 'csv'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(url, {'format': 'csv'}, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_list_is_modified_by_deletes(self):
+        other = Product.objects.create(title='DAP', description='Phosphate', quantity=5, price=Decimal('30.00'))
+        last_modified = self.client.get('/api/products/')['Last-Modified']
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        # The remaining rows are no newer than before.
+        other.delete()
+        response = self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data['results']], [self.product.pk])
+        self.assertGreater(parse_http_date(response['Last-Modified']), parse_http_date(last_modified))
+
+    def test_cart_nests_the_cached_product_payload(self):
+        user = make_user()
+        Cart.objects.create(user=user, product=self.product, quantity=1)
+        self.client.force_authenticate(user)
+        detail = self.client.get(f'/api/products/{self.product.pk}/').data
+        self.assertEqual(self.client.get('/api/cart/').data[0]['product_details'], detail)
+
+
+class PayloadSizeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Fertilizers', description='Soil nutrients')
+        cls.products = [
+            Product.objects.create(
+                title=f'Urea {i}', description='Granular nitrogen fertilizer. ' * 20,
+                category=cls.category, quantity=10, price=Decimal('20.00') + i,
+            )
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def test_product_list_is_compact(self):
+        item = self.client.get('/api/products/').data['results'][0]
+        self.assertEqual(
+            set(item), {'id', 'sku', 'title', 'category', 'price', 'quantity', 'thumbnail', 'updated_at'}
+        )
+        detail = self.client.get(f'/api/products/{item["id"]}/').data
+        self.assertIn('description', detail)
+
+    def test_fields_narrow_the_payload_and_the_select(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/products/?fields=id,title,price&page_size=2')
+        self.assertEqual([set(item) for item in response.data['results']], [{'id', 'title', 'price'}] * 2)
+        self.assertNotIn('description', queries[0]['sql'])
+
+        # The cursor still works: created_at is loaded for it.
+        following = self.client.get(response.data['next']).data['results']
+        self.assertEqual(len(following), 2)
+
+        self.assertEqual(self.client.get('/api/categories/?fields=name').data, [{'name': 'Fertilizers'}])
+
+    def test_fields_of_the_compact_list(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/products/?fields=id,thumbnail&page_size=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([set(item) for item in response.data['results']], [{'id', 'thumbnail'}] * 2)
+        self.assertIn('image_derivatives', queries[0]['sql'])
+        self.assertNotIn('description', queries[0]['sql'])
+        # Full-representation fields still select the full serializer.
+        response = self.client.get('/api/products/?fields=id,description&page_size=2')
+        self.assertEqual([set(item) for item in response.data['results']], [{'id', 'description'}] * 2)
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get('/api/products/?fields=id,secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.data['fields'])
+
+    def test_sparse_detail_is_cached_apart_from_the_full_one(self):
+        url = f'/api/products/{self.products[0].pk}/'
+        self.assertEqual(self.client.get(f'{url}?fields=title').data, {'title': 'Urea 0'})
+        self.assertIn('description', self.client.get(url).data)
+
+    def test_gzip_when_accepted(self):
+        response = self.client.get('/api/products/?page_size=5', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertLess(int(response['Content-Length']), len(self.client.get('/api/products/?page_size=5').content))
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))['results']), 5)
+
+        self.assertFalse(self.client.get('/api/products/').has_header('Content-Encoding'))
+        refused = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(refused.has_header('Content-Encoding'))
+
+    def test_streaming_responses_are_not_compressed(self):
+        response = self.client.get('/api/products/?format=csv', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response.streaming)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class BulkImportExportTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+    def write(self, name, text):
+        path = f'{self.tmp}/{name}'
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write(text)
+        return path
+
+    def test_csv_import_upserts_on_sku(self):
+        Category.objects.create(name='Fertilizers')
+        Product.objects.create(sku='UREA-50', title='Old urea', description='', quantity=1, price=Decimal('1.00'))
+        path = self.write('feed.csv', (
+            'sku,title,description,category,quantity,price\n'
+            'UREA-50,Urea 50kg,Nitrogen,Fertilizers,120,25.50\n'
+            'DAP-50,DAP 50kg,Phosphorus,Fertilizers,80,30.75\n'
+            'SEED-1,Wheat seed,Certified,Seeds,500,9.99\n'
+            ',Missing sku,,Seeds,1,1\n'
+            'BAD-1,Bad price,,Seeds,1,abc\n'
+        ))
+        out, err = io.StringIO(), io.StringIO()
+        # Per written chunk: categories, the upsert, and the category aggregates.
+        with self.assertNumQueries(10):
+            call_command('import_products', path, '--chunk-size', '3', stdout=out, stderr=err)
+
+        self.assertIn('Imported 3 of 5 rows', out.getvalue())
+        self.assertIn('Row 4: sku is required', err.getvalue())
+        urea = Product.objects.get(sku='UREA-50')
+        self.assertEqual((urea.title, urea.quantity, urea.price), ('Urea 50kg', 120, Decimal('25.50')))
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertEqual(Product.objects.get(sku='SEED-1').category.name, 'Seeds')
+        # Upserted rows are picked up by the FTS triggers.
+        response = APIClient().get('/api/products/?search=urea')
+        self.assertEqual([item['sku'] for item in response.data['results']], ['UREA-50'])
+
+    def test_jsonl_round_trip(self):
+        source = self.write('feed.jsonl', '\n'.join(json.dumps(row) for row in [
+            {'sku': 'A', 'title': 'Alpha', 'description': 'x', 'category': 'Tools', 'quantity': 3, 'price': 4.5},
+            {'sku': 'B', 'title': 'Beta', 'description': 'y', 'category': '', 'quantity': 0, 'price': '10'},
+        ]))
+        call_command('import_products', source, stdout=io.StringIO())
+
+        target = f'{self.tmp}/export.jsonl'
+        call_command('export_products', target, stdout=io.StringIO())
+        with open(target, encoding='utf-8') as handle:
+            rows = [json.loads(line) for line in handle]
+        self.assertEqual(rows, [
+            {'sku': 'A', 'title': 'Alpha', 'description': 'x', 'category': 'Tools', 'quantity': 3, 'price': '4.50'},
+            {'sku': 'B', 'title': 'Beta', 'description': 'y', 'category': None, 'quantity': 0, 'price': '10.00'},
+        ])
+
+
+    def test_jsonl_rows_of_the_wrong_type_are_reported(self):
+        source = self.write('feed.jsonl', '\n'.join(json.dumps(row) for row in [
+            {'sku': 'A', 'title': 'Alpha', 'category': 'Tools', 'quantity': None, 'price': 1},
+            {'sku': 'B', 'title': 'Beta', 'category': 7, 'quantity': 1, 'price': 1},
+            {'sku': 'C', 'title': ['Gamma'], 'quantity': 1, 'price': 1},
+            {'sku': 'D', 'title': 'Delta', 'category': None, 'quantity': 2, 'price': None},
+            {'sku': 'E', 'title': 'Epsilon', 'category': None, 'quantity': 2, 'price': 3},
+        ]))
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_products', source, stdout=out, stderr=err)
+
+        self.assertIn('Imported 1 of 5 rows', out.getvalue())
+        self.assertIn('Row 1: quantity and price are required', err.getvalue())
+        self.assertIn('Row 2: category must be a string', err.getvalue())
+        self.assertIn('Row 3: title must be a string', err.getvalue())
+        self.assertIn('Row 4: quantity and price are required', err.getvalue())
+        self.assertEqual(list(Product.objects.values_list('sku', flat=True)), ['E'])
+
+
+class StreamingExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Seeds')
+        Product.objects.bulk_create([
+            Product(title=f'Seed {i}', description='Certified', category=cls.category,
+                    quantity=i, price=Decimal('2.50'))
+            for i in range(5)
+        ])
+        Product.objects.create(title='Plough', description='Steel', quantity=1, price=Decimal('90.00'))
+
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_streams_every_filtered_row(self):
+        # One lookup for the category filter, one cursor for the rows.
+        with self.assertNumQueries(2):
+            response = APIClient().get(f'/api/products/?format=csv&category={self.category.pk}')
+            body = self.read(response)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('product-export.csv', response['Content-Disposition'])
+        lines = body.splitlines()
+        self.assertTrue(lines[0].startswith('id,image_derivatives,'))
+        # Every row, not a page, and no cursor wrapper.
+        self.assertEqual(len(lines), 6)
+        self.assertNotIn('Plough', body)
+
+    def test_jsonl_respects_search(self):
+        response = APIClient().get('/api/products/?format=jsonl&search=plough')
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual([row['title'] for row in rows], ['Plough'])
+        self.assertEqual(rows[0]['price'], '90.00')
+
+    def test_bids_export_is_scoped_to_the_user(self):
+        seller = make_user('seller@example.com', role='seller', business_name='Acres')
+        bidder = make_user('bidder@example.com')
+        listing = LandBidding.objects.create(
+            creator=seller, title='Plot', description='Plot',
+            area_size=Decimal('5.00'), starting_bid_amount=Decimal('100.00'),
+        )
+        place_bid(listing.pk, bidder, Decimal('150.00'))
+        place_bid(listing.pk, seller, Decimal('175.00'))
+        client = APIClient()
+        client.force_authenticate(bidder)
+        body = self.read(client.get('/api/bids/?format=csv'))
+        self.assertEqual(len(body.splitlines()), 2)
+        self.assertIn('150.00', body)
+
+    def test_user_export_never_includes_passwords(self):
+        make_user(password='secret-pass')
+        rows = self.read(APIClient().get('/api/users/?format=jsonl')).splitlines()
+        self.assertEqual(len(rows), 1)
+        self.assertNotIn('password', json.loads(rows[0]))
+
+    def test_detail_views_render_csv_without_streaming(self):
+        product = Product.objects.get(title='Plough')
+        response = APIClient().get(f'/api/products/{product.pk}/?format=csv')
+        self.assertFalse(response.streaming)
+        self.assertEqual(response.content.decode().splitlines()[1].split(',')[0], str(product.pk))
+
+
+class PerfInstrumentationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Tools')
+        Product.objects.bulk_create([
+            Product(title=f'Hoe {i}', description='Steel', category=cls.category, quantity=1, price=Decimal('5.00'))
+            for i in range(6)
+        ])
+
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def test_server_timing_and_rolling_stats(self):
+        for _ in range(3):
+            response = APIClient().get('/api/products/')
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", serialize;dur=[\d.]+')
+
+        summary = registry.snapshot()['views']['product-list']
+        self.assertEqual(summary['count'], 3)
+        self.assertEqual(summary['metrics']['bytes']['p50'], len(response.content))
+        self.assertGreater(summary['metrics']['serialize_ms']['p95'], 0)
+        self.assertEqual(summary['n_plus_one'], 0)
+
+    def test_repeated_statements_are_flagged(self):
+        with profile() as current:
+            for product in Product.objects.all():
+                product.category.name
+        sql, count = current.repeated_statement()
+        self.assertEqual(count, 6)
+        self.assertIn('"agrishop_category"', sql)
+
+    def test_in_lists_normalize_to_one_statement(self):
+        with profile() as current:
+            list(Product.objects.filter(pk__in=[1, 2]))
+            list(Product.objects.filter(pk__in=[1, 2, 3]))
+        self.assertEqual(len(current.statements), 1)
+
+    def test_perf_report(self):
+        registry.record('product-list', {'wall_ms': 12.0, 'db_ms': 3.0, 'queries': 2, 'serialize_ms': 1.0, 'bytes': 900})
+        registry.record('cart-list', {'wall_ms': 80.0, 'db_ms': 60.0, 'queries': 41, 'serialize_ms': 50.0, 'bytes': 4000},
+                        ('SELECT ... FROM "agrishop_product" WHERE "agrishop_product"."id" = %s', 40))
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        registry.write_snapshot(tmp)
+        self.assertEqual(os.listdir(tmp), [f'perf-{os.getpid()}.json'])
+        # Another worker's snapshot is merged in.
+        registry.reset()
+        registry.record('cart-list', {'wall_ms': 90.0, 'db_ms': 70.0, 'queries': 41, 'serialize_ms': 55.0, 'bytes': 4000},
+                        ('SELECT ... FROM "agrishop_product" WHERE "agrishop_product"."id" = %s', 40))
+        with mock.patch('os.getpid', return_value=1):
+            registry.write_snapshot(tmp)
+
+        out = io.StringIO()
+        call_command('perf_report', '--dir', tmp, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[1].startswith('cart-list'))
+        self.assertTrue(lines[1].endswith('N+1'))
+        self.assertIn('cart-list: 2 of 2 requests', out.getvalue())
+        self.assertIn('x40', out.getvalue())
+
+    def test_only_profiled_serializers_are_timed(self):
+        class PlainSerializer(serializers.Serializer):
+            title = serializers.CharField()
+
+        products = list(Product.objects.all())
+        with profile() as current:
+            PlainSerializer(products, many=True).data
+        self.assertEqual(current.serialize_time, 0)
+        with profile() as current:
+            ProductListSerializer(products, many=True).data
+        self.assertGreater(current.serialize_time, 0)
+
+
+class TokenAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user(role='seller', business_name='Green Acres')
+        cls.product = Product.objects.create(title='Urea', description='Nitrogen', quantity=10, price=Decimal('25.00'))
+
+    def setUp(self):
+        super().setUp()
+        self.access = tokens_for_user(self.user).access_token
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+
+    def test_requests_do_not_load_the_user(self):
+        Cart.objects.create(user=self.user, product=self.product, quantity=2)
+        # Only the cart query; the user comes from the token.
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/cart/')
+        self.assertEqual(response.data[0]['user'], self.user.pk)
+
+    def test_claims_and_lazy_row(self):
+        user = ClaimsUser(AccessToken(str(self.access)))
+        with self.assertNumQueries(0):
+            self.assertEqual((user.pk, user.email, user.role, user.is_staff),
+                             (self.user.pk, 'farmer@example.com', 'seller', False))
+        with self.assertNumQueries(1):
+            self.assertEqual(user.full_name, 'Test Farmer')
+            self.assertEqual(user.business_name, 'Green Acres')
+
+        copied = copy.copy(user)
+        self.assertEqual((copied.pk, copied.email), (self.user.pk, 'farmer@example.com'))
+        self.assertFalse(hasattr(ClaimsUser.__new__(ClaimsUser), 'email'))
+
+    def test_writes_are_owned_by_the_token_user(self):
+        response = self.client.post('/api/cart/', {'product': self.product.pk, 'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Cart.objects.get().user_id, self.user.pk)
+        # The same product again is a validation error, not an IntegrityError.
+        response = self.client.post('/api/cart/', {'product': self.product.pk, 'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('non_field_errors', response.data)
+        line = Cart.objects.get()
+        response = self.client.patch(f'/api/cart/{line.pk}/', {'product': self.product.pk, 'quantity': 3}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post('/api/land-listings/', {
+            'title': 'Plot', 'description': 'Plot', 'area_size': '5.00', 'starting_bid_amount': '100.00',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        listing_id = response.data['id']
+        self.assertEqual(LandBidding.objects.get(pk=listing_id).creator_id, self.user.pk)
+
+        response = self.client.post(f'/api/land-listings/{listing_id}/place_bid/', {'bid_amount': '150.00'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Bid.objects.get().bidder_id, self.user.pk)
+
+        response = self.client.post('/api/orders/checkout/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['user'], self.user.pk)
+
+    def test_register_issues_tokens_with_claims(self):
+        response = APIClient().post('/api/register/', {
+            'email': 'new@example.com', 'full_name': 'New Farmer', 'password': 'x' * 12,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        token = AccessToken(response.data['access'])
+        self.assertEqual((token['email'], token['role']), ('new@example.com', 'customer'))
+
+    def test_invalid_tokens_are_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer not-a-token')
+        self.assertEqual(self.client.get('/api/cart/').status_code, 401)
+
+
+FAST_HASHING = {'WORKERS': 0, 'SCRYPT_WORK_FACTOR': 2 ** 10, 'PBKDF2_ITERATIONS': 1000}
+
+
+@override_settings(AGRISHOP_PASSWORDS=FAST_HASHING)
+class LoginTests(TestCase):
+    def login(self, password='correct horse', email='farmer@example.com'):
+        return APIClient().post('/api/login/', {'email': email, 'password': password}, format='json')
+
+    def test_login_rehashes_legacy_hashes(self):
+        user = make_user()
+        user.password = make_password('correct horse', hasher='pbkdf2_sha256')
+        user.save()
+
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AccessToken(response.data['access'])['user_id'], user.pk)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('scrypt$1024$'))
+        self.assertTrue(user.check_password('correct horse'))
+
+    def test_login_rehashes_when_the_cost_changes(self):
+        user = make_user(password='correct horse')
+        with override_settings(AGRISHOP_PASSWORDS={**FAST_HASHING, 'SCRYPT_WORK_FACTOR': 2 ** 11}):
+            self.assertEqual(self.login().status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('scrypt$2048$'))
+
+    def test_failed_logins_lock_the_account_before_hashing(self):
+        make_user(password='correct horse')
+        for _ in range(5):
+            self.assertEqual(self.login('wrong').status_code, 401)
+        with mock.patch('agrishop.passwords.verify_password') as verify, self.assertNumQueries(0):
+            response = self.login(email='Farmer@EXAMPLE.com')
+        self.assertEqual(response.status_code, 429)
+        verify.assert_not_called()
+
+    def test_unknown_accounts_still_pay_for_a_hash(self):
+        with mock.patch('agrishop.passwords.verify_password', return_value=False) as verify:
+            self.assertEqual(self.login(email='nobody@example.com').status_code, 401)
+        verify.assert_called_once()
+
+    def test_register_twice(self):
+        for email in ['one@example.com', 'two@example.com']:
+            response = APIClient().post('/api/register/', {
+                'email': email, 'full_name': 'Farmer', 'password': 'correct horse',
+            }, format='json')
+            self.assertEqual(response.status_code, 201)
+        self.assertTrue(CustomUser.objects.get(email='two@example.com').check_password('correct horse'))
+
+    @override_settings(AGRISHOP_PASSWORDS={**FAST_HASHING, 'WORKERS': 1})
+    def test_verification_in_the_process_pool(self):
+        self.addCleanup(shutdown_pool)
+        encoded = hash_password('correct horse')
+        self.assertTrue(verify_password('correct horse', encoded))
+        self.assertFalse(verify_password('wrong', encoded))
+
+
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user()
+        cls.product = Product.objects.create(title='Urea', description='Nitrogen', quantity=5, price=Decimal('25.00'))
+        cls.listing = LandBidding.objects.create(
+            creator=make_user('seller@example.com', role='seller', business_name='Acres'),
+            title='Plot', description='Plot', area_size=Decimal('5.00'), starting_bid_amount=Decimal('100.00'),
+        )
+
+    def setUp(self):
+        super().setUp()
+        # The async ORM runs on this thread's already open test connection.
+        install_query_hooks()
+        # AsyncClient only forwards per-request headers into the ASGI scope.
+        self.auth = {'Authorization': f'Bearer {tokens_for_user(self.user).access_token}'}
+
+    async def test_listing_detail_matches_the_drf_view(self):
+        response = await self.async_client.get(f'/api/async/land-listings/{self.listing.pk}/', headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+        expected = await sync_to_async(lambda: APIClient().get(f'/api/land-listings/{self.listing.pk}/').json())()
+        self.assertEqual(response.json(), expected)
+        missing = await self.async_client.get('/api/async/land-listings/999999/', headers=self.auth)
+        self.assertEqual(missing.status_code, 404)
+
+    async def test_place_bid(self):
+        url = f'/api/async/land-listings/{self.listing.pk}/place_bid/'
+        response = await self.async_client.post(url, {'bid_amount': '150.00'}, content_type='application/json', headers=self.auth)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['bidder'], self.user.pk)
+
+        response = await self.async_client.post(url, {'bid_amount': '120.00'}, content_type='application/json', headers=self.auth)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('bid_amount', response.json())
+        listing = await LandBidding.objects.aget(pk=self.listing.pk)
+        self.assertEqual((listing.current_highest_bid, listing.bid_count), (Decimal('150.00'), 1))
+
+        anonymous = await self.async_client.post(url, {'bid_amount': '200.00'}, content_type='application/json')
+        self.assertEqual(anonymous.status_code, 401)
+
+        missing = await self.async_client.post('/api/async/land-listings/999999/place_bid/', {'bid_amount': '200.00'},
+                                               content_type='application/json', headers=self.auth)
+        self.assertEqual(missing.status_code, 404)
+
+    async def test_cart_actions(self):
+        response = await self.async_client.post('/api/async/cart/', {'product': self.product.pk, 'quantity': 2},
+                                          content_type='application/json', headers=self.auth)
+        self.assertEqual(response.status_code, 201, response.content)
+        line_id = response.json()['id']
+        self.assertEqual(response.json()['total_price'], 50.0)
+
+        # A second line for the product is refused as by the DRF endpoint.
+        response = await self.async_client.post('/api/async/cart/', {'product': self.product.pk, 'quantity': 1},
+                                          content_type='application/json', headers=self.auth)
+        self.assertEqual(response.status_code, 400)
+
+        def drf_post():
+            client = APIClient()
+            client.force_authenticate(self.user)
+            return client.post('/api/cart/', {'product': self.product.pk, 'quantity': 1}, format='json').json()
+        self.assertEqual(response.json(), await sync_to_async(drf_post)())
+
+        response = await self.async_client.patch(f'/api/async/cart/{line_id}/', {'quantity': 9},
+                                           content_type='application/json', headers=self.auth)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('quantity', response.json())
+
+        def drf_patch():
+            client = APIClient()
+            client.force_authenticate(self.user)
+            response = client.patch(f'/api/cart/{line_id}/', {'quantity': 9}, format='json')
+            return response.status_code, response.json()
+        self.assertEqual((400, response.json()), await sync_to_async(drf_patch)())
+
+        response = await self.async_client.patch(f'/api/async/cart/{line_id}/', {'quantity': 3},
+                                           content_type='application/json', headers=self.auth)
+        self.assertEqual((response.status_code, response.json()['total_price']), (200, 75.0))
+
+        response = await self.async_client.get('/api/async/cart/', headers=self.auth)
+        self.assertEqual([line['quantity'] for line in response.json()], [3])
+        self.assertEqual(response.json()[0]['product_details']['title'], 'Urea')
+
+        response = await self.async_client.delete(f'/api/async/cart/{line_id}/', headers=self.auth)
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(await Cart.objects.aexists())
+
+    async def test_cart_lines_are_private(self):
+        other = await sync_to_async(make_user)('other@example.com')
+        line = await Cart.objects.acreate(user=other, product=self.product, quantity=1)
+        response = await self.async_client.get(f'/api/async/cart/{line.pk}/', headers=self.auth)
+        self.assertEqual(response.status_code, 404)
+
+
+def parse_events(chunks):
+    events = []
+    for chunk in chunks:
+        fields = dict(line.split(': ', 1) for line in chunk.strip().splitlines() if not line.startswith(':'))
+        if 'event' in fields:
+            events.append((fields['id'], fields['event'], json.loads(fields['data'])))
+    return events
+
+
+async def disconnect(chunks):
+    # The ASGI handler cancels the response task when the client goes away.
+    pending = asyncio.ensure_future(anext(chunks))
+    await asyncio.sleep(0)
+    pending.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await pending
+
+
+class LiveFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.bidder = make_user()
+        cls.listing = LandBidding.objects.create(
+            creator=make_user('seller@example.com', role='seller', business_name='Acres'),
+            title='Plot', description='Plot', area_size=Decimal('5.00'), starting_bid_amount=Decimal('100.00'),
+        )
+
+    def setUp(self):
+        super().setUp()
+        feed.reset()
+        self.addCleanup(feed.reset)
+
+    def test_place_bid_publishes_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            bid = place_bid(self.listing.pk, self.bidder, Decimal('150.00'))
+        self.assertEqual(list(feed._history[self.listing.pk]), [])
+        for callback in callbacks:
+            callback()
+        [event] = feed._history[self.listing.pk]
+        self.assertEqual((event.type, event.data['bid'], event.data['bid_amount']), ('bid', bid.pk, '150.00'))
+
+    def test_closing_a_listing_publishes_status_and_closing(self):
+        self.listing.title = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing.save()
+        self.assertEqual(list(feed._history[self.listing.pk]), [])
+
+        self.listing.status = 'closed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing.save()
+        status, closing = feed._history[self.listing.pk]
+        self.assertEqual((status.type, status.data['previous_status'], status.data['status']),
+                         ('status', 'active', 'closed'))
+        self.assertEqual(closing.type, 'closing')
+
+    async def test_resume_replays_only_newer_events(self):
+        first = feed.publish(self.listing.pk, 'bid', {'bid_amount': '150.00'})
+        feed.publish(999, 'bid', {'bid_amount': '1.00'})
+        second = feed.publish(self.listing.pk, 'bid', {'bid_amount': '160.00'})
+        subscription = feed.subscribe([self.listing.pk], last_event_id=first.id)
+        self.assertTrue(subscription.resumed)
+        self.assertEqual(subscription.backlog, [second])
+        feed.unsubscribe(subscription)
+
+        # An id from before evicted history, or from a restarted feed, cannot be resumed.
+        with override_settings(AGRISHOP_LIVE={'HISTORY': 1}):
+            feed.reset()
+            old = feed.publish(self.listing.pk, 'bid', {})
+            feed.publish(self.listing.pk, 'bid', {})
+            self.assertFalse(feed.subscribe([self.listing.pk], last_event_id=old.id - 1).resumed)
+            self.assertFalse(feed.subscribe([self.listing.pk], last_event_id=500).resumed)
+
+    async def test_slow_subscriber_is_disconnected(self):
+        with override_settings(AGRISHOP_LIVE={'QUEUE_SIZE': 2}):
+            subscription = feed.subscribe([self.listing.pk])
+            for _ in range(4):
+                feed.publish(self.listing.pk, 'bid', {})
+            await asyncio.sleep(0)
+            self.assertTrue(subscription.overflowed)
+            queued = [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+            # Two events, then the sentinel that ends the stream.
+            self.assertEqual(len(queued), 3)
+            self.assertIsNone(queued[-1])
+        feed.unsubscribe(subscription)
+        self.assertEqual(feed.subscriber_count(self.listing.pk), 0)
+
+    async def test_stream_sends_snapshot_then_live_events(self):
+        response = await self.async_client.get(f'/api/async/land-listings/{self.listing.pk}/events/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b'retry: 3000\n\n')
+        [(_, kind, data)] = parse_events([(await anext(chunks)).decode()])
+        self.assertEqual((kind, data['status'], data['bid_count']), ('snapshot', 'active', 0))
+
+        bid = feed.publish(self.listing.pk, 'bid', {'bid_amount': '150.00'})
+        [(event_id, kind, data)] = parse_events([(await anext(chunks)).decode()])
+        self.assertEqual((event_id, kind, data), (bid.event_id, 'bid', {'land_listing': self.listing.pk, 'bid_amount': '150.00'}))
+        await disconnect(chunks)
+        self.assertEqual(feed.subscriber_count(self.listing.pk), 0)
+
+    async def test_stream_resumes_from_last_event_id(self):
+        seen = feed.publish(self.listing.pk, 'bid', {'bid_amount': '150.00'})
+        missed = feed.publish(self.listing.pk, 'bid', {'bid_amount': '160.00'})
+        response = await self.async_client.get('/api/async/land-listings/events/',
+                                               {'listings': f'{self.listing.pk},999'},
+                                               headers={'Last-Event-ID': seen.event_id})
+        chunks = aiter(response.streaming_content)
+        await anext(chunks)
+        [(event_id, kind, _)] = parse_events([(await anext(chunks)).decode()])
+        self.assertEqual((event_id, kind), (missed.event_id, 'bid'))
+        await disconnect(chunks)
+
+    async def test_ids_of_another_epoch_get_a_snapshot(self):
+        seen = feed.publish(self.listing.pk, 'bid', {'bid_amount': '150.00'})
+        self.assertEqual(feed.parse_event_id(seen.event_id), seen.id)
+        # A restarted process numbers its events from 1 again.
+        feed.reset()
+        feed.publish(self.listing.pk, 'bid', {'bid_amount': '160.00'})
+        self.assertIsNone(feed.parse_event_id(seen.event_id))
+        self.assertIsNone(feed.parse_event_id(str(seen.id)))
+
+        response = await self.async_client.get(f'/api/async/land-listings/{self.listing.pk}/events/',
+                                               headers={'Last-Event-ID': seen.event_id})
+        chunks = aiter(response.streaming_content)
+        await anext(chunks)
+        [(event_id, kind, _)] = parse_events([(await anext(chunks)).decode()])
+        self.assertEqual((event_id, kind), (f'{feed.epoch}-1', 'snapshot'))
+        await disconnect(chunks)
+
+    async def test_stream_validates_listings(self):
+        response = await self.async_client.get('/api/async/land-listings/events/', {'listings': 'a,b'})
+        self.assertEqual(response.status_code, 400)
+        response = await self.async_client.get('/api/async/land-listings/999999/events/')
+        self.assertEqual(response.status_code, 404)
+
+
+class DatabaseRoutingTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.router = CatalogReplicaRouter()
+
+    def test_sqlite_connections_use_wal(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+    def test_without_a_replica_everything_reads_from_the_default(self):
+        self.assertIsNone(self.router.db_for_read(Product))
+
+    @mock.patch.dict('django.conf.settings.DATABASES', {'replica': {}})
+    def test_catalog_reads_go_to_the_replica(self):
+        # TestCase holds a transaction open on the primary; step outside it.
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            self.assertEqual(self.router.db_for_read(Product), 'replica')
+            self.assertEqual(self.router.db_for_read(LandBidding), 'replica')
+            self.assertIsNone(self.router.db_for_read(Cart))
+        self.assertEqual(self.router.db_for_read(Product), 'default')
+        self.assertEqual(self.router.db_for_write(Product), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'agrishop'))
+
+    @mock.patch.dict('django.conf.settings.DATABASES', {'replica': {}})
+    def test_writing_requests_read_the_primary(self):
+        middleware = PrimaryPinningMiddleware(lambda request: self.router.db_for_read(Product))
+        factory = test.RequestFactory()
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            self.assertEqual(middleware(factory.get('/api/products/')), 'replica')
+            self.assertEqual(middleware(factory.post('/api/cart/')), 'default')
+            with use_primary():
+                self.assertEqual(self.router.db_for_read(Product), 'default')
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('buyer@example.com')
+        seller = make_user('seller@example.com', role='seller', business_name='Farms')
+        category = Category.objects.create(name='Fertilizers')
+        products = [
+            Product.objects.create(title=f'Urea {i}', description='Nitrogen', category=category,
+                                   quantity=10, price=Decimal('10.00') + i)
+            for i in range(3)
+        ]
+        listing = LandBidding.objects.create(
+            creator=seller, title='Ten acres', description='Canal-irrigated acres', city='lahore',
+            area_size=Decimal('10.00'), starting_bid_amount=Decimal('100.00'),
+        )
+        place_bid(listing.pk, cls.user, Decimal('150.00'))
+        Cart.objects.create(user=cls.user, product=products[0], quantity=1)
+        checkout(cls.user)
+
+    def test_analyze_flags_scans_and_sorts(self):
+        self.assertEqual(analyze(['SCAN agrishop_product']), (['agrishop_product'], []))
+        self.assertEqual(analyze(['SCAN agrishop_product USING INDEX product_created_id_idx']), ([], []))
+        self.assertEqual(
+            analyze(['SEARCH agrishop_order USING INDEX x (user_id=?)', 'USE TEMP B-TREE FOR ORDER BY']),
+            ([], ['USE TEMP B-TREE FOR ORDER BY']),
+        )
+        self.assertEqual(analyze(['  ->  Seq Scan on agrishop_product']), (['agrishop_product'], []))
+
+    def test_api_queries_are_served_by_indexes(self):
+        out = io.StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertIn('every one is served by an index', out.getvalue())
+        self.assertNotIn('Skipped', out.getvalue())
+
+    def test_missing_index_fails_the_check(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX order_user_created_idx')  # rolled back with the test
+        out = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command('check_query_plans', stdout=out)
+        self.assertIn('/api/orders/: USE TEMP B-TREE FOR ORDER BY', out.getvalue())
+
+
+class AnalyticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = make_user('seller@example.com', role='seller', business_name='Farms')
+        cls.staff = make_user('staff@example.com', is_staff=True)
+        cls.buyer = make_user('buyer@example.com')
+        cls.fertilizers = Category.objects.create(name='Fertilizers')
+        cls.urea = Product.objects.create(title='Urea', description='N', category=cls.fertilizers,
+                                          quantity=10, price=Decimal('20.00'))
+        cls.dap = Product.objects.create(title='DAP', description='P', category=cls.fertilizers,
+                                         quantity=4, price=Decimal('30.00'))
+        Cart.objects.create(user=cls.buyer, product=cls.urea, quantity=4)
+        Cart.objects.create(user=cls.buyer, product=cls.dap, quantity=2)
+        confirm_order(checkout(cls.buyer))
+        Cart.objects.create(user=cls.buyer, product=cls.urea, quantity=1)
+        Cart.objects.create(user=cls.buyer, product=cls.dap, quantity=1)
+        checkout(cls.buyer)  # reserved only: not revenue
+        Cart.objects.create(user=cls.buyer, product=cls.urea, quantity=3)
+
+        listing = LandBidding.objects.create(
+            creator=cls.seller, title='Ten acres', description='Canal-irrigated', city='lahore',
+            area_size=Decimal('10.00'), starting_bid_amount=Decimal('100.00'),
+        )
+        for amount in ('150.00', '175.00', '300.00'):
+            place_bid(listing.pk, cls.buyer, Decimal(amount))
+
+    def setUp(self):
+        super().setUp()
+        caches['default'].clear()
+        self.client = APIClient()
+
+    def test_load_frame_reads_columns_in_chunks(self):
+        frame = load_frame(Bid.objects.all(), {'bid': 'id', 'amount': as_float('bid_amount')}, chunk_size=2)
+        self.assertEqual(len(frame), 3)
+        self.assertEqual(sorted(frame['amount']), [150.0, 175.0, 300.0])
+        self.assertEqual(len(load_frame(Bid.objects.none(), {'bid': 'id'})), 0)
+
+    def test_reports(self):
+        reports = build_reports(['revenue', 'inventory', 'prices'], days=30)
+
+        revenue = reports['revenue']
+        self.assertEqual((revenue['total'], revenue['orders'], revenue['units']), (140.0, 1, 6))
+        self.assertEqual(revenue['by_day'][-1]['revenue'], 140.0)
+        self.assertEqual(len(revenue['by_day']), 31)
+        self.assertEqual(revenue['by_category'], [
+            {'category': self.fertilizers.pk, 'name': 'Fertilizers', 'revenue': 140.0, 'units': 6},
+        ])
+        self.assertEqual([row['title'] for row in revenue['top_products']], ['Urea', 'DAP'])
+
+        inventory = reports['inventory']
+        # Urea: 10 - 4 confirmed - 1 reserved; DAP: 4 - 2 - 1.
+        self.assertEqual(inventory['stock_units'], 6)
+        self.assertEqual(inventory['stock_value'], 5 * 20.0 + 1 * 30.0)
+        self.assertEqual(inventory['units_in_carts'], 3)
+        [category] = inventory['by_category']
+        self.assertEqual((category['sold'], category['turnover']), (6, round(6 / (6 + 6 / 2), 2)))
+        self.assertEqual(inventory['low_cover'][0]['title'], 'DAP')
+
+        [city] = reports['prices']['land_bids']
+        self.assertEqual(city['city'], 'lahore')
+        self.assertEqual(city['weeks'][-1] | {'week': None}, {
+            'week': None, 'bids': 3, 'median': 175.0, 'mean': 208.33, 'max': 300.0,
+        })
+        [prices] = reports['prices']['product_prices']
+        self.assertEqual(prices['weeks'][-1]['average_price'], round(140 / 6, 2))
+
+    def test_endpoint_is_for_staff_and_cached(self):
+        self.assertEqual(self.client.get('/api/analytics/').status_code, 401)
+        # Store-wide figures: neither buyers nor sellers see them.
+        for user in (self.buyer, self.seller):
+            self.client.force_authenticate(user)
+            self.assertEqual(self.client.get('/api/analytics/').status_code, 403)
+
+        self.client.force_authenticate(self.staff)
+        response = self.client.get('/api/analytics/?reports=revenue&days=7')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'days', 'revenue'})
+        self.assertEqual(response.data['revenue']['total'], 140.0)
+
+        Order.objects.update(status='confirmed')
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/analytics/?reports=revenue&days=7')
+        self.assertEqual(cached.data['revenue'], response.data['revenue'])
+        caches['default'].clear()
+        self.assertEqual(self.client.get('/api/analytics/?reports=revenue&days=7').data['revenue']['total'], 190.0)
+
+        self.assertEqual(self.client.get('/api/analytics/?reports=margins').status_code, 400)
+        self.assertEqual(self.client.get('/api/analytics/?days=soon').status_code, 400)
+
+
+class LandComparableTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = make_user('seller@example.com', role='seller', business_name='Farms')
+        cls.bidder = make_user('bidder@example.com')
+        cls.listing = cls.make_listing('10.00', '1000.00')
+        cls.near = cls.make_listing('11.00', '1210.00')     # 110 per acre
+        cls.larger = cls.make_listing('40.00', '4000.00')   # 100 per acre
+        cls.pricier = cls.make_listing('10.00', '3000.00')  # 300 per acre
+        cls.make_listing('0.00', '500.00')                  # no area: never comparable
+        cls.make_listing('10.00', '1000.00', city='karachi')
+
+    @classmethod
+    def make_listing(cls, area, price, city='lahore', **extra):
+        return LandBidding.objects.create(
+            creator=cls.seller, title=f'{area} acres', description='Canal-irrigated', city=city,
+            area_size=Decimal(area), starting_bid_amount=Decimal(price), **extra,
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def statistics(self, city='lahore'):
+        [statistics] = city_statistics([city])
+        return statistics
+
+    def test_price_per_area_is_generated(self):
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.price_per_area, 100.0)
+        LandBidding.objects.filter(pk=self.listing.pk).update(area_size=Decimal('8.00'))
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.price_per_area, 125.0)
+        self.assertIsNone(LandBidding.objects.get(area_size=0).price_per_area)
+
+    def test_comparables(self):
+        # Listing, price buckets, comparables; nothing is written.
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/land-listings/{self.listing.pk}/comparables/?limit=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['comparables']], [self.near.pk, self.pricier.pk])
+        self.assertAlmostEqual(response.data['comparables'][0]['distance'], 2 * math.log(1.1), places=4)
+
+        city = response.data['city']
+        self.assertEqual(city['city'], 'lahore')
+        self.assertEqual(city['asking_price_per_area']['count'], 4)
+        # Quantiles are within RELATIVE_ACCURACY of the asking prices (100, 100, 110, 300).
+        self.assertAlmostEqual(city['asking_price_per_area']['median'], 100, delta=1)
+        self.assertAlmostEqual(city['asking_price_per_area']['max'], 300, delta=3)
+        self.assertEqual(city['winning_bid_per_area']['count'], 0)
+        self.assertEqual(response.data['listing']['percentile'], 50.0)
+
+        response = self.client.get('/api/land-listings/price_statistics/?city=karachi')
+        self.assertAlmostEqual(response.data[0]['asking_price_per_area']['max'], 100, delta=1)
+        self.assertEqual(self.client.get('/api/land-listings/price_statistics/?city=paris').status_code, 400)
+
+    def test_statistics_follow_every_write(self):
+        self.assertEqual(self.statistics().asking.count, 4)
+        self.make_listing('5.00', '5000.00')
+        self.near.title = 'Renamed'
+        self.near.save()  # not a price change
+        self.pricier.starting_bid_amount = Decimal('2000.00')
+        self.pricier.save()
+        self.larger.city = 'karachi'
+        self.larger.save()
+        lahore = self.statistics()
+        self.assertEqual(lahore.asking.count, 4)
+        self.assertAlmostEqual(lahore.asking.quantiles()[-1], 1000, delta=10)
+        self.assertEqual(self.statistics('karachi').asking.count, 2)
+        self.near.delete()
+        self.assertEqual(self.statistics().asking.count, 3)
+
+        ended = self.make_listing('20.00', '1000.00', ends_at=timezone.now() + timedelta(minutes=1))
+        place_bid(ended.pk, self.bidder, Decimal('3000.00'))
+        LandBidding.objects.filter(pk=ended.pk).update(ends_at=timezone.now() - timedelta(minutes=1))
+        close_expired_auctions()
+        lahore = self.statistics()
+        self.assertEqual(lahore.winning.count, 1)
+        self.assertAlmostEqual(lahore.winning.quantiles()[0], 150, delta=1.5)
+
+        # A rebuild recounts the same buckets from the listings.
+        counts = sorted(LandPriceBucket.objects.filter(count__gt=0).values_list('city', 'kind', 'bucket', 'count'))
+        call_command('rebuild_price_statistics', stdout=io.StringIO())
+        self.assertEqual(sorted(LandPriceBucket.objects.values_list('city', 'kind', 'bucket', 'count')), counts)
+
+
+@override_settings(AGRISHOP_THROTTLE={'BUCKETS': {
+    'anon': {'CAPACITY': 10, 'RATE': 0.01},
+    'user': {'CAPACITY': 10, 'RATE': 0.01},
+    'bid': {'CAPACITY': 2, 'RATE': 0.01},
+}})
+class ThrottlingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user()
+        cls.product = Product.objects.create(title='Urea', description='Nitrogen', quantity=5, price=Decimal('25.00'))
+        cls.listing = LandBidding.objects.create(
+            creator=make_user('seller@example.com', role='seller', business_name='Acres'),
+            title='Plot', description='Plot', area_size=Decimal('5.00'), starting_bid_amount=Decimal('100.00'),
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def test_bucket_refills(self):
+        with mock.patch('agrishop.throttling.time.time', return_value=1000.0):
+            self.assertEqual(take('bucket', 3, 4, 1)[1].remaining, 1)
+            allowed, budget = take('bucket', 3, 4, 1)
+            self.assertEqual((allowed, budget.wait), (False, 2))
+            # A cost above capacity is charged as the whole bucket.
+            self.assertFalse(take('bucket', 100, 4, 1)[0])
+        with mock.patch('agrishop.throttling.time.time', return_value=1002.5):
+            allowed, budget = take('bucket', 3, 4, 1)
+            self.assertEqual((allowed, budget.remaining, budget.reset), (True, 0.5, 4))
+
+    def test_costs_and_headers(self):
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response['RateLimit-Limit'], response['RateLimit-Remaining']), ('10', '8'))
+        self.assertEqual(response['RateLimit-Reset'], '200')
+        response = self.client.get(f'/api/products/{self.product.pk}/')
+        self.assertEqual(response['RateLimit-Remaining'], '7')
+        # Searching costs the list's 2 plus SEARCH_COST.
+        response = self.client.get('/api/products/?search=urea')
+        self.assertEqual(response['RateLimit-Remaining'], '0')
+
+        response = self.client.get(f'/api/products/{self.product.pk}/')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 90)
+        self.assertEqual(response['RateLimit-Remaining'], '0')
+        # Other addresses and signed-in users have buckets of their own.
+        self.assertEqual(self.client.get('/api/products/', REMOTE_ADDR='10.0.0.2').status_code, 200)
+        # X-Forwarded-For is ignored without trusted proxies, so changing it
+        # does not get a fresh bucket.
+        response = self.client.get('/api/products/', HTTP_X_FORWARDED_FOR='203.0.113.9')
+        self.assertEqual(response.status_code, 429)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/products/').status_code, 200)
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1})
+    def test_forwarded_for_behind_a_proxy(self):
+        # One trusted proxy: only the address it appended counts.
+        for spoofed in ('198.51.100.1', '198.51.100.2'):
+            response = self.client.get('/api/products/?search=urea', HTTP_X_FORWARDED_FOR=f'{spoofed}, 203.0.113.9')
+            self.assertEqual(response.status_code, 200 if spoofed.endswith('1') else 429)
+        response = self.client.get('/api/products/', HTTP_X_FORWARDED_FOR='203.0.113.10')
+        self.assertEqual(response.status_code, 200)
+
+    def test_bids_draw_on_the_bid_bucket(self):
+        self.client.force_authenticate(self.user)
+        url = f'/api/land-listings/{self.listing.pk}/place_bid/'
+        self.assertEqual(self.client.post(url, {'bid_amount': '150.00'}).status_code, 201)
+        self.assertEqual(self.client.post(url, {'bid_amount': '160.00'}).status_code, 201)
+        response = self.client.post(url, {'bid_amount': '170.00'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual((response['RateLimit-Limit'], response['RateLimit-Remaining']), ('2', '0'))
+        response = self.client.post('/api/bids/', {'land_listing': self.listing.pk, 'bid_amount': '170.00'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(self.client.get('/api/land-listings/').status_code, 200)
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(self.user).access_token}')
+        response = client.post(f'/api/async/land-listings/{self.listing.pk}/place_bid/',
+                               {'bid_amount': '170.00'}, format='json')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 90)
+        self.assertEqual(Bid.objects.count(), 2)
 
-# Create your tests here.
@@ -0,0 +1,178 @@
+"""
+Token-bucket rate limiting with per-request costs, as DRF throttles.
+
+Every client has a bucket: signed-in users by id, anonymous clients by IP
+address. The address is DRF's get_ident: REMOTE_ADDR by default, or with
+REST_FRAMEWORK['NUM_PROXIES'] set, the X-Forwarded-For entry appended by
+the outermost trusted proxy, so clients cannot choose their own bucket.
+
+A bucket holds up to CAPACITY tokens and refills at RATE tokens a second.
+A request takes its cost from the bucket, or is refused with a 429 whose
+Retry-After is the time until the bucket holds enough. Views weigh their
+actions with `throttle_cost`, a number or `{action: number}`, and a
+?search= term or a streamed export adds SEARCH_COST or EXPORT_COST, so a
+scraper paging through searches runs dry long before a buyer browsing
+listings. place_bid also draws on a smaller per-user `bid` bucket.
+
+A bucket is two numbers in the CACHE_ALIAS cache. With LocMemCache every
+worker process keeps its own buckets, so N workers allow N times the
+budget; point the alias at a FileBasedCache to share them. Updates are
+serialized within a process only, so workers sharing a cache can overspend
+a bucket by a request or two under contention.
+
+RateLimitHeadersMiddleware reports the bucket with the fewest tokens left
+that a request drew on, in RateLimit-Limit, RateLimit-Remaining and
+RateLimit-Reset (seconds until it is full again).
+"""
+import math
+import threading
+import time
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+DEFAULTS = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'throttle',
+    # Burst size and refill rate (tokens per second) of each bucket.
+    'BUCKETS': {
+        'anon': {'CAPACITY': 120, 'RATE': 2},
+        'user': {'CAPACITY': 300, 'RATE': 5},
+        'bid': {'CAPACITY': 10, 'RATE': 0.2},
+    },
+    # Added to the view's cost when the request searches or exports.
+    'SEARCH_COST': 5,
+    'EXPORT_COST': 20,
+}
+
+_lock = threading.Lock()
+
+
+def get_setting(name):
+    return getattr(settings, 'AGRISHOP_THROTTLE', {}).get(name, DEFAULTS[name])
+
+
+@dataclass(frozen=True)
+class Budget:
+    limit: int
+    remaining: float
+    rate: float
+    # Seconds until a refused request's cost is available; 0 when allowed.
+    wait: float = 0
+
+    @property
+    def reset(self):
+        return math.ceil((self.limit - self.remaining) / self.rate)
+
+
+def take(key, cost, capacity, rate):
+    """Take `cost` tokens from bucket `key`; return `(allowed, Budget)`."""
+    cache = caches[get_setting('CACHE_ALIAS')]
+    # A request costing more than the whole bucket could never pass.
+    cost = min(cost, capacity)
+    with _lock:
+        now = time.time()
+        tokens, stamp = cache.get(key) or (capacity, now)
+        tokens = min(capacity, tokens + max(0, now - stamp) * rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        # A bucket that expires has refilled; a missing one is full.
+        cache.set(key, (tokens, now), math.ceil((capacity - tokens) / rate) + 1)
+    return allowed, Budget(capacity, tokens, rate, 0 if allowed else (cost - tokens) / rate)
+
+
+def request_cost(request, view):
+    cost = getattr(view, 'throttle_cost', 1)
+    if isinstance(cost, dict):
+        cost = cost.get(getattr(view, 'action', None), cost.get('default', 1))
+    if request.GET.get(api_settings.SEARCH_PARAM):
+        cost += get_setting('SEARCH_COST')
+    exporting = getattr(view, 'exporting', None)
+    if exporting and exporting():
+        cost += get_setting('EXPORT_COST')
+    return cost
+
+
+def record(request, budget):
+    """Keep the tightest budget on the HttpRequest for the headers middleware."""
+    request = getattr(request, '_request', request)
+    current = getattr(request, 'throttle_budget', None)
+    if current is None or budget.remaining < current.remaining:
+        request.throttle_budget = budget
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """The per-user or per-IP bucket, charged the request's cost."""
+
+    def get_bucket(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return 'user', user.pk
+        return 'anon', self.get_ident(request)
+
+    def get_cost(self, request, view):
+        return request_cost(request, view)
+
+    def allow_request(self, request, view):
+        if not get_setting('ENABLED'):
+            return True
+        scope, ident = self.get_bucket(request)
+        bucket = get_setting('BUCKETS')[scope]
+        allowed, self.budget = take(
+            f'throttle:{scope}:{ident}', self.get_cost(request, view), bucket['CAPACITY'], bucket['RATE']
+        )
+        record(request, self.budget)
+        return allowed
+
+    def wait(self):
+        return self.budget.wait
+
+
+class BidThrottle(TokenBucketThrottle):
+    """The smaller per-user bucket every bid also draws on, one token a bid."""
+
+    def get_bucket(self, request):
+        return 'bid', request.user.pk
+
+    def get_cost(self, request, view):
+        return 1
+
+
+def check_throttles(request, throttles, view=None):
+    """APIView.check_throttles for views outside DRF."""
+    waits = [throttle.wait() for throttle in throttles if not throttle.allow_request(request, view)]
+    if waits:
+        raise exceptions.Throttled(max(waits))
+
+
+class RateLimitHeadersMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        budget = getattr(request, 'throttle_budget', None)
+        if budget is not None:
+            response['RateLimit-Limit'] = str(budget.limit)
+            response['RateLimit-Remaining'] = str(math.floor(budget.remaining))
+            response['RateLimit-Reset'] = str(budget.reset)
+        return response
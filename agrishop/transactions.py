@@ -0,0 +1,35 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+@contextmanager
+def immediate_atomic(using=None):
+    """
+    transaction.atomic() that, as the outermost block on SQLite, starts with
+    BEGIN IMMEDIATE and so takes the write lock up front.
+
+    For transactions that read and then write (checkout, closing auctions).
+    Under the default deferred BEGIN two of them can both read, and the one
+    that then fails to upgrade to the write lock gets "database is locked"
+    at once instead of waiting out the busy timeout. Everything else keeps
+    deferred transactions, so readers never queue behind a writer. Nested
+    blocks and other databases behave exactly like transaction.atomic().
+    """
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    # Connecting resets transaction_mode from the settings.
+    connection.ensure_connection()
+    previous = connection.transaction_mode
+    connection.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic(using=using):
+            # Atomic.__enter__ has run the BEGIN; nothing else sees the mode.
+            connection.transaction_mode = previous
+            yield
+    finally:
+        connection.transaction_mode = previous
@@ -1,11 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import UserViewSet, ProductViewSet, CartViewSet, LandBiddingViewSet, BidViewSet, RegisterView, LoginView, CategoryViewSet
+from . import async_views
+from .views import UserViewSet, ProductViewSet, CartViewSet, OrderViewSet, LandBiddingViewSet, BidViewSet, RegisterView, LoginView, CategoryViewSet, AnalyticsView
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet)
 router.register(r'products', ProductViewSet)
 router.register(r'cart', CartViewSet, basename='cart')
+router.register(r'orders', OrderViewSet, basename='order')
 router.register(r'land-listings', LandBiddingViewSet)
 router.register(r'bids', BidViewSet, basename='bid')
 router.register(r'categories', CategoryViewSet)
@@ -14,4 +16,14 @@ urlpatterns = [
     path('', include(router.urls)),
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
+    path('analytics/', AnalyticsView.as_view(), name='analytics'),
+    # Async mirrors of the bidding and cart hot paths; see agrishop/async_views.py.
+    path('async/land-listings/<int:pk>/', async_views.land_listing_detail, name='async-landbidding-detail'),
+    path('async/land-listings/<int:pk>/place_bid/', async_views.land_listing_place_bid,
+         name='async-landbidding-place-bid'),
+    path('async/land-listings/events/', async_views.land_listing_events, name='async-landbidding-events'),
+    path('async/land-listings/<int:pk>/events/', async_views.land_listing_events,
+         name='async-landbidding-listing-events'),
+    path('async/cart/', async_views.cart_list, name='async-cart-list'),
+    path('async/cart/<int:pk>/', async_views.cart_detail, name='async-cart-detail'),
 ]
\ No newline at end of file
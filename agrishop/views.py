@@ -1,28 +1,76 @@
-from rest_framework import viewsets, permissions, filters, status
+from rest_framework import mixins, viewsets, permissions, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
 from rest_framework.exceptions import ValidationError
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth import authenticate
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import CustomUser, Product, Cart, LandBidding, Bid, Category
-from .serializers import UserSerializer, ProductSerializer, CartSerializer, LandBiddingSerializer, BidSerializer, CategorySerializer 
+from .models import CustomUser, Product, Cart, Order, LandBidding, Bid, Category
+from .serializers import UserSerializer, ProductSerializer, ProductListSerializer, CartSerializer, CartBulkSerializer, OrderSerializer, LandBiddingSerializer, BidSerializer, CategorySerializer, BidStatisticsSerializer, BidderStandingSerializer, LeaderboardBidSerializer, LandComparableSerializer
+from .pagination import KeysetCursorPagination
+from .cache import CachedCatalogMixin, make_key, request_fingerprint
+from .fieldsets import SparseFieldsetMixin, parse_fields
+from .exports import StreamingExportMixin
+from .search import FullTextSearchFilter
+from .authentication import tokens_for_user
+from .passwords import authenticate_login
+from .bidding import bidder_rank, leaderboard, recalculate_bid_summary
+from .cart import apply_cart_operations
+from .facets import facet_counts
+from .comparables import city_statistics, nearest_comparables, statistics_data
+from .throttling import BidThrottle, TokenBucketThrottle
+from . import analytics
+from . import checkout
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = CustomUser.objects.all()
     serializer_class = UserSerializer
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(StreamingExportMixin, CachedCatalogMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
+    cache_namespace = 'product'
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = KeysetCursorPagination
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter]
     filterset_fields = ['category']
     search_fields = ['title', 'description']
     ordering_fields = ['price', 'created_at']
+    # Tokens per request from the caller's bucket (agrishop/throttling.py).
+    throttle_cost = {'list': 2, 'facets': 5, 'default': 1}
 
-class CategoryViewSet(viewsets.ModelViewSet):
+    facet_buckets = 5
+    max_facet_buckets = 20
+
+    def get_serializer_class(self):
+        # Lists are compact, and ?fields= picks from the compact fields
+        # unless it names one only the full representation has; exports
+        # keep every column. The raw names, as requested_fields() validates
+        # them against this class.
+        if self.action == 'list' and not self.exporting():
+            names = parse_fields(self.request)
+            if not names or set(names) <= set(ProductListSerializer.Meta.fields):
+                return ProductListSerializer
+        return super().get_serializer_class()
+
+    @action(detail=False, methods=['GET'])
+    def facets(self, request):
+        """Category counts, price histogram and availability for the current filters."""
+        try:
+            buckets = int(request.query_params.get('buckets', self.facet_buckets))
+        except ValueError:
+            raise ValidationError({'buckets': 'A valid integer is required.'})
+        buckets = max(1, min(buckets, self.max_facet_buckets))
+
+        def build():
+            queryset = self.filter_queryset(self.get_queryset())
+            category = request.query_params.get('category')
+            category_id = int(category) if category and category.isdigit() else None
+            return Response(facet_counts(queryset, buckets, category_id))
+
+        return self.cached(request, make_key(self.cache_namespace, 'facets', request_fingerprint(request)), build)
+
+class CategoryViewSet(CachedCatalogMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
+    cache_namespace = 'category'
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
@@ -31,52 +79,169 @@ class CartViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Cart.objects.filter(user=self.request.user)
+        return Cart.objects.filter(user_id=self.request.user.pk).with_line_totals()
 
     def perform_create(self, serializer):
-        product = serializer.validated_data.get('product')
-        quantity = serializer.validated_data.get('quantity', 1)
+        # Stock and duplicates are checked by CartSerializer.validate.
+        serializer.save(user_id=self.request.user.pk)
+
+    @action(detail=False, methods=['POST'])
+    def bulk(self, request):
+        """Apply add/set/remove operations in one transaction and return the whole cart."""
+        serializer = CartBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        apply_cart_operations(request.user, serializer.validated_data['operations'])
+        return Response(self.get_serializer(self.get_queryset(), many=True).data)
+
+class OrderViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = OrderSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Order.objects.filter(user_id=self.request.user.pk).prefetch_related('items')
 
-        # Check if enough stock is available
-        if product.quantity < quantity:
-            raise ValidationError({"quantity": f"Only {product.quantity} items are available in stock."})
+    @action(detail=False, methods=['POST'])
+    def checkout(self, request):
+        order = checkout.checkout(request.user)
+        return Response(self.get_serializer(order).data, status=status.HTTP_201_CREATED)
 
-        # Assign logged-in user
-        serializer.save(user=self.request.user)
+    @action(detail=True, methods=['POST'])
+    def confirm(self, request, pk=None):
+        order = checkout.confirm_order(self.get_object())
+        return Response(self.get_serializer(order).data)
 
-class LandBiddingViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['POST'])
+    def cancel(self, request, pk=None):
+        order = checkout.cancel_order(self.get_object())
+        return Response(self.get_serializer(order).data)
+
+class LandBiddingViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = LandBidding.objects.all()
     serializer_class = LandBiddingSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    pagination_class = KeysetCursorPagination
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter]
     filterset_fields = ['city', 'status']
     search_fields = ['title', 'description']
+    throttle_cost = {'list': 2, 'comparables': 3, 'price_statistics': 2, 'default': 1}
+
+    leaderboard_size = 10
+    max_leaderboard_size = 100
+    comparables_size = 10
+    max_comparables_size = 50
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('leaderboard', 'my_rank'):
+            queryset = queryset.select_related('bid_statistics')
+        return queryset
 
     def perform_create(self, serializer):
-        serializer.save(creator=self.request.user)
+        serializer.save(creator_id=self.request.user.pk)
 
-    @action(detail=True, methods=['POST'])
+    @action(detail=True, methods=['GET'])
+    def leaderboard(self, request, pk=None):
+        try:
+            limit = int(request.query_params.get('limit', self.leaderboard_size))
+        except ValueError:
+            raise ValidationError({'limit': 'A valid integer is required.'})
+        limit = max(1, min(limit, self.max_leaderboard_size))
+
+        land_listing = self.get_object()
+        return Response({
+            'statistics': BidStatisticsSerializer(land_listing).data,
+            'top_bids': LeaderboardBidSerializer(leaderboard(land_listing.pk, limit), many=True).data,
+        })
+
+    @action(detail=True, methods=['GET'])
+    def comparables(self, request, pk=None):
+        try:
+            limit = int(request.query_params.get('limit', self.comparables_size))
+        except ValueError:
+            raise ValidationError({'limit': 'A valid integer is required.'})
+        limit = max(1, min(limit, self.max_comparables_size))
+
+        land_listing = self.get_object()
+        [statistics] = city_statistics([land_listing.city])
+        return Response({
+            'listing': {
+                'id': land_listing.pk,
+                'price_per_area': land_listing.price_per_area,
+                'percentile': statistics.asking.percentile(land_listing.price_per_area),
+            },
+            'city': statistics_data(statistics),
+            'comparables': LandComparableSerializer(nearest_comparables(land_listing, limit), many=True).data,
+        })
+
+    @action(detail=False, methods=['GET'])
+    def price_statistics(self, request):
+        city = request.query_params.get('city')
+        cities = dict(LandBidding.CITY_CHOICES)
+        if city is not None and city not in cities:
+            raise ValidationError({'city': f'Select a valid choice. {city} is not one of the available choices.'})
+        return Response([statistics_data(row) for row in city_statistics([city] if city else None)])
+
+    @action(detail=True, methods=['GET'], permission_classes=[permissions.IsAuthenticated])
+    def my_rank(self, request, pk=None):
+        land_listing = self.get_object()
+        standing, rank = bidder_rank(land_listing.pk, request.user.pk)
+        if standing is not None:
+            standing.rank = rank
+        return Response({
+            'statistics': BidStatisticsSerializer(land_listing).data,
+            'standing': BidderStandingSerializer(standing).data if standing else None,
+        })
+
+    @action(
+        detail=True, methods=['POST'],
+        permission_classes=[permissions.IsAuthenticated],
+        throttle_classes=[TokenBucketThrottle, BidThrottle],
+    )
     def place_bid(self, request, pk=None):
         land_listing = self.get_object()
-        serializer = BidSerializer(data=request.data)
+        data = request.data.copy()
+        data['land_listing'] = land_listing.pk
+        serializer = BidSerializer(data=data, context=self.get_serializer_context())
         
         if serializer.is_valid():
-            serializer.save(
-                land_listing=land_listing, 
-                bidder=request.user
-            )
+            serializer.save(bidder=request.user)
             return Response(serializer.data, status=201)
         
         return Response(serializer.errors, status=400)
 
-class BidViewSet(viewsets.ModelViewSet):
+class BidViewSet(StreamingExportMixin,
+                 mixins.CreateModelMixin,
+                 mixins.RetrieveModelMixin,
+                 mixins.DestroyModelMixin,
+                 mixins.ListModelMixin,
+                 viewsets.GenericViewSet):
+    # Bids are immutable: an amount can only enter through place_bid's
+    # conditional UPDATE, so there is no update or partial_update.
     serializer_class = BidSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Bid.objects.filter(bidder=self.request.user)
+        # Newest first, straight off bid_bidder_time_idx. BidSerializer only
+        # outputs the listing and bidder ids, so nothing is joined.
+        return Bid.objects.filter(bidder_id=self.request.user.pk).order_by('-bid_time')
+
+    def get_throttles(self):
+        # New bids draw on the same bucket as place_bid.
+        throttles = super().get_throttles()
+        if self.action == 'create':
+            throttles.append(BidThrottle())
+        return throttles
+
+    def perform_create(self, serializer):
+        serializer.save(bidder=self.request.user)
+
+    # Deletions bypass the bid engine, so resync the listing totals.
+    def perform_destroy(self, instance):
+        instance.delete()
+        recalculate_bid_summary(instance.land_listing_id)
     
 class RegisterView(APIView):
     permission_classes = [AllowAny]
+    throttle_cost = 10
 
     def post(self, request):
         serializer = UserSerializer(data=request.data)
@@ -84,7 +249,7 @@ class RegisterView(APIView):
             user = serializer.save()
 
             # Generate JWT token for auto-login after registration
-            refresh = RefreshToken.for_user(user)
+            refresh = tokens_for_user(user)
 
             return Response({
                 "user": UserSerializer(user).data,
@@ -97,18 +262,42 @@ class RegisterView(APIView):
 
 class LoginView(APIView):
     permission_classes = [AllowAny]
+    throttle_cost = 10
 
     def post(self, request):
         email = request.data.get('email')
         password = request.data.get('password')
 
-        user = authenticate(request, username=email, password=password)
+        user = authenticate_login(email, password)
 
         if user:
-            refresh = RefreshToken.for_user(user)
+            refresh = tokens_for_user(user)
             return Response({
                 'refresh': str(refresh),
                 'access': str(refresh.access_token),
                 'user': UserSerializer(user).data
             })
-        return Response({"error": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
\ No newline at end of file
+        return Response({"error": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
+
+
+class AnalyticsView(APIView):
+    """
+    Revenue, inventory and price-trend reports; `?reports=revenue,prices&days=30`.
+    They cover the whole store, so they are for staff only.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        try:
+            days = int(request.query_params.get('days', analytics.get_setting('DAYS')))
+        except ValueError:
+            raise ValidationError({'days': 'A valid integer is required.'})
+        days = max(1, min(days, analytics.get_setting('MAX_DAYS')))
+
+        names = [name for name in request.query_params.get('reports', '').split(',') if name]
+        unknown = sorted(set(names) - set(analytics.REPORTS))
+        if unknown:
+            raise ValidationError({'reports': f'Unknown reports: {", ".join(unknown)}.'})
+        names = list(dict.fromkeys(names)) or list(analytics.REPORTS)
+
+        return Response({'days': days, **analytics.get_reports(names, days)})
@@ -0,0 +1,155 @@
+"""
+Store-wide reports from agrishop.analytics (column arrays + pandas) against the
+same reports written as ORM loops over model instances, at a given number
+of bids. Both sides read the same rows and their totals are cross-checked.
+
+    python -m benchmarks.analytics --bids 1000000
+"""
+import argparse
+import random
+import statistics
+import time
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from benchmarks.common import benchmark_database, print_table, setup_django
+from benchmarks.seed import batched, seed
+
+DAYS = 90
+
+
+def seed_orders(orders, days, batch_size=5000):
+    from django.utils import timezone
+
+    from agrishop.models import CustomUser, Order, OrderItem, Product
+
+    rng = random.Random(2)
+    user_ids = list(CustomUser.objects.values_list("pk", flat=True))
+    products = list(Product.objects.values_list("pk", "title", "price"))
+    now = timezone.now()
+    for batch in batched(range(orders), batch_size):
+        created = Order.objects.bulk_create([
+            Order(user_id=rng.choice(user_ids), status="confirmed", total_amount=0) for _ in batch
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_id=pk, title=title, unit_price=price, quantity=rng.randint(1, 5))
+            for order in created
+            for pk, title, price in rng.sample(products, 3)
+        ])
+        # created_at is auto_now_add; spread the batch over the window.
+        Order.objects.filter(pk__in=[order.pk for order in created]).update(
+            created_at=now - timedelta(days=rng.uniform(0, days))
+        )
+
+
+def spread_bids(days, step=10_000):
+    from django.utils import timezone
+
+    from agrishop.models import Bid
+
+    now = timezone.now()
+    low, high = Bid.objects.order_by("pk").values_list("pk", flat=True)[0], Bid.objects.latest("pk").pk
+    for start in range(low, high + 1, step):
+        offset = (start - low) / max(1, high - low)
+        Bid.objects.filter(pk__gte=start, pk__lt=start + step).update(
+            bid_time=now - timedelta(days=days * (1 - offset))
+        )
+
+
+def orm_reports(days):
+    """The three reports as loops over model instances, streamed with iterator()."""
+    from django.utils import timezone
+
+    from agrishop.models import Bid, Cart, OrderItem, Product
+
+    since = timezone.now() - timedelta(days=days)
+    revenue = defaultdict(Decimal)
+    by_category = defaultdict(Decimal)
+    sold = defaultdict(int)
+    total = Decimal(0)
+    items = OrderItem.objects.filter(order__status="confirmed", order__created_at__gte=since)
+    for item in items.select_related("order", "product").iterator(chunk_size=5000):
+        amount = item.unit_price * item.quantity
+        total += amount
+        revenue[item.order.created_at.date()] += amount
+        by_category[item.product.category_id if item.product else None] += amount
+        sold[item.product_id] += item.quantity
+
+    in_carts = defaultdict(int)
+    for line in Cart.objects.iterator(chunk_size=5000):
+        in_carts[line.product_id] += line.quantity
+    stock = defaultdict(lambda: [0, Decimal(0), 0])
+    for product in Product.objects.iterator(chunk_size=5000):
+        row = stock[product.category_id]
+        row[0] += product.quantity
+        row[1] += product.quantity * product.price
+        row[2] += sold[product.pk]
+
+    weeks = defaultdict(list)
+    bids = Bid.objects.filter(bid_time__gte=since).select_related("land_listing")
+    for bid in bids.iterator(chunk_size=5000):
+        week = (bid.bid_time - since) // timedelta(days=7)
+        weeks[bid.land_listing.city, week].append(bid.bid_amount)
+    prices = {key: (len(amounts), statistics.median(amounts)) for key, amounts in weeks.items()}
+    return {"total": float(total), "bids": sum(count for count, _ in prices.values())}
+
+
+def vectorized_reports(days):
+    from agrishop import analytics
+
+    reports = analytics.build_reports(analytics.REPORTS, days)
+    bids = sum(week["bids"] for city in reports["prices"]["land_bids"] for week in city["weeks"])
+    return {"total": reports["revenue"]["total"], "bids": bids}
+
+
+def cached_reports(days):
+    from agrishop import analytics
+
+    analytics.get_reports(analytics.REPORTS, days)
+
+
+def timed(func, repeat):
+    samples, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), result
+
+
+def run(bids, products, orders, repeat):
+    from django.core.cache import caches
+
+    with benchmark_database():
+        seed(users=1_000, products=products, listings=2_000, bids=bids, log=lambda message: None)
+        seed_orders(orders, DAYS)
+        spread_bids(DAYS)
+
+        orm_seconds, orm = timed(lambda: orm_reports(DAYS), repeat)
+        vector_seconds, vector = timed(lambda: vectorized_reports(DAYS), repeat)
+        assert round(orm["total"], 2) == vector["total"] and orm["bids"] == vector["bids"], (orm, vector)
+
+        caches["default"].clear()
+        cached_reports(DAYS)
+        cached_seconds, _ = timed(lambda: cached_reports(DAYS), repeat)
+
+    rows = [
+        ["ORM loop", f"{orm_seconds:.2f}", "1.0x"],
+        ["column arrays + pandas", f"{vector_seconds:.2f}", f"{orm_seconds / vector_seconds:.1f}x"],
+        ["cached", f"{cached_seconds:.4f}", f"{orm_seconds / cached_seconds:.0f}x"],
+    ]
+    print(f"{bids:,} bids, {products:,} products, {orders * 3:,} order lines over {DAYS} days")
+    print_table(["implementation", "seconds", "speedup"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bids", type=int, default=1_000_000)
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--orders", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    run(args.bids, args.products, args.orders, args.repeat)
@@ -0,0 +1,157 @@
+"""
+Concurrent in-flight requests per process: async views on the ASGI path
+against the DRF views on the WSGI path with a fixed thread pool, the way
+a threaded WSGI worker (e.g. gunicorn --threads) serves them.
+
+    python -m benchmarks.asgi --requests 2000 --concurrency 200 --threads 8
+
+Both sides run in-process (AsyncClient / Client), so the numbers show
+handler capacity, not network behaviour.
+"""
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from benchmarks.common import benchmark_database, percentile, print_table, setup_django
+
+WORKLOADS = {
+    "listing detail": ("get", "/api/land-listings/{id}/", "/api/async/land-listings/{id}/"),
+    "place bid": ("post", "/api/land-listings/{id}/place_bid/", "/api/async/land-listings/{id}/place_bid/"),
+    "cart list": ("get", "/api/cart/", "/api/async/cart/"),
+}
+
+
+def seed(listings):
+    from agrishop.models import Cart, CustomUser, LandBidding, Product
+
+    seller = CustomUser.objects.create(username="seller@example.com", email="seller@example.com",
+                                       full_name="Seller", role="seller", business_name="Acres", password="!")
+    buyer = CustomUser.objects.create(username="buyer@example.com", email="buyer@example.com",
+                                      full_name="Buyer", password="!")
+    LandBidding.objects.bulk_create([
+        LandBidding(creator=seller, title=f"Plot {i}", description="Bench", area_size=Decimal("5.00"),
+                    starting_bid_amount=Decimal("1000.00"))
+        for i in range(listings)
+    ])
+    products = Product.objects.bulk_create([
+        Product(title=f"Urea {i}", description="Bench", quantity=100, price=Decimal("10.00")) for i in range(5)
+    ])
+    Cart.objects.bulk_create([Cart(user=buyer, product=product, quantity=1) for product in products])
+    return buyer, list(LandBidding.objects.values_list("pk", flat=True))
+
+
+class Bids:
+    """Strictly increasing amounts, so every bid is accepted."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.amount = 1000
+
+    def next(self):
+        with self.lock:
+            self.amount += 1
+            return f"{self.amount}.00"
+
+
+def peak_in_flight(intervals):
+    events = sorted([(start, 1) for start, _ in intervals] + [(end, -1) for _, end in intervals])
+    current = peak = 0
+    for _, delta in events:
+        current += delta
+        peak = max(peak, current)
+    return peak
+
+
+def summarize(intervals, statuses, seconds):
+    latencies = sorted((end - start) * 1000 for start, end in intervals)
+    failed = sum(1 for status in statuses if status >= 400)
+    return [f"{len(latencies) / seconds:.0f}", f"{percentile(latencies, 50):.1f}",
+            f"{percentile(latencies, 95):.1f}", peak_in_flight(intervals), failed]
+
+
+def run_wsgi(method, path, requests, threads, listing_ids, token, bids):
+    from django.db import connection
+    from django.test import Client
+
+    local = threading.local()
+    intervals, statuses = [], []
+
+    def one(i):
+        if not hasattr(local, "client"):
+            local.client = Client(headers={"Authorization": f"Bearer {token}"})
+        url = path.format(id=listing_ids[i % len(listing_ids)])
+        data = {"bid_amount": bids.next()} if method == "post" else None
+        start = time.perf_counter()
+        response = getattr(local.client, method)(url, data, content_type="application/json")
+        intervals.append((start, time.perf_counter()))
+        statuses.append(response.status_code)
+
+    def close():
+        connection.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(requests)))
+        list(pool.map(lambda _: close(), range(threads)))
+    return summarize(intervals, statuses, time.perf_counter() - started)
+
+
+def run_asgi(method, path, requests, concurrency, listing_ids, token, bids):
+    from django.test import AsyncClient
+
+    headers = {"Authorization": f"Bearer {token}"}
+    intervals, statuses = [], []
+
+    async def main():
+        client = AsyncClient()
+        slots = asyncio.Semaphore(concurrency)
+
+        async def one(i):
+            async with slots:
+                url = path.format(id=listing_ids[i % len(listing_ids)])
+                data = {"bid_amount": bids.next()} if method == "post" else None
+                start = time.perf_counter()
+                response = await getattr(client, method)(url, data, content_type="application/json",
+                                                         headers=headers)
+                intervals.append((start, time.perf_counter()))
+                statuses.append(response.status_code)
+
+        await asyncio.gather(*(one(i) for i in range(requests)))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    return summarize(intervals, statuses, time.perf_counter() - started)
+
+
+def run(listings, requests, concurrency, threads):
+    from django.test.utils import setup_test_environment
+
+    from agrishop.authentication import tokens_for_user
+
+    setup_test_environment()
+    rows = []
+    with benchmark_database():
+        buyer, listing_ids = seed(listings)
+        token = str(tokens_for_user(buyer).access_token)
+        bids = Bids()
+        for name, (method, wsgi_path, asgi_path) in WORKLOADS.items():
+            rows.append([name, f"wsgi ({threads} threads)",
+                         *run_wsgi(method, wsgi_path, requests, threads, listing_ids, token, bids)])
+            rows.append([name, f"asgi ({concurrency} in flight)",
+                         *run_asgi(method, asgi_path, requests, concurrency, listing_ids, token, bids)])
+    print_table(["workload", "server", "req/s", "p50 ms", "p95 ms", "peak in flight", "failed"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listings", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200, help="Requests the ASGI side keeps in flight.")
+    parser.add_argument("--threads", type=int, default=8, help="WSGI worker threads.")
+    args = parser.parse_args()
+
+    setup_django()
+    run(args.listings, args.requests, args.concurrency, args.threads)
@@ -0,0 +1,117 @@
+"""
+Authenticated request throughput: a JWT that loads the user row on every
+request against the stateless ClaimsUser now configured in settings.
+
+    python -m benchmarks.auth --requests 2000 --clients 8
+"""
+import argparse
+import re
+import threading
+import time
+
+from benchmarks.common import benchmark_database, percentile, print_table, setup_django
+
+PATHS = ["/api/cart/", "/api/orders/", "/api/bids/"]
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+def auth_modes():
+    from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+
+    from agrishop.models import CustomUser
+
+    class UserLookupJWTAuthentication(JWTAuthentication):
+        # simplejwt's default: fetch the user row for every request.
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.user_model = CustomUser
+
+    return {
+        "jwt + user lookup": UserLookupJWTAuthentication,
+        "jwt claims": JWTStatelessUserAuthentication,
+    }
+
+
+def seed(users, lines):
+    from agrishop.models import Cart, CustomUser, Product
+
+    Product.objects.bulk_create([
+        Product(title=f"Urea {i}", description="Bench", quantity=100, price=10 + i) for i in range(lines)
+    ])
+    product_ids = list(Product.objects.values_list("pk", flat=True))
+    users = CustomUser.objects.bulk_create([
+        CustomUser(username=f"farmer{i}@example.com", email=f"farmer{i}@example.com",
+                   full_name=f"Farmer {i}", password="!")
+        for i in range(users)
+    ])
+    Cart.objects.bulk_create([
+        Cart(user=user, product_id=product_id, quantity=1) for user in users for product_id in product_ids
+    ])
+    return users
+
+
+def drive(tokens, requests, clients):
+    from django.db import connection
+    from rest_framework.test import APIClient
+
+    lock = threading.Lock()
+    latencies, queries = [], []
+    counter = iter(range(requests))
+
+    def worker(index):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens[index % len(tokens)]}")
+        samples = []
+        try:
+            for i in counter:
+                start = time.perf_counter()
+                response = client.get(PATHS[i % len(PATHS)])
+                samples.append(((time.perf_counter() - start) * 1000,
+                                int(QUERIES_RE.search(response["Server-Timing"]).group(1))))
+                assert response.status_code == 200, response.status_code
+        finally:
+            connection.close()
+            with lock:
+                for elapsed, count in samples:
+                    latencies.append(elapsed)
+                    queries.append(count)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+    latencies.sort()
+    return len(latencies) / seconds, percentile(latencies, 50), percentile(latencies, 95), sum(queries) / len(queries)
+
+
+def run(users, requests, clients):
+    from django.test.utils import setup_test_environment
+
+    from agrishop.authentication import tokens_for_user
+    from agrishop.views import BidViewSet, CartViewSet, OrderViewSet
+
+    setup_test_environment()
+    with benchmark_database():
+        tokens = [str(tokens_for_user(user).access_token) for user in seed(users, lines=3)]
+        rows = []
+        for name, authentication in auth_modes().items():
+            for view in (CartViewSet, OrderViewSet, BidViewSet):
+                view.authentication_classes = [authentication]
+            drive(tokens, min(requests, 100), clients)  # warm up
+            rps, p50, p95, queries = drive(tokens, requests, clients)
+            rows.append([name, f"{rps:.0f}", f"{p50:.2f}", f"{p95:.2f}", f"{queries:.2f}"])
+        print_table(["authentication", "req/s", "p50 ms", "p95 ms", "queries/request"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=8)
+    args = parser.parse_args()
+
+    setup_django()
+    run(args.users, args.requests, args.clients)
@@ -0,0 +1,104 @@
+"""
+Parallel checkout throughput, and a check that stock is never oversold.
+
+Many buyers with overlapping carts check out at once against scarce stock.
+When the run ends, reserved units plus remaining stock must equal the
+starting stock for every product, and no product may go negative.
+
+    python -m benchmarks.checkout --buyers 400 --threads 16
+"""
+import argparse
+import random
+import threading
+import time
+
+from benchmarks.common import benchmark_database, print_table, setup_django
+
+
+def seed(products, buyers, lines, stock):
+    from agrishop.models import Cart, CustomUser, Product
+
+    random.seed(1)
+    Product.objects.bulk_create([
+        Product(title=f"Fertilizer {i}", description="Bench", quantity=stock, price=10 + i % 20)
+        for i in range(products)
+    ])
+    product_ids = list(Product.objects.values_list("pk", flat=True))
+    users = CustomUser.objects.bulk_create([
+        CustomUser(username=f"buyer{i}", email=f"buyer{i}@example.com", full_name=f"Buyer {i}", password="!")
+        for i in range(buyers)
+    ])
+    Cart.objects.bulk_create([
+        Cart(user=user, product_id=product_id, quantity=random.randint(1, 5))
+        for user in users
+        for product_id in random.sample(product_ids, lines)
+    ])
+    return users
+
+
+def run(products, buyers, lines, stock, threads):
+    from django.db import connection
+    from rest_framework.exceptions import ValidationError
+
+    from agrishop.checkout import checkout
+    from agrishop.models import OrderItem, Product
+
+    with benchmark_database():
+        users = seed(products, buyers, lines, stock)
+        queue = list(users)
+        lock = threading.Lock()
+        outcome = {"orders": 0, "rejected": 0, "errors": 0}
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        if not queue:
+                            return
+                        user = queue.pop()
+                    try:
+                        checkout(user)
+                        key = "orders"
+                    except ValidationError:
+                        key = "rejected"
+                    except Exception:
+                        key = "errors"
+                    with lock:
+                        outcome[key] += 1
+            finally:
+                connection.close()
+
+        start = time.perf_counter()
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        reserved = {}
+        for product_id, quantity in OrderItem.objects.values_list("product_id", "quantity"):
+            reserved[product_id] = reserved.get(product_id, 0) + quantity
+        remaining = dict(Product.objects.values_list("pk", "quantity"))
+        oversold = [pk for pk, left in remaining.items() if left < 0 or left + reserved.get(pk, 0) != stock]
+
+        print_table(
+            ["buyers", "threads", "orders", "rejected", "errors", "seconds", "checkouts/s", "oversold products"],
+            [[buyers, threads, outcome["orders"], outcome["rejected"], outcome["errors"],
+              f"{elapsed:.2f}", f"{buyers / elapsed:.0f}", len(oversold)]],
+        )
+        if oversold:
+            raise SystemExit(f"Stock accounting broken for products {oversold}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--buyers", type=int, default=400)
+    parser.add_argument("--lines", type=int, default=5, help="cart lines per buyer")
+    parser.add_argument("--stock", type=int, default=60, help="starting stock per product")
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    setup_django()
+    run(args.products, args.buyers, args.lines, args.stock, args.threads)
@@ -0,0 +1,114 @@
+"""
+Land comparables (city price-per-area quantiles, a listing's percentile
+and its nearest listings) computed per request over every listing in the
+city, against agrishop.comparables' bucket histograms and index seeks, and
+the cost of keeping the histograms up to date on a listing save.
+
+    python -m benchmarks.comparables --listings 200000
+"""
+import argparse
+import random
+from decimal import Decimal
+
+from benchmarks.common import benchmark_database, measure, print_table, setup_django
+from benchmarks.seed import CITIES, batched
+
+
+def seed(listings, closed_share, batch_size=5000):
+    from agrishop.models import Bid, CustomUser, LandBidding
+
+    rng = random.Random(1)
+    seller = CustomUser.objects.create(username="seller@example.com", email="seller@example.com",
+                                       full_name="Seller", role="seller", business_name="Acres", password="!")
+    for batch in batched(range(listings), batch_size):
+        LandBidding.objects.bulk_create([
+            LandBidding(
+                creator=seller,
+                title="Plot",
+                description="Bench",
+                city=rng.choice(CITIES),
+                area_size=Decimal(rng.randint(100, 5000)) / 100,
+                starting_bid_amount=Decimal(rng.randint(10, 500)) * 1000,
+                status="closed" if rng.random() < closed_share else "active",
+            )
+            for _ in batch
+        ])
+    closed = LandBidding.objects.filter(status="closed").values_list("pk", "starting_bid_amount")
+    for batch in batched(closed.iterator(), batch_size):
+        bids = Bid.objects.bulk_create([
+            Bid(land_listing_id=pk, bidder=seller, bid_amount=amount * Decimal(rng.uniform(1.0, 1.6)))
+            for pk, amount in batch
+        ])
+        LandBidding.objects.bulk_update(
+            [LandBidding(pk=bid.land_listing_id, winning_bid=bid, current_highest_bid=bid.bid_amount) for bid in bids],
+            ["winning_bid", "current_highest_bid"],
+        )
+    return LandBidding.objects.order_by("?").first()
+
+
+def per_request(listing, limit):
+    """Read the whole city and compute everything from it."""
+    import numpy as np
+
+    from agrishop.comparables import PERCENTS
+    from agrishop.models import LandBidding
+
+    rows = np.array(list(
+        LandBidding.objects.filter(city=listing.city, price_per_area__gt=0).values_list("pk", "area_size", "price_per_area")
+    ), dtype=float)
+    points = np.percentile(rows[:, 2], PERCENTS)
+    np.interp(listing.price_per_area, points, PERCENTS)
+    winning = LandBidding.objects.filter(city=listing.city, status="closed", winning_bid__isnull=False)
+    np.percentile(np.array([
+        float(amount / area) for amount, area in winning.values_list("winning_bid__bid_amount", "area_size")
+    ]), PERCENTS)
+    distance = np.abs(np.log(rows[:, 1] / float(listing.area_size))) + np.abs(np.log(rows[:, 2] / listing.price_per_area))
+    distance[rows[:, 0] == listing.pk] = np.inf
+    nearest = rows[np.argsort(distance)[:limit], 0].astype(int).tolist()
+    list(LandBidding.objects.filter(pk__in=nearest))
+
+
+def precomputed(listing, limit):
+    from agrishop.comparables import city_statistics, nearest_comparables, statistics_data
+
+    [statistics] = city_statistics([listing.city])
+    statistics_data(statistics)
+    statistics.asking.percentile(listing.price_per_area)
+    nearest_comparables(listing, limit)
+
+
+def reprice(listing):
+    """Save a new asking price, moving the listing between buckets."""
+    listing.starting_bid_amount += 1
+    listing.save(update_fields=["starting_bid_amount"])
+
+
+def run(listings, closed_share, limit, repeat):
+    from agrishop.comparables import rebuild_statistics
+
+    with benchmark_database():
+        listing = seed(listings, closed_share)
+        # bulk_create skips the signals that keep the buckets.
+        rebuild_statistics()
+        rows = []
+        for name, func in [("per request", per_request), ("bucket histograms + seeks", precomputed)]:
+            timing = measure(lambda: func(listing, limit), repeat=repeat)
+            rows.append([name, f"{timing['p50_ms']:.2f}", f"{timing['p95_ms']:.2f}"])
+        timing = measure(lambda: reprice(listing), repeat=repeat)
+        rows.append(["save a new asking price", f"{timing['p50_ms']:.2f}", f"{timing['p95_ms']:.2f}"])
+        timing = measure(rebuild_statistics, repeat=3, warmup=0)
+        rows.append(["rebuild every city's buckets", f"{timing['p50_ms']:.2f}", f"{timing['p95_ms']:.2f}"])
+    print(f"{listings:,} listings in {len(CITIES)} cities, {closed_share:.0%} closed, {limit} comparables")
+    print_table(["operation", "p50 ms", "p95 ms"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listings", type=int, default=200_000)
+    parser.add_argument("--closed-share", type=float, default=0.3)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    setup_django()
+    run(args.listings, args.closed_share, args.limit, args.repeat)
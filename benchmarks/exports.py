@@ -0,0 +1,95 @@
+"""
+Peak memory of a streamed `?format=csv|jsonl` product export against
+serializing the same rows into one JSON list, at growing table sizes.
+
+    python -m benchmarks.exports --sizes 10000 50000 100000
+
+The streamed peak should stay roughly flat as the table grows; the
+in-memory list grows with it.
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from benchmarks.common import benchmark_database, print_table, setup_django
+
+
+def seed(total, batch_size=5000):
+    from agrishop.models import Category, Product
+
+    category, _ = Category.objects.get_or_create(name="Seeds")
+    existing = Product.objects.count()
+    batch = []
+    for i in range(existing, total):
+        batch.append(Product(
+            title=f"Seed lot {i}",
+            description="Certified wheat seed, treated and bagged",
+            category=category,
+            quantity=random.randint(0, 500),
+            price=round(random.uniform(5, 100), 2),
+        ))
+        if len(batch) == batch_size:
+            Product.objects.bulk_create(batch)
+            batch = []
+    Product.objects.bulk_create(batch)
+
+
+def peak_memory(func):
+    """Return (peak MiB, seconds) for one call of `func`."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20, seconds
+
+
+def run(sizes):
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.test import APIRequestFactory
+
+    from agrishop.models import Product
+    from agrishop.serializers import ProductSerializer
+    from agrishop.views import ProductViewSet
+
+    factory = APIRequestFactory()
+    view = ProductViewSet.as_view({"get": "list"})
+
+    def stream(fmt):
+        def consume():
+            response = view(factory.get("/api/products/", {"format": fmt}))
+            for _ in response.streaming_content:
+                pass
+        return consume
+
+    def full_list():
+        request = factory.get("/api/products/")
+        data = ProductSerializer(Product.objects.all(), many=True, context={"request": request}).data
+        JSONRenderer().render(data)
+
+    with benchmark_database():
+        rows = []
+        for size in sorted(sizes):
+            print(f"Seeding up to {size} products...")
+            seed(size)
+            results = {
+                "csv": peak_memory(stream("csv")),
+                "jsonl": peak_memory(stream("jsonl")),
+                "json list": peak_memory(full_list),
+            }
+            for name, (mib, seconds) in results.items():
+                rows.append([size, name, f"{mib:.1f}", f"{seconds:.2f}", f"{size / seconds:,.0f}"])
+
+        print_table(["rows", "mode", "peak MiB", "seconds", "rows/s"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000, 100_000])
+    args = parser.parse_args()
+
+    random.seed(1)
+    setup_django()
+    run(args.sizes)
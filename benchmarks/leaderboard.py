@@ -0,0 +1,86 @@
+"""
+Listing statistics and leaderboard reads as one listing's bid count grows:
+aggregating over the bids on every request against the BidStatistics and
+BidderStanding rows maintained by agrishop.bidding.
+
+    python -m benchmarks.leaderboard --sizes 1000 10000 100000
+"""
+import argparse
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from benchmarks.common import benchmark_database, measure, print_table, setup_django
+
+
+def seed(size, bidders):
+    from django.utils import timezone
+
+    from agrishop.bidding import rebuild_bid_statistics
+    from agrishop.models import Bid, CustomUser, LandBidding
+
+    seller = CustomUser.objects.create(username="seller@example.com", email="seller@example.com",
+                                       full_name="Seller", role="seller", business_name="Acres", password="!")
+    users = CustomUser.objects.bulk_create([
+        CustomUser(username=f"bidder{i}@example.com", email=f"bidder{i}@example.com", full_name="Bidder", password="!")
+        for i in range(bidders)
+    ])
+    listing = LandBidding.objects.create(creator=seller, title="Plot", description="Bench",
+                                         area_size=Decimal("5.00"), starting_bid_amount=Decimal("100.00"))
+    rng = random.Random(1)
+    start = timezone.now() - timedelta(days=7)
+    Bid.objects.bulk_create([
+        Bid(land_listing=listing, bidder=rng.choice(users), bid_amount=Decimal(100 + i))
+        for i in range(size)
+    ], batch_size=5000)
+    # bid_time is auto_now_add, so spread it out afterwards.
+    for offset, pk in enumerate(Bid.objects.filter(land_listing=listing).values_list("pk", flat=True)):
+        if offset % 1000 == 0:
+            Bid.objects.filter(pk__gte=pk).update(bid_time=start + timedelta(minutes=offset))
+    LandBidding.objects.filter(pk=listing.pk).update(current_highest_bid=Decimal(100 + size - 1), bid_count=size)
+    rebuild_bid_statistics()
+    return listing, users[0]
+
+
+def aggregated(listing_id, bidder_id):
+    from django.db.models import Count, Max, Min
+
+    from agrishop.models import Bid
+
+    bids = Bid.objects.filter(land_listing_id=listing_id)
+    bids.aggregate(highest=Max("bid_amount"), count=Count("id"), bidders=Count("bidder_id", distinct=True),
+                   first=Min("bid_time"), last=Max("bid_time"))
+    list(bids.order_by("-bid_amount")[:10])
+    best = bids.filter(bidder_id=bidder_id).aggregate(best=Max("bid_amount"))["best"]
+    bids.filter(bid_amount__gt=best).values("bidder_id").distinct().count()
+
+
+def precomputed(listing_id, bidder_id):
+    from agrishop.bidding import bidder_rank, leaderboard
+    from agrishop.models import LandBidding
+
+    LandBidding.objects.select_related("bid_statistics").get(pk=listing_id)
+    list(leaderboard(listing_id, 10))
+    bidder_rank(listing_id, bidder_id)
+
+
+def run(sizes, bidders, repeat):
+    rows = []
+    for size in sizes:
+        with benchmark_database():
+            listing, bidder = seed(size, bidders)
+            for name, func in [("aggregate per request", aggregated), ("precomputed", precomputed)]:
+                timing = measure(lambda: func(listing.pk, bidder.pk), repeat=repeat)
+                rows.append([size, name, f"{timing['p50_ms']:.2f}", f"{timing['p95_ms']:.2f}"])
+    print_table(["bids", "reads", "p50 ms", "p95 ms"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--bidders", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    run(args.sizes, args.bidders, args.repeat)
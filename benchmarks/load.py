@@ -0,0 +1,316 @@
+"""
+Drive the main synchronous API routes (the list, detail and write
+endpoints of the agrishop.urls viewsets, register and login) with
+concurrent in-process clients. The async mirrors and the live feed are
+measured by benchmarks.asgi; analytics, comparables, exports and the
+leaderboard have benchmarks of their own.
+
+Seeds a throwaway database (see benchmarks.seed), then sends each scenario
+REQUESTS times from CLIENTS threads, each with its own APIClient going
+through the full middleware stack. Query counts come from the
+Server-Timing header added by agrishop.perf.PerfMiddleware.
+
+    python -m benchmarks.load --scale small --save baseline.json
+    python -m benchmarks.load --scale small --compare baseline.json
+
+--compare exits with status 1 when a scenario's p95 latency or
+throughput moves more than --tolerance against the baseline, when it
+runs more queries per request, or when it failed: a client thread
+raised, or no request was sent at all.
+"""
+import argparse
+import itertools
+import json
+import logging
+import platform
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+from benchmarks.common import benchmark_database, percentile, print_table, setup_django
+from benchmarks.seed import PASSWORD, SCALES, seed
+
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    # A path, or a callable taking the worker context and returning one.
+    path: object
+    data: object = None
+    auth: bool = True
+    expect: tuple = (200,)
+    # Fraction of --requests to send; password hashing scenarios are slow.
+    weight: float = 1.0
+    # Called with the worker context before each (untimed) request.
+    prepare: object = None
+
+
+@dataclass
+class Context:
+    ids: dict
+    rng: random.Random
+    user_id: int = None
+
+    def pick(self, kind):
+        return self.rng.choice(self.ids[kind])
+
+
+_registrations = itertools.count()
+_bid_amounts = itertools.count(10**8, 100)
+
+
+def add_cart_line(ctx):
+    from agrishop.models import Cart
+    # The user may still hold a line for the product, from cart-create.
+    Cart.objects.get_or_create(user_id=ctx.user_id, product_id=ctx.pick("products"), defaults={"quantity": 1})
+
+
+SCENARIOS = [
+    Scenario("user-list", "get", "/api/users/", auth=False),
+    Scenario("user-detail", "get", lambda ctx: f"/api/users/{ctx.pick('users')}/", auth=False),
+    Scenario("product-list", "get", "/api/products/", auth=False),
+    Scenario("product-list-search", "get", "/api/products/?search=urea", auth=False),
+    Scenario("product-list-category", "get",
+             lambda ctx: f"/api/products/?category={ctx.pick('categories')}&ordering=price", auth=False),
+    Scenario("product-detail", "get", lambda ctx: f"/api/products/{ctx.pick('products')}/", auth=False),
+    Scenario("category-list", "get", "/api/categories/", auth=False),
+    Scenario("cart-create", "post", "/api/cart/",
+             data=lambda ctx: {"product": ctx.pick("products"), "quantity": 1}, expect=(201, 400)),
+    Scenario("cart-list", "get", "/api/cart/"),
+    Scenario("order-checkout", "post", "/api/orders/checkout/", expect=(201, 400), prepare=add_cart_line),
+    Scenario("order-list", "get", "/api/orders/"),
+    Scenario("landbidding-list", "get", "/api/land-listings/", auth=False),
+    Scenario("landbidding-list-city", "get", "/api/land-listings/?city=lahore&status=active", auth=False),
+    Scenario("landbidding-detail", "get", lambda ctx: f"/api/land-listings/{ctx.pick('listings')}/", auth=False),
+    # Concurrent bids on one listing can lose the race and get a 400.
+    Scenario("landbidding-place-bid", "post", lambda ctx: f"/api/land-listings/{ctx.pick('listings')}/place_bid/",
+             data=lambda ctx: {"bid_amount": str(next(_bid_amounts))}, expect=(201, 400)),
+    Scenario("landbidding-leaderboard", "get",
+             lambda ctx: f"/api/land-listings/{ctx.pick('listings')}/leaderboard/", auth=False),
+    Scenario("landbidding-my-rank", "get", lambda ctx: f"/api/land-listings/{ctx.pick('listings')}/my_rank/"),
+    Scenario("bid-list", "get", "/api/bids/"),
+    Scenario("register", "post", "/api/register/", auth=False, expect=(201,), weight=0.1,
+             data=lambda ctx: {
+                 "email": f"new{next(_registrations)}@example.com",
+                 "full_name": "New Farmer",
+                 "password": PASSWORD,
+             }),
+    Scenario("login", "post", "/api/login/", auth=False, weight=0.1,
+             data=lambda ctx: {"email": f"user{ctx.rng.randrange(10)}@example.com", "password": PASSWORD}),
+]
+
+
+def resolve(value, ctx):
+    return value(ctx) if callable(value) else value
+
+
+def run_scenario(scenario, ids, requests, clients, seed_value):
+    from django.db import connection
+    from rest_framework.test import APIClient
+
+    from agrishop.models import CustomUser
+
+    total = max(1, int(requests * scenario.weight))
+    remaining = itertools.count()
+    lock = threading.Lock()
+    latencies, queries, statuses, errors = [], [], Counter(), []
+
+    def worker(index):
+        ctx = Context(ids=ids, rng=random.Random(seed_value + index))
+        # Server errors come back as 500 responses instead of raising here.
+        client = APIClient(raise_request_exception=False)
+        if scenario.auth:
+            user = CustomUser.objects.get(pk=ids["users"][index % len(ids["users"])])
+            ctx.user_id = user.pk
+            client.force_authenticate(user)
+        samples = []
+        try:
+            while next(remaining) < total:
+                if scenario.prepare:
+                    scenario.prepare(ctx)
+                path = resolve(scenario.path, ctx)
+                data = resolve(scenario.data, ctx)
+                start = time.perf_counter()
+                response = getattr(client, scenario.method)(path, data, format="json" if data else None)
+                elapsed = (time.perf_counter() - start) * 1000
+                match = QUERIES_RE.search(response.get("Server-Timing", ""))
+                samples.append((elapsed, int(match.group(1)) if match else None, response.status_code))
+        except Exception as exc:
+            # A client that dies stops sending; the scenario is reported as failed.
+            with lock:
+                errors.append(f"{type(exc).__name__}: {exc}")
+        finally:
+            connection.close()
+            with lock:
+                for elapsed, count, status in samples:
+                    latencies.append(elapsed)
+                    if count is not None:
+                        queries.append(count)
+                    statuses[status] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+
+    latencies.sort()
+    for error in sorted(set(errors)):
+        print(f"  {errors.count(error)} client(s) failed: {error}")
+    return {
+        "requests": len(latencies),
+        "unexpected": sum(count for status, count in statuses.items() if status not in scenario.expect),
+        "errors": len(errors),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": len(latencies) / seconds if seconds else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "queries": statistics.fmean(queries) if queries else None,
+    }
+
+
+def collect_ids():
+    from agrishop.models import Category, CustomUser, LandBidding, Product
+
+    return {
+        "users": list(CustomUser.objects.order_by("pk").values_list("pk", flat=True)),
+        "products": list(Product.objects.values_list("pk", flat=True)),
+        "categories": list(Category.objects.values_list("pk", flat=True)),
+        "listings": list(LandBidding.objects.values_list("pk", flat=True)),
+    }
+
+
+def run(counts, requests, clients, only, seed_value):
+    import django
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    # Expected 4xx responses would otherwise log a warning each.
+    logging.getLogger("django.request").setLevel(logging.ERROR)
+    scenarios = [scenario for scenario in SCENARIOS if not only or scenario.name in only]
+    with benchmark_database():
+        seed(**counts)
+        ids = collect_ids()
+        results = {}
+        for scenario in scenarios:
+            print(f"Running {scenario.name}...")
+            results[scenario.name] = run_scenario(scenario, ids, requests, clients, seed_value)
+
+    return {
+        "meta": {
+            "counts": counts,
+            "requests": requests,
+            "clients": clients,
+            "seed": seed_value,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "scenarios": results,
+    }
+
+
+def failed(result):
+    return bool(result.get("errors")) or not result["requests"]
+
+
+def report(results):
+    rows = []
+    for name, result in results["scenarios"].items():
+        rows.append([
+            name,
+            result["requests"],
+            result["unexpected"],
+            result.get("errors", 0),
+            f"{result['throughput_rps']:.0f}",
+            f"{result['p50_ms']:.1f}",
+            f"{result['p95_ms']:.1f}",
+            f"{result['p99_ms']:.1f}",
+            "-" if result["queries"] is None else f"{result['queries']:.1f}",
+        ])
+    print_table(["scenario", "requests", "unexpected", "errors", "req/s", "p50 ms", "p95 ms", "p99 ms", "queries"], rows)
+
+
+def compare(results, baseline, tolerance):
+    """Print deltas against a baseline and return the regressed scenarios."""
+    if baseline["meta"]["counts"] != results["meta"]["counts"]:
+        print("warning: baseline was seeded at a different scale")
+
+    rows, regressions = [], []
+    for name, result in results["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if failed(result):
+            regressions.append(name)
+            rows.append([name, "", "", "", "FAILED"])
+            continue
+        if before is None:
+            rows.append([name, "new", "", "", ""])
+            continue
+        if failed(before):
+            # Nothing to measure against; the baseline needs regenerating.
+            rows.append([name, "", "", "", "baseline failed"])
+            continue
+        p95 = result["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        rps = result["throughput_rps"] / before["throughput_rps"] - 1 if before["throughput_rps"] else 0.0
+        more_queries = (result["queries"] or 0) > (before["queries"] or 0) + 0.5
+        regressed = p95 > tolerance or rps < -tolerance or more_queries
+        if regressed:
+            regressions.append(name)
+        rows.append([
+            name,
+            f"{p95:+.0%}",
+            f"{rps:+.0%}",
+            f"{before['queries'] or 0:.1f} -> {result['queries'] or 0:.1f}",
+            "REGRESSION" if regressed else "",
+        ])
+    print_table(["scenario", "p95", "req/s", "queries", ""], rows)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    for name in ["users", "products", "listings", "bids"]:
+        parser.add_argument(f"--{name}", type=int, help=f"Override the scale's {name} count.")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario.")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent client threads.")
+    parser.add_argument("--scenario", action="append", help="Only run these scenarios.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    counts = dict(SCALES[args.scale])
+    for name in counts:
+        if getattr(args, name) is not None:
+            counts[name] = getattr(args, name)
+
+    setup_django()
+    results = run(counts, args.requests, args.clients, args.scenario, args.seed)
+    report(results)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+        print(f"Saved results to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        print()
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"Regressed: {', '.join(regressions)}")
+            sys.exit(1)
@@ -0,0 +1,91 @@
+"""
+Login throughput through /api/login/ for each password hashing setup,
+with verification inline and in the agrishop.passwords process pool.
+
+    python -m benchmarks.passwords --logins 200 --clients 8
+"""
+import argparse
+import threading
+import time
+
+from benchmarks.common import benchmark_database, percentile, print_table, setup_django
+
+PASSWORD = "correct horse battery"
+
+SETUPS = {
+    "pbkdf2 870k (Django default)": (["django.contrib.auth.hashers.PBKDF2PasswordHasher"], {}),
+    "pbkdf2 600k": (["agrishop.passwords.PBKDF2PasswordHasher"], {"PBKDF2_ITERATIONS": 600_000}),
+    "scrypt n=2^14": (["agrishop.passwords.ScryptPasswordHasher"], {"SCRYPT_WORK_FACTOR": 2 ** 14}),
+}
+
+
+def drive(emails, logins, clients):
+    from django.db import connection
+    from rest_framework.test import APIClient
+
+    lock = threading.Lock()
+    latencies, failures = [], []
+    counter = iter(range(logins))
+
+    def worker():
+        client = APIClient()
+        try:
+            for i in counter:
+                start = time.perf_counter()
+                response = client.post("/api/login/", {"email": emails[i % len(emails)], "password": PASSWORD},
+                                       format="json")
+                with lock:
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    if response.status_code != 200:
+                        failures.append(response.status_code)
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+    latencies.sort()
+    return len(latencies) / seconds, percentile(latencies, 50), percentile(latencies, 95), len(failures)
+
+
+def run(users, logins, clients, workers):
+    from django.contrib.auth.hashers import make_password
+    from django.test import override_settings
+    from django.test.utils import setup_test_environment
+
+    from agrishop.models import CustomUser
+    from agrishop.passwords import shutdown_pool
+
+    setup_test_environment()
+    rows = []
+    with benchmark_database():
+        emails = [f"farmer{i}@example.com" for i in range(users)]
+        CustomUser.objects.bulk_create([
+            CustomUser(username=email, email=email, full_name="Farmer", password="!") for email in emails
+        ])
+        for name, (hashers, cost) in SETUPS.items():
+            for pool_size in [0, workers]:
+                options = {**cost, "WORKERS": pool_size, "MAX_ATTEMPTS": logins + 1}
+                with override_settings(PASSWORD_HASHERS=hashers, AGRISHOP_PASSWORDS=options):
+                    # Hash up front so no login pays for a rehash.
+                    CustomUser.objects.update(password=make_password(PASSWORD))
+                    rps, p50, p95, failed = drive(emails, logins, clients)
+                    shutdown_pool()
+                rows.append([name, pool_size or "inline", f"{rps:.1f}", f"{p50:.0f}", f"{p95:.0f}", failed])
+    print_table(["hasher", "workers", "logins/s", "p50 ms", "p95 ms", "failed"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    setup_django()
+    run(args.users, args.logins, args.clients, args.workers)
@@ -0,0 +1,103 @@
+"""
+Payload size and serialization time per 1,000 products for the full
+product representation, the compact list one, and a `?fields=` sparse
+fieldset, each through ProductViewSet's own queryset narrowing.
+
+    python -m benchmarks.payloads --products 1000
+
+Sizes are the rendered JSON, then gzip and brotli (when the `brotli`
+package is installed) as CompressionMiddleware would send them.
+"""
+import argparse
+import gzip
+import random
+
+from benchmarks.common import benchmark_database, measure, print_table, setup_django
+
+REPRESENTATIONS = {
+    "full (ProductSerializer)": "/api/products/?fields=" + ",".join([
+        "id", "sku", "title", "description", "category", "quantity", "price", "image",
+        "image_hash", "image_derivatives", "created_at", "updated_at",
+    ]),
+    "compact list": "/api/products/",
+    "sparse ?fields=id,title,price": "/api/products/?fields=id,title,price",
+}
+
+WORDS = ("nitrogen granular certified treated bagged yield soil crop wheat maize rice cotton "
+         "organic hybrid irrigation drought resistant germination moisture season").split()
+
+
+def seed(total):
+    from agrishop.models import Category, Product
+
+    rng = random.Random(7)
+    categories = [Category.objects.create(name=name) for name in ("Fertilizers", "Seeds", "Tools")]
+    Product.objects.bulk_create([
+        Product(
+            title=f"Product {i}",
+            description=" ".join(rng.choices(WORDS, k=60)).capitalize() + ".",
+            category=rng.choice(categories),
+            quantity=rng.randint(0, 500),
+            price=round(rng.uniform(5, 500), 2),
+            image_derivatives={
+                size: {"width": w, "height": h, "jpeg": f"product_images/derivatives/{i}/{size}.jpg",
+                       "webp": f"product_images/derivatives/{i}/{size}.webp"}
+                for size, (w, h) in {"thumb": (200, 150), "card": (400, 300), "full": (800, 600)}.items()
+            },
+        )
+        for i in range(total)
+    ], batch_size=2000)
+
+
+def build_view(path):
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from agrishop.views import ProductViewSet
+
+    view = ProductViewSet(action="list", format_kwarg=None)
+    view.request = Request(APIRequestFactory().get(path, SERVER_NAME="localhost"))
+    return view
+
+
+def run(products, repeat):
+    from agrishop.compression import brotli
+    from rest_framework.renderers import JSONRenderer
+
+    renderer = JSONRenderer()
+    with benchmark_database():
+        seed(products)
+        rows = []
+        for name, path in REPRESENTATIONS.items():
+            view = build_view(path)
+
+            def fetch():
+                return list(view.get_queryset().order_by("-created_at", "-id")[:products])
+
+            instances = fetch()
+
+            def serialize():
+                return renderer.render(view.get_serializer(instances, many=True).data)
+
+            body = serialize()
+            fetch_ms = measure(fetch, repeat=repeat)["p50_ms"]
+            serialize_ms = measure(serialize, repeat=repeat)["p50_ms"]
+            rows.append([
+                name,
+                f"{fetch_ms:.1f}",
+                f"{serialize_ms:.1f}",
+                f"{len(body) / 1024:.0f}",
+                f"{len(gzip.compress(body)) / 1024:.0f}",
+                f"{len(brotli.compress(body, quality=5)) / 1024:.0f}" if brotli else "n/a",
+            ])
+    print_table(["representation", "fetch ms", "serialize ms", "KiB", "gzip KiB", "br KiB"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    run(args.products, args.repeat)
@@ -0,0 +1,84 @@
+"""
+Compare FullTextSearchFilter (FTS5 + BM25) with DRF's icontains SearchFilter.
+
+    python -m benchmarks.search --products 100000
+"""
+import argparse
+import random
+
+from benchmarks.common import benchmark_database, measure, print_table, setup_django
+
+QUERIES = ["ure", "nitrogen", "potash growth", "seaweed extract", "zzyzx"]
+
+
+def seed(count, batch_size=5000):
+    from faker import Faker
+    from agrishop.models import Category, Product
+
+    fake = Faker()
+    Faker.seed(1)
+    random.seed(1)
+    category = Category.objects.create(name="Fertilizers")
+    names = ["Urea", "DAP", "NPK 15-15-15", "Potash", "Seaweed Extract", "Bone Meal", "Neem Cake"]
+    batch = []
+    for i in range(count):
+        batch.append(Product(
+            title=f"{random.choice(names)} {fake.word()}",
+            description=fake.sentence(nb_words=12) + (" nitrogen" if i % 7 == 0 else ""),
+            category=category,
+            quantity=random.randint(0, 500),
+            price=round(random.uniform(5, 100), 2),
+        ))
+        if len(batch) == batch_size:
+            Product.objects.bulk_create(batch)
+            batch = []
+    Product.objects.bulk_create(batch)
+
+
+def run(products, repeat):
+    from rest_framework import filters
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from agrishop.models import Product
+    from agrishop.search import FullTextSearchFilter
+    from agrishop.views import ProductViewSet
+
+    with benchmark_database():
+        print(f"Seeding {products} products...")
+        seed(products)
+
+        factory = APIRequestFactory()
+        view = ProductViewSet()
+        rows = []
+        for query in QUERIES:
+            request = Request(factory.get("/api/products/", {"search": query}))
+            timings = {}
+            for name, backend in [("icontains", filters.SearchFilter()), ("fts5", FullTextSearchFilter())]:
+                def first_page():
+                    queryset = backend.filter_queryset(request, Product.objects.all(), view)
+                    return list(queryset[:20])
+                timings[name] = measure(first_page, repeat=repeat)
+            rows.append([
+                query,
+                f"{timings['icontains']['p50_ms']:.2f}",
+                f"{timings['fts5']['p50_ms']:.2f}",
+                f"{timings['icontains']['p95_ms']:.2f}",
+                f"{timings['fts5']['p95_ms']:.2f}",
+                f"{timings['icontains']['p50_ms'] / max(timings['fts5']['p50_ms'], 1e-6):.1f}x",
+            ])
+
+        print_table(
+            ["query", "icontains p50", "fts5 p50", "icontains p95", "fts5 p95", "speedup"],
+            rows,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    run(args.products, args.repeat)
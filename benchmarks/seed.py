@@ -0,0 +1,118 @@
+"""
+Seed a benchmark database with users, products, land listings and bids.
+
+Everything is bulk inserted from fixed Faker and random seeds, so two runs
+at the same scale produce the same rows. Used by benchmarks.load:
+
+    python -m benchmarks.load --scale medium
+"""
+import random
+from decimal import Decimal
+
+SCALES = {
+    "small": {"users": 200, "products": 10_000, "listings": 500, "bids": 50_000},
+    "medium": {"users": 1_000, "products": 100_000, "listings": 2_000, "bids": 500_000},
+    "large": {"users": 5_000, "products": 200_000, "listings": 5_000, "bids": 2_000_000},
+}
+
+CATEGORIES = ["Fertilizers", "Seeds", "Pesticides", "Tools", "Irrigation", "Animal Feed"]
+PRODUCT_NAMES = ["Urea", "DAP", "NPK 15-15-15", "Potash", "Wheat Seed", "Maize Seed",
+                 "Drip Kit", "Sprayer", "Neem Oil", "Cattle Feed"]
+CITIES = ["lahore", "karachi", "islamabad", "rawalpindi", "other"]
+
+# Password shared by every seeded user, hashed once.
+PASSWORD = "bench-pass-123"
+
+
+def batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed(users, products, listings, bids, batch_size=5000, log=print):
+    from django.contrib.auth.hashers import make_password
+    from django.db.models import Count, Max, OuterRef, Subquery
+    from faker import Faker
+
+    from agrishop.bidding import rebuild_bid_statistics
+    from agrishop.models import Bid, Category, CustomUser, LandBidding, Product
+
+    fake = Faker()
+    Faker.seed(1)
+    rng = random.Random(1)
+
+    log(f"Seeding {users} users...")
+    password = make_password(PASSWORD)
+    CustomUser.objects.bulk_create([
+        CustomUser(
+            username=f"user{i}@example.com",
+            email=f"user{i}@example.com",
+            full_name=fake.name(),
+            role="seller" if i % 10 == 0 else "customer",
+            business_name=fake.company() if i % 10 == 0 else None,
+            password=password,
+        )
+        for i in range(users)
+    ], batch_size=batch_size)
+    user_ids = list(CustomUser.objects.order_by("pk").values_list("pk", flat=True))
+    seller_ids = user_ids[::10]
+
+    log(f"Seeding {products} products...")
+    Category.objects.bulk_create([Category(name=name) for name in CATEGORIES])
+    category_ids = list(Category.objects.values_list("pk", flat=True))
+    for batch in batched(range(products), batch_size):
+        Product.objects.bulk_create([
+            Product(
+                sku=f"BENCH-{i:07d}",
+                title=f"{rng.choice(PRODUCT_NAMES)} {fake.word()}",
+                description=fake.sentence(nb_words=12),
+                category_id=rng.choice(category_ids),
+                quantity=rng.randint(0, 1000),
+                price=Decimal(rng.randint(500, 20000)) / 100,
+            )
+            for i in batch
+        ])
+
+    log(f"Seeding {listings} land listings...")
+    for batch in batched(range(listings), batch_size):
+        LandBidding.objects.bulk_create([
+            LandBidding(
+                creator_id=rng.choice(seller_ids),
+                title=f"{rng.randint(1, 50)} acres near {fake.city()}",
+                description=fake.paragraph(nb_sentences=3),
+                city=rng.choice(CITIES),
+                area_size=Decimal(rng.randint(100, 5000)) / 100,
+                starting_bid_amount=Decimal(rng.randint(10, 500)) * 1000,
+            )
+            for _ in batch
+        ])
+    listing_starts = dict(LandBidding.objects.values_list("pk", "starting_bid_amount"))
+    listing_ids = list(listing_starts)
+
+    log(f"Seeding {bids} bids...")
+    # Each listing's bids climb from its starting amount.
+    highest = dict(listing_starts)
+    for batch in batched(range(bids), batch_size):
+        rows = []
+        for _ in batch:
+            listing_id = rng.choice(listing_ids)
+            highest[listing_id] += rng.randint(1, 50) * 100
+            rows.append(Bid(
+                land_listing_id=listing_id,
+                bidder_id=rng.choice(user_ids),
+                bid_amount=highest[listing_id],
+            ))
+        Bid.objects.bulk_create(rows)
+
+    summary = Bid.objects.filter(land_listing=OuterRef("pk")).order_by().values("land_listing")
+    LandBidding.objects.filter(bids__isnull=False).distinct().update(
+        current_highest_bid=Subquery(summary.annotate(highest=Max("bid_amount")).values("highest")),
+        bid_count=Subquery(summary.annotate(count=Count("id")).values("count")),
+    )
+    rebuild_bid_statistics(batch_size)
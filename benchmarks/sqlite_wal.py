@@ -0,0 +1,129 @@
+"""
+Concurrent readers and writers on SQLite: the rollback journal with
+synchronous=FULL (SQLite's defaults, and this project's before WAL) against
+the WAL setup now in settings.
+
+Readers list products; writers place bids across a few listings.
+
+    python -m benchmarks.sqlite_wal --readers 8 --writers 4 --seconds 5
+"""
+import argparse
+import itertools
+import threading
+import time
+from decimal import Decimal
+
+from benchmarks.common import benchmark_database, percentile, print_table, setup_django
+
+MODES = {
+    "rollback journal, synchronous=FULL": "PRAGMA journal_mode=DELETE;PRAGMA synchronous=FULL",
+    "wal, synchronous=NORMAL, mmap": None,  # whatever settings configure
+}
+
+
+def seed(products, listings):
+    from agrishop.models import CustomUser, LandBidding, Product
+
+    seller = CustomUser.objects.create(username="seller@example.com", email="seller@example.com",
+                                       full_name="Seller", role="seller", business_name="Acres", password="!")
+    bidders = CustomUser.objects.bulk_create([
+        CustomUser(username=f"bidder{i}@example.com", email=f"bidder{i}@example.com", full_name="Bidder", password="!")
+        for i in range(16)
+    ])
+    Product.objects.bulk_create([
+        Product(title=f"Urea {i}", description="Nitrogen fertilizer", quantity=100, price=Decimal("10.00") + i)
+        for i in range(products)
+    ])
+    LandBidding.objects.bulk_create([
+        LandBidding(creator=seller, title=f"Plot {i}", description="Bench", area_size=Decimal("5.00"),
+                    starting_bid_amount=Decimal("1.00"))
+        for i in range(listings)
+    ])
+    return bidders, list(LandBidding.objects.values_list("pk", flat=True))
+
+
+def drive(readers, writers, seconds, bidders, listing_ids):
+    from django.db import connection
+    from rest_framework.exceptions import ValidationError
+
+    from agrishop.bidding import place_bid
+    from agrishop.models import Product
+
+    lock = threading.Lock()
+    amounts = itertools.count(2)
+    deadline = time.perf_counter() + seconds
+    samples = {"read": [], "write": []}
+    errors = []
+
+    def read():
+        list(Product.objects.order_by("-created_at", "-id")[:20])
+
+    def write(index):
+        with lock:
+            amount = next(amounts)
+        try:
+            place_bid(listing_ids[amount % len(listing_ids)], bidders[index % len(bidders)], Decimal(amount))
+        except ValidationError:
+            pass  # outbid by a concurrent writer
+
+    def worker(kind, index):
+        latencies = []
+        try:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                read() if kind == "read" else write(index)
+                latencies.append((time.perf_counter() - start) * 1000)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connection.close()
+            with lock:
+                samples[kind].extend(latencies)
+
+    threads = [threading.Thread(target=worker, args=("read", i)) for i in range(readers)]
+    threads += [threading.Thread(target=worker, args=("write", i)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for latencies in samples.values():
+        latencies.sort()
+    return samples, errors
+
+
+def run(readers, writers, seconds, products, listings):
+    from django.db import connection
+
+    with benchmark_database():
+        bidders, listing_ids = seed(products, listings)
+        options = connection.settings_dict["OPTIONS"]
+        configured = options.get("init_command", "")
+        rows = []
+        for name, init_command in MODES.items():
+            # New connections pick the mode up; journal_mode sticks to the file.
+            connection.close()
+            options["init_command"] = configured if init_command is None else init_command
+            connection.ensure_connection()
+            samples, errors = drive(readers, writers, seconds, bidders, listing_ids)
+            reads, writes = samples["read"], samples["write"]
+            rows.append([
+                name,
+                f"{len(reads) / seconds:.0f}", f"{percentile(reads, 95):.1f}",
+                f"{len(writes) / seconds:.0f}", f"{percentile(writes, 95):.1f}",
+                len(errors),
+            ])
+        options["init_command"] = configured
+    print_table(["journal", "reads/s", "read p95 ms", "writes/s", "write p95 ms", "errors"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--listings", type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    run(args.readers, args.writers, args.seconds, args.products, args.listings)
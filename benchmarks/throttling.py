@@ -0,0 +1,75 @@
+"""
+Per-request overhead of the token-bucket throttle (agrishop/throttling.py):
+a cached product retrieve, the cheapest request the API serves, with
+throttling off and with the buckets in LocMemCache and in a FileBasedCache.
+Requests rotate over --clients IP addresses so each hits its own bucket,
+and buckets are large enough that none is ever refused.
+
+    python -m benchmarks.throttling --requests 2000 --clients 1000
+"""
+import argparse
+import itertools
+import tempfile
+
+from benchmarks.common import benchmark_database, measure, print_table, setup_django
+
+BUCKETS = {scope: {"CAPACITY": 10 ** 9, "RATE": 1} for scope in ("anon", "user", "bid")}
+
+
+def cache_modes(directory):
+    return {
+        "off": None,
+        "locmem": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "bench-throttle"},
+        "file": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": directory},
+    }
+
+
+def run(requests, clients):
+    from django.conf import settings
+    from django.test import override_settings
+    from django.test.utils import setup_test_environment
+    from rest_framework.test import APIClient
+
+    from agrishop.models import Product
+    from agrishop.throttling import take
+
+    setup_test_environment()
+    with benchmark_database(), tempfile.TemporaryDirectory() as directory:
+        product = Product.objects.create(title="Urea", description="Bench", quantity=100, price=10)
+        path = f"/api/products/{product.pk}/"
+        client = APIClient()
+        rows, baseline = [], None
+        for name, cache in cache_modes(directory).items():
+            options = {"ENABLED": cache is not None, "CACHE_ALIAS": "bench-throttle", "BUCKETS": BUCKETS}
+            caches = {**settings.CACHES, "bench-throttle": cache or settings.CACHES["default"]}
+            with override_settings(CACHES=caches, AGRISHOP_THROTTLE=options):
+                addresses = itertools.cycle([f"10.0.{i // 256}.{i % 256}" for i in range(clients)])
+
+                def request():
+                    response = client.get(path, REMOTE_ADDR=next(addresses))
+                    assert response.status_code == 200, response.status_code
+
+                timings = measure(request, repeat=requests, warmup=clients)
+                keys = itertools.cycle([f"bench:{i}" for i in range(clients)])
+                bucket = measure(lambda: take(next(keys), 1, 10 ** 9, 1), repeat=requests, warmup=clients)
+            if baseline is None:
+                baseline = timings["mean_ms"]
+            rows.append([
+                name,
+                f"{timings['p50_ms']:.3f}",
+                f"{timings['p95_ms']:.3f}",
+                f"{timings['mean_ms'] - baseline:+.3f}",
+                "-" if cache is None else f"{bucket['mean_ms'] * 1000:.1f}",
+            ])
+    print(f"{requests:,} requests over {clients:,} client addresses")
+    print_table(["buckets", "p50 ms", "p95 ms", "overhead ms", "take() us"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=1000)
+    args = parser.parse_args()
+
+    setup_django()
+    run(args.requests, args.clients)
@@ -12,5 +12,13 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
+# Read by the settings: persistent database connections are WSGI-only.
+os.environ.setdefault('AGRISHOP_SERVER', 'asgi')
 
 application = get_asgi_application()
+
+# Close expired auctions in this process, so their closing events reach the
+# live feed subscribers it serves (see agrishop/auctions.py).
+from agrishop.auctions import start_scheduler  # noqa: E402
+
+start_scheduler()
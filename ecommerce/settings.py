@@ -54,6 +54,10 @@ CORS_ALLOW_ALL_ORIGINS = True
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
+    'agrishop.compression.CompressionMiddleware',
+    'agrishop.throttling.RateLimitHeadersMiddleware',
+    'agrishop.perf.PerfMiddleware',
+    'agrishop.routers.PrimaryPinningMiddleware',
     "django.middleware.common.CommonMiddleware",
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -88,13 +92,85 @@ WSGI_APPLICATION = 'ecommerce.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+def env_flag(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
+def database_settings(prefix, defaults):
+    """
+    One DATABASES entry from `<prefix>_*` environment variables: ENGINE, NAME,
+    HOST, PORT, USER, PASSWORD, CONN_MAX_AGE and CONN_HEALTH_CHECKS.
+    """
+    def env(key):
+        return os.environ.get(f'{prefix}_{key}', defaults.get(key, ''))
+
+    database = {
+        'ENGINE': env('ENGINE'),
+        'NAME': env('NAME'),
+        # Keep connections open between requests, and ping a reused one
+        # before handing it to a request so a dropped connection is replaced.
+        'CONN_MAX_AGE': int(env('CONN_MAX_AGE') or 0),
+        'CONN_HEALTH_CHECKS': env_flag(f'{prefix}_CONN_HEALTH_CHECKS', defaults.get('CONN_HEALTH_CHECKS', True)),
+    }
+    if database['ENGINE'] == 'django.db.backends.sqlite3':
+        database['OPTIONS'] = {
+            # Wait for concurrent writers (e.g. simultaneous bids) instead of
+            # failing immediately with "database is locked". This is SQLite's
+            # busy_timeout.
+            'timeout': 20,
+            # Transactions stay deferred; the ones that read and then write
+            # (checkout, closing auctions) take the write lock up front with
+            # agrishop.transactions.immediate_atomic.
+        }
+        if env_flag('AGRISHOP_SQLITE_WAL', True):
+            # Run on every new connection. WAL lets reads proceed while a
+            # write commits; synchronous=NORMAL is safe under WAL (a power
+            # loss can only drop the last commits); mmap serves reads from
+            # the page cache.
+            database['OPTIONS']['init_command'] = ';'.join([
+                'PRAGMA journal_mode=WAL',
+                'PRAGMA synchronous=NORMAL',
+                f"PRAGMA mmap_size={int(os.environ.get('AGRISHOP_SQLITE_MMAP_SIZE', 256 * 1024 * 1024))}",
+            ])
+    else:
+        database.update({key: env(key) for key in ['HOST', 'PORT', 'USER', 'PASSWORD']})
+    return database
+
+
+# Persistent connections are for WSGI workers, which serve each request on
+# one of a fixed set of threads. Under ASGI a sync view or sync_to_async
+# call can run on any thread of the executor, each keeps its own
+# connection, and idle ones are only closed at the end of a request on
+# their own thread, so they pile up. ecommerce/asgi.py sets
+# AGRISHOP_SERVER=asgi; AGRISHOP_DB_CONN_MAX_AGE still overrides either.
+ASGI = os.environ.get('AGRISHOP_SERVER') == 'asgi'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        **database_settings('AGRISHOP_DB', {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': 0 if ASGI else 60,
+        }),
+        'TEST': {
+            # A file rather than shared-cache memory, which cannot queue
+            # concurrent writers; the concurrency tests depend on this.
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
+# A read replica for catalog reads (see agrishop/routers.py), configured with
+# the same variables under AGRISHOP_DB_REPLICA_*. With SQLite it can be a
+# read-only handle on the primary file: AGRISHOP_DB_REPLICA_NAME=file:db.sqlite3?mode=ro
+if os.environ.get('AGRISHOP_DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **database_settings('AGRISHOP_DB_REPLICA', DATABASES['default']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['agrishop.routers.CatalogReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -115,6 +191,39 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing profiles. The first hasher in the chosen profile hashes
+# new passwords; the rest still verify older hashes, which agrishop.passwords
+# rehashes with the first one on the next successful login. The argon2
+# profile needs the argon2-cffi package.
+
+PASSWORD_HASHER_PROFILES = {
+    'scrypt': [
+        'agrishop.passwords.ScryptPasswordHasher',
+        'agrishop.passwords.PBKDF2PasswordHasher',
+    ],
+    'pbkdf2': [
+        'agrishop.passwords.PBKDF2PasswordHasher',
+        'agrishop.passwords.ScryptPasswordHasher',
+    ],
+    'argon2': [
+        'django.contrib.auth.hashers.Argon2PasswordHasher',
+        'agrishop.passwords.ScryptPasswordHasher',
+        'agrishop.passwords.PBKDF2PasswordHasher',
+    ],
+}
+PASSWORD_HASHERS = PASSWORD_HASHER_PROFILES[os.environ.get('AGRISHOP_PASSWORD_PROFILE', 'scrypt')]
+
+# Hash cost, the login hashing pool and per-account login throttling; see
+# agrishop/passwords.py for every key.
+AGRISHOP_PASSWORDS = {
+    'WORKERS': 2,
+    'MAX_ATTEMPTS': 5,
+    'LOCKOUT_SECONDS': 900,
+    'SCRYPT_WORK_FACTOR': 2 ** 14,
+    'PBKDF2_ITERATIONS': 600_000,
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -139,4 +248,121 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# API authentication
+# Access tokens carry the user's id, email, role and is_staff (see
+# agrishop.authentication), so authenticated requests build request.user
+# from the token instead of reading the user row.
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework_simplejwt.authentication.JWTStatelessUserAuthentication',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'agrishop.throttling.TokenBucketThrottle',
+    ],
+    # Reverse proxies in front of the app. Rate limits key anonymous clients
+    # on the address the last of them saw; with 0, X-Forwarded-For is
+    # ignored and REMOTE_ADDR is used, so clients cannot pick their own key.
+    'NUM_PROXIES': int(os.environ.get('AGRISHOP_NUM_PROXIES', 0)),
+}
+
+SIMPLE_JWT = {
+    'TOKEN_USER_CLASS': 'agrishop.authentication.ClaimsUser',
+}
+
+# Caches
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'agrishop',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # Rate limit buckets, one entry per active client.
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'agrishop-throttle',
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+        },
+    },
+}
+
+# Catalog reads (products, categories) are cached in this cache alias and
+# invalidated by the signals in agrishop/signals.py. LocMemCache is per
+# process; point ALIAS at a FileBasedCache to share entries and
+# invalidations between several worker processes.
+AGRISHOP_CATALOG_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+
+# Product image derivatives are generated off the request path by a local
+# thread pool (see agrishop/images.py). Set ASYNC to False to run inline.
+AGRISHOP_IMAGE_PIPELINE = {
+    'ASYNC': True,
+    'WORKERS': 2,
+}
+
+# Minutes a checkout holds stock before release_reservations returns it.
+AGRISHOP_RESERVATION_MINUTES = 15
+
+
+# Per-view timings from agrishop.perf.PerfMiddleware. Every SNAPSHOT_INTERVAL
+# seconds each process writes its samples to SNAPSHOT_DIR/perf-<pid>.json,
+# which perf_report merges; unset, nothing is written.
+AGRISHOP_PERF = {
+    'ENABLED': True,
+    'WINDOW': 500,
+    'SNAPSHOT_DIR': os.environ.get('AGRISHOP_PERF_SNAPSHOT_DIR') or None,
+    'SNAPSHOT_INTERVAL': 30,
+    'N_PLUS_ONE_THRESHOLD': 5,
+}
+
+# Live auction feed served as Server-Sent Events by the ASGI app; see
+# agrishop/live.py for every key.
+AGRISHOP_LIVE = {
+    'HISTORY': 100,
+    'KEEPALIVE': 15,
+}
+
+# Auction closing. The ASGI app runs close_expired_auctions on a background
+# thread when SCHEDULER is on; otherwise run `manage.py close_auctions` from cron.
+AGRISHOP_AUCTIONS = {
+    'SCHEDULER': True,
+    'INTERVAL': 5,
+    'BATCH_SIZE': 500,
+}
+
+# gzip/brotli response compression (agrishop/compression.py). Turn it off
+# with AGRISHOP_COMPRESSION=0 when a proxy in front already compresses.
+AGRISHOP_COMPRESSION = {
+    'ENABLED': env_flag('AGRISHOP_COMPRESSION', True),
+    'MIN_SIZE': 512,
+}
+
+# Seller reports at /api/analytics/ (agrishop/analytics.py). Results are
+# cached for TTL seconds and not invalidated on writes.
+AGRISHOP_ANALYTICS = {
+    'CACHE_ALIAS': 'default',
+    'TTL': 300,
+}
+
+# Token-bucket rate limits per user, per IP and per bidder
+# (agrishop/throttling.py). Buckets live in the 'throttle' cache, per
+# process unless it is pointed at a shared FileBasedCache.
+AGRISHOP_THROTTLE = {
+    'ENABLED': env_flag('AGRISHOP_THROTTLE', True),
+    'CACHE_ALIAS': 'throttle',
+    'BUCKETS': {
+        'anon': {'CAPACITY': 120, 'RATE': 2},
+        'user': {'CAPACITY': 300, 'RATE': 5},
+        'bid': {'CAPACITY': 10, 'RATE': 0.2},
+    },
+}
@@ -6,7 +6,7 @@ import django
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ecommerce.settings")
 django.setup()
 
-from agrishop.models import Product, Category  # Replace 'your_app' with your 
+from agrishop.bulk import import_products
 
 # Sample fertilizer product data (Expanded to 20 unique items)
 fertilizers = [
@@ -32,19 +32,19 @@ fertilizers = [
     {"title": "Neem Cake", "description": "Organic fertilizer and pest repellent.", "price": 24.75},
 ]
 
-# Ensure at least one category exists
-default_category, _ = Category.objects.get_or_create(name="Fertilizers")
-
-# Populate the database with 50 records
-for _ in range(50):
+# Build 50 rows and upsert them in one bulk statement (see agrishop/bulk.py).
+# For real supplier feeds use `python manage.py import_products feed.csv`.
+rows = []
+for i in range(50):
     data = random.choice(fertilizers)
-    product = Product.objects.create(
-        title=data["title"],
-        description=data["description"],
-        category=default_category,
-        quantity=random.randint(10, 500),  # Random stock quantity
-        price=round(data["price"] * (0.9 + random.uniform(0, 0.2)), 2),  # Small variation in price
-    )
-    print(f"Added: {product.title}")
+    rows.append({
+        "sku": f"SAMPLE-{i:04d}",
+        "title": data["title"],
+        "description": data["description"],
+        "category": "Fertilizers",
+        "quantity": random.randint(10, 500),  # Random stock quantity
+        "price": round(data["price"] * (0.9 + random.uniform(0, 0.2)), 2),  # Small variation in price
+    })
 
-print("✅ Database successfully populated with 50 products.")
+stats = import_products(rows)
+print(f"✅ Database successfully populated with {stats.imported} products.")